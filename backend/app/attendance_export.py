@@ -0,0 +1,153 @@
+"""
+Attendance export row builders
+
+The comprehensive monthly export prints one row per employee per day,
+combining attendance, check-in, schedule and leave data. Each source is
+indexed once by (employee_id, date) so every row is a handful of dict
+lookups, keeping the export linear in employees x days instead of scanning
+the month's records for each row.
+
+Employees are exported in batches of EMPLOYEE_BATCH_SIZE: the sources are
+streamed and indexed for one batch at a time, so memory stays bounded by
+the batch size rather than the department size.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+EmployeeDateKey = Tuple[int, date]
+
+# Employees whose month of source rows is held in memory at once
+EMPLOYEE_BATCH_SIZE = 200
+
+LEAVE_SCHEDULE_STATUSES = ('leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_taken')
+
+
+def index_by_employee_date(
+    records: Iterable[Any],
+    date_attr: str = 'date',
+    keep_first: bool = False
+) -> Dict[EmployeeDateKey, Any]:
+    """
+    Index records by (employee_id, date). Later records win unless keep_first
+    is set, in which case the first record for a key is kept.
+    """
+    index: Dict[EmployeeDateKey, Any] = {}
+    for record in records:
+        key = (record.employee_id, getattr(record, date_attr))
+        if keep_first:
+            index.setdefault(key, record)
+        else:
+            index[key] = record
+    return index
+
+
+def leave_days_index(
+    leave_requests: Iterable[Any],
+    start_date: date,
+    end_date: date
+) -> Dict[EmployeeDateKey, Dict[str, str]]:
+    """Expand approved leave requests into (employee_id, date) -> leave info within the range"""
+    leave_map: Dict[EmployeeDateKey, Dict[str, str]] = {}
+    for leave in leave_requests:
+        first = max(leave.start_date, start_date)
+        last = min(leave.end_date, end_date)
+        for i in range((last - first).days + 1):
+            leave_map[(leave.employee_id, first + timedelta(days=i))] = {
+                'leave_type': leave.leave_type,
+                'duration_type': leave.duration_type or 'full_day',
+            }
+    return leave_map
+
+
+def comprehensive_day_row(
+    date_obj: date,
+    att_rec: Optional[Any],
+    schedule: Optional[Any],
+    leave_info: Optional[Dict[str, str]],
+    checkin: Optional[Any]
+) -> List[Any]:
+    """One row of the comprehensive export for an employee and day"""
+    day_name = date_obj.strftime('%A')[:3]
+
+    # Build leave/comp-off status
+    leave_status = '-'
+    if schedule and schedule.status in LEAVE_SCHEDULE_STATUSES:
+        if schedule.status == 'leave_half_morning':
+            leave_status = "LEAVE-AM"
+        elif schedule.status == 'leave_half_afternoon':
+            leave_status = "LEAVE-PM"
+        elif schedule.status == 'comp_off_taken':
+            leave_status = "COMP-OFF"
+        else:
+            leave_status = "LEAVE"
+    elif leave_info:
+        if 'half' in leave_info['duration_type']:
+            leave_status = f"{leave_info['leave_type']}-Half"
+        else:
+            leave_status = leave_info['leave_type']
+
+    # Shift time
+    shift_time = '-'
+    if schedule and schedule.start_time and schedule.end_time:
+        shift_time = f"{schedule.start_time}-{schedule.end_time}"
+
+    # Check-in/out times
+    check_in_time = '-'
+    check_out_time = '-'
+    if att_rec:
+        check_in_time = att_rec.in_time or '-'
+        check_out_time = att_rec.out_time or '-'
+    elif checkin:
+        check_in_time = checkin.check_in_time.strftime('%H:%M') if checkin.check_in_time else '-'
+        check_out_time = checkin.check_out_time.strftime('%H:%M') if checkin.check_out_time else '-'
+
+    worked_hours = f"{att_rec.worked_hours:.2f}" if att_rec and att_rec.worked_hours else '-'
+    break_mins = str(att_rec.break_minutes) if att_rec and att_rec.break_minutes else '-'
+    overtime = '-'
+    if att_rec and att_rec.overtime_hours and att_rec.overtime_hours > 0:
+        overtime = f"{att_rec.overtime_hours:.2f}"
+
+    # Status
+    status_val = '-'
+    if att_rec and att_rec.status:
+        status_val = att_rec.status
+    elif checkin and checkin.check_in_status:
+        status_val = checkin.check_in_status
+
+    notes = att_rec.notes if att_rec and att_rec.notes else ''
+
+    return [
+        date_obj.isoformat(),
+        day_name,
+        shift_time,
+        check_in_time,
+        check_out_time,
+        worked_hours,
+        break_mins,
+        overtime,
+        status_val,
+        leave_status,
+        notes
+    ]
+
+
+def comprehensive_employee_rows(
+    employee_id: int,
+    dates: Iterable[date],
+    attendance_index: Dict[EmployeeDateKey, Any],
+    schedule_index: Dict[EmployeeDateKey, Any],
+    leave_index: Dict[EmployeeDateKey, Dict[str, str]],
+    checkin_index: Dict[EmployeeDateKey, Any]
+) -> Iterator[List[Any]]:
+    """Rows for one employee over the given dates, fed from the indexes"""
+    for date_obj in dates:
+        key = (employee_id, date_obj)
+        yield comprehensive_day_row(
+            date_obj,
+            attendance_index.get(key),
+            schedule_index.get(key),
+            leave_index.get(key),
+            checkin_index.get(key)
+        )
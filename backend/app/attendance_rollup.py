@@ -0,0 +1,337 @@
+"""
+Attendance rollups
+
+Reports used to re-aggregate raw Attendance rows (employees x days) on
+every request. Two rollup tables hold the aggregates instead:
+
+- attendance_daily_rollups:   one row per (employee, day)
+- attendance_monthly_rollups: one row per (employee, month), summed from the daily rows
+
+Statement-level triggers on `attendance` (installed with
+`install_rollup_triggers`) recompute the (employee, day) and
+(employee, month) rows touched by every INSERT, UPDATE and DELETE, in the
+writer's transaction. No write path can bypass them, including ORM cascades
+such as deleting a Schedule. Existing data is loaded with
+`rebuild_attendance_rollups`: automatically at startup while the rollups
+are still empty, or for a range with backfill_rollups.py.
+
+Readers use `employee_rollup_totals`, which takes whole months from the
+monthly table and only the partial months at the edges of the range from
+the daily table.
+"""
+
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, cast, delete, extract, func, insert, or_, select, text, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.models import Attendance, AttendanceDailyRollup, AttendanceMonthlyRollup, Employee
+
+
+# Attendance.status values written by the check-in paths (both spellings are in use)
+ON_TIME_STATUSES = ('onTime', 'on-time')
+LATE_STATUSES = ('slightlyLate', 'slightly-late', 'late', 'veryLate')
+
+_DAILY_COLUMNS = (
+    'department_id', 'employee_id', 'date', 'record_count', 'worked_days', 'worked_hours',
+    'overtime_hours', 'night_hours', 'break_minutes', 'on_time_count', 'late_count'
+)
+_MONTHLY_COLUMNS = (
+    'department_id', 'employee_id', 'year', 'month', 'days', 'record_count', 'worked_days',
+    'worked_hours', 'overtime_hours', 'night_hours', 'break_minutes', 'on_time_count', 'late_count'
+)
+
+
+def _daily_source():
+    """Attendance aggregated per (employee, day), tagged with the employee's department"""
+    return (
+        select(
+            Employee.department_id,
+            Attendance.employee_id,
+            Attendance.date,
+            func.count(Attendance.id),
+            func.count(Attendance.id).filter(Attendance.worked_hours > 0),
+            func.coalesce(func.sum(Attendance.worked_hours), 0),
+            func.coalesce(func.sum(Attendance.overtime_hours), 0),
+            func.coalesce(func.sum(Attendance.night_hours), 0),
+            func.coalesce(func.sum(Attendance.break_minutes), 0),
+            func.count(Attendance.id).filter(Attendance.status.in_(ON_TIME_STATUSES)),
+            func.count(Attendance.id).filter(Attendance.status.in_(LATE_STATUSES)),
+        )
+        .join(Employee, Attendance.employee_id == Employee.id)
+        .group_by(Employee.department_id, Attendance.employee_id, Attendance.date)
+    )
+
+
+def _monthly_source():
+    """Daily rollups summed per (employee, month)"""
+    daily = AttendanceDailyRollup
+    year = cast(extract('year', daily.date), Integer)
+    month = cast(extract('month', daily.date), Integer)
+    return (
+        select(
+            func.max(daily.department_id),
+            daily.employee_id,
+            year,
+            month,
+            func.count(daily.id),
+            func.coalesce(func.sum(daily.record_count), 0),
+            func.coalesce(func.sum(daily.worked_days), 0),
+            func.coalesce(func.sum(daily.worked_hours), 0),
+            func.coalesce(func.sum(daily.overtime_hours), 0),
+            func.coalesce(func.sum(daily.night_hours), 0),
+            func.coalesce(func.sum(daily.break_minutes), 0),
+            func.coalesce(func.sum(daily.on_time_count), 0),
+            func.coalesce(func.sum(daily.late_count), 0),
+        )
+        .group_by(daily.employee_id, year, month)
+    ), year, month
+
+
+def _month_bounds(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+async def rebuild_attendance_rollups(
+    db: AsyncSession,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> dict:
+    """
+    Backfill: rebuild daily rollups for every attendance row in the range
+    (all time when no bounds are given) and the monthly rows of every month
+    the range touches. The caller commits.
+    """
+    daily = AttendanceDailyRollup
+    monthly = AttendanceMonthlyRollup
+
+    daily_delete = delete(daily).execution_options(synchronize_session=False)
+    source = _daily_source()
+    if start_date:
+        daily_delete = daily_delete.where(daily.date >= start_date)
+        source = source.filter(Attendance.date >= start_date)
+    if end_date:
+        daily_delete = daily_delete.where(daily.date <= end_date)
+        source = source.filter(Attendance.date <= end_date)
+    await db.execute(daily_delete)
+    daily_result = await db.execute(insert(daily).from_select(_DAILY_COLUMNS, source))
+
+    # Monthly rows are rebuilt for whole months around the range
+    month_start = date(start_date.year, start_date.month, 1) if start_date else None
+    month_end = _month_bounds(end_date.year, end_date.month)[1] if end_date else None
+    monthly_delete = delete(monthly).execution_options(synchronize_session=False)
+    monthly_source, _, _ = _monthly_source()
+    if month_start:
+        monthly_delete = monthly_delete.where(
+            or_(monthly.year > month_start.year,
+                and_(monthly.year == month_start.year, monthly.month >= month_start.month))
+        )
+        monthly_source = monthly_source.filter(daily.date >= month_start)
+    if month_end:
+        monthly_delete = monthly_delete.where(
+            or_(monthly.year < month_end.year,
+                and_(monthly.year == month_end.year, monthly.month <= month_end.month))
+        )
+        monthly_source = monthly_source.filter(daily.date <= month_end)
+    await db.execute(monthly_delete)
+    monthly_result = await db.execute(insert(monthly).from_select(_MONTHLY_COLUMNS, monthly_source))
+
+    return {"daily_rows": daily_result.rowcount, "monthly_rows": monthly_result.rowcount}
+
+
+def _sql_list(values: Iterable[str]) -> str:
+    return ", ".join(f"'{value}'" for value in values)
+
+
+# Recompute the rollups of the (employee, day) keys in `keys`. Upserts plus
+# deletes of emptied keys (rather than delete-then-insert) keep concurrent
+# writers to the same day from colliding on the unique constraints.
+_RECOMPUTE_SQL = f"""
+    INSERT INTO attendance_daily_rollups (
+        department_id, employee_id, date, record_count, worked_days, worked_hours,
+        overtime_hours, night_hours, break_minutes, on_time_count, late_count, updated_at
+    )
+    SELECT e.department_id, a.employee_id, a.date,
+           count(a.id),
+           count(a.id) FILTER (WHERE a.worked_hours > 0),
+           coalesce(sum(a.worked_hours), 0),
+           coalesce(sum(a.overtime_hours), 0),
+           coalesce(sum(a.night_hours), 0),
+           coalesce(sum(a.break_minutes), 0),
+           count(a.id) FILTER (WHERE a.status IN ({_sql_list(ON_TIME_STATUSES)})),
+           count(a.id) FILTER (WHERE a.status IN ({_sql_list(LATE_STATUSES)})),
+           now() AT TIME ZONE 'utc'
+    FROM attendance a
+    JOIN employees e ON e.id = a.employee_id
+    JOIN (SELECT DISTINCT employee_id, date FROM {{keys}}) k
+      ON k.employee_id = a.employee_id AND k.date = a.date
+    GROUP BY e.department_id, a.employee_id, a.date
+    ON CONFLICT (employee_id, date) DO UPDATE SET
+        department_id = EXCLUDED.department_id, record_count = EXCLUDED.record_count,
+        worked_days = EXCLUDED.worked_days, worked_hours = EXCLUDED.worked_hours,
+        overtime_hours = EXCLUDED.overtime_hours, night_hours = EXCLUDED.night_hours,
+        break_minutes = EXCLUDED.break_minutes, on_time_count = EXCLUDED.on_time_count,
+        late_count = EXCLUDED.late_count, updated_at = EXCLUDED.updated_at;
+
+    DELETE FROM attendance_daily_rollups d
+    USING (SELECT DISTINCT employee_id, date FROM {{keys}}) k
+    WHERE d.employee_id = k.employee_id AND d.date = k.date
+      AND NOT EXISTS (SELECT 1 FROM attendance a WHERE a.employee_id = k.employee_id AND a.date = k.date);
+
+    INSERT INTO attendance_monthly_rollups (
+        department_id, employee_id, year, month, days, record_count, worked_days, worked_hours,
+        overtime_hours, night_hours, break_minutes, on_time_count, late_count, updated_at
+    )
+    SELECT max(d.department_id), d.employee_id, m.year, m.month,
+           count(d.id), coalesce(sum(d.record_count), 0), coalesce(sum(d.worked_days), 0),
+           coalesce(sum(d.worked_hours), 0), coalesce(sum(d.overtime_hours), 0),
+           coalesce(sum(d.night_hours), 0), coalesce(sum(d.break_minutes), 0),
+           coalesce(sum(d.on_time_count), 0), coalesce(sum(d.late_count), 0),
+           now() AT TIME ZONE 'utc'
+    FROM attendance_daily_rollups d
+    JOIN (
+        SELECT DISTINCT employee_id,
+               extract(year FROM date)::int AS year, extract(month FROM date)::int AS month
+        FROM {{keys}}
+    ) m ON m.employee_id = d.employee_id
+       AND d.date >= make_date(m.year, m.month, 1)
+       AND d.date < make_date(m.year, m.month, 1) + interval '1 month'
+    GROUP BY d.employee_id, m.year, m.month
+    ON CONFLICT (employee_id, year, month) DO UPDATE SET
+        department_id = EXCLUDED.department_id, days = EXCLUDED.days,
+        record_count = EXCLUDED.record_count, worked_days = EXCLUDED.worked_days,
+        worked_hours = EXCLUDED.worked_hours, overtime_hours = EXCLUDED.overtime_hours,
+        night_hours = EXCLUDED.night_hours, break_minutes = EXCLUDED.break_minutes,
+        on_time_count = EXCLUDED.on_time_count, late_count = EXCLUDED.late_count,
+        updated_at = EXCLUDED.updated_at;
+
+    DELETE FROM attendance_monthly_rollups r
+    USING (
+        SELECT DISTINCT employee_id,
+               extract(year FROM date)::int AS year, extract(month FROM date)::int AS month
+        FROM {{keys}}
+    ) m
+    WHERE r.employee_id = m.employee_id AND r.year = m.year AND r.month = m.month
+      AND NOT EXISTS (
+          SELECT 1 FROM attendance_daily_rollups d
+          WHERE d.employee_id = m.employee_id
+            AND d.date >= make_date(m.year, m.month, 1)
+            AND d.date < make_date(m.year, m.month, 1) + interval '1 month'
+      );
+"""
+
+ROLLUP_TRIGGER_STATEMENTS = [
+    f"""
+    CREATE OR REPLACE FUNCTION maintain_attendance_rollups() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {_RECOMPUTE_SQL.format(keys='new_rows')}
+        ELSIF TG_OP = 'DELETE' THEN
+            {_RECOMPUTE_SQL.format(keys='old_rows')}
+        ELSE
+            {_RECOMPUTE_SQL.format(keys='(SELECT employee_id, date FROM new_rows UNION SELECT employee_id, date FROM old_rows) changed')}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_attendance_rollup_insert ON attendance",
+    """
+    CREATE TRIGGER trg_attendance_rollup_insert AFTER INSERT ON attendance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_attendance_rollups()
+    """,
+    "DROP TRIGGER IF EXISTS trg_attendance_rollup_update ON attendance",
+    """
+    CREATE TRIGGER trg_attendance_rollup_update AFTER UPDATE ON attendance
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_attendance_rollups()
+    """,
+    "DROP TRIGGER IF EXISTS trg_attendance_rollup_delete ON attendance",
+    """
+    CREATE TRIGGER trg_attendance_rollup_delete AFTER DELETE ON attendance
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_attendance_rollups()
+    """,
+]
+
+
+async def install_rollup_triggers(conn: AsyncConnection):
+    for statement in ROLLUP_TRIGGER_STATEMENTS:
+        await conn.execute(text(statement))
+
+
+async def backfill_empty_rollups(conn: AsyncConnection) -> Optional[dict]:
+    """
+    Rebuild the rollups from all attendance when they are still empty while
+    attendance is not (first start after upgrading). Workers starting
+    together serialize on an advisory lock, so only the first one rebuilds.
+    Returns the row counts, or None when nothing had to be done.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('attendance_rollup_backfill'))"))
+    has_rollups = (await conn.execute(select(AttendanceDailyRollup.id).limit(1))).first() is not None
+    has_attendance = (await conn.execute(select(Attendance.id).limit(1))).first() is not None
+    if has_rollups or not has_attendance:
+        return None
+    return await rebuild_attendance_rollups(AsyncSession(bind=conn), None, None)
+
+
+def split_range_by_month(start_date: date, end_date: date) -> Tuple[List[Tuple[int, int]], List[Tuple[date, date]]]:
+    """Split [start_date, end_date] into whole (year, month) keys and partial (start, end) edges"""
+    whole: List[Tuple[int, int]] = []
+    partial: List[Tuple[date, date]] = []
+    cursor = start_date
+    while cursor <= end_date:
+        first, last = _month_bounds(cursor.year, cursor.month)
+        span_end = min(last, end_date)
+        if cursor == first and span_end == last:
+            whole.append((cursor.year, cursor.month))
+        else:
+            partial.append((cursor, span_end))
+        cursor = last + timedelta(days=1)
+    return whole, partial
+
+
+def employee_rollup_totals(start_date: date, end_date: date, employee_ids=None):
+    """
+    Subquery of per-employee totals over the range, read from the rollups.
+    `employee_ids` may be a list or a select of employee ids.
+    Columns: employee_id, record_count, worked_days, worked_hours,
+    overtime_hours, night_hours, break_minutes, on_time_count, late_count.
+    """
+    whole, partial = split_range_by_month(start_date, end_date)
+    if not whole and not partial:
+        # Empty range: an always-empty daily read keeps the column shape
+        partial = [(start_date, end_date)]
+    measures = ('record_count', 'worked_days', 'worked_hours', 'overtime_hours',
+                'night_hours', 'break_minutes', 'on_time_count', 'late_count')
+
+    parts = []
+    if whole:
+        monthly = AttendanceMonthlyRollup
+        part = select(monthly.employee_id, *[getattr(monthly, m) for m in measures]).filter(
+            tuple_(monthly.year, monthly.month).in_(whole)
+        )
+        if employee_ids is not None:
+            part = part.filter(monthly.employee_id.in_(employee_ids))
+        parts.append(part)
+    if partial:
+        daily = AttendanceDailyRollup
+        part = select(daily.employee_id, *[getattr(daily, m) for m in measures]).filter(
+            or_(*[and_(daily.date >= first, daily.date <= last) for first, last in partial])
+        )
+        if employee_ids is not None:
+            part = part.filter(daily.employee_id.in_(employee_ids))
+        parts.append(part)
+
+    rows = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    return (
+        select(
+            rows.c.employee_id,
+            *[func.coalesce(func.sum(getattr(rows.c, m)), 0).label(m) for m in measures]
+        )
+        .group_by(rows.c.employee_id)
+        .subquery()
+    )
@@ -5,8 +5,11 @@ Audit logging utility for tracking all important actions
 from typing import Optional, Dict, Any
 from datetime import datetime, date
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from fastapi import HTTPException, Response
+from sqlalchemy import func, select, text
 from app.models import AuditLog, User
+from app.pagination import clamp_page_size, keyset_page, page_cursors
+from app.audit_sink import audit_sink
 import json
 
 
@@ -36,11 +39,17 @@ async def log_action(
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None,
     status: str = "success",
-    error_message: Optional[str] = None
-) -> AuditLog:
+    error_message: Optional[str] = None,
+    sync: bool = False
+) -> Optional[AuditLog]:
     """
     Log an action to the audit log
     
+    By default the event is queued on the buffered audit sink and written
+    in the background, outside the caller's transaction. Pass sync=True to
+    add it to `db` and flush instead, so it commits or rolls back with the
+    caller's changes.
+    
     Args:
         db: Database session
         user_id: ID of user performing the action
@@ -54,52 +63,92 @@ async def log_action(
         user_agent: Client user agent
         status: Status of action (success, failed, partial)
         error_message: Error details if action failed
+        sync: Write within the caller's transaction instead of the buffered sink
     
     Returns:
-        AuditLog: The created audit log entry
+        AuditLog: The created audit log entry (sync mode), otherwise None
     """
     
     # Serialize date objects to ISO format strings for JSON storage
     serialized_old_values = serialize_for_json(old_values) if old_values else None
     serialized_new_values = serialize_for_json(new_values) if new_values else None
     
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        entity_type=entity_type,
-        entity_id=entity_id,
-        description=description,
-        old_values=serialized_old_values,
-        new_values=serialized_new_values,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        status=status,
-        error_message=error_message,
-        created_at=datetime.utcnow()
-    )
+    values = {
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "description": description,
+        "old_values": serialized_old_values,
+        "new_values": serialized_new_values,
+        "ip_address": ip_address,
+        "user_agent": user_agent[:500] if user_agent else user_agent,
+        "status": status,
+        "error_message": error_message,
+        "created_at": datetime.utcnow()
+    }
+    
+    if not sync and await audit_sink.enqueue(values):
+        return None
     
+    audit_log = AuditLog(**values)
     db.add(audit_log)
     await db.flush()
     
     return audit_log
 
 
+# Total count modes for get_audit_logs
+AUDIT_COUNT_MODES = ("exact", "estimate", "none")
+
+
+async def estimate_audit_log_count(db: AsyncSession) -> Optional[int]:
+    """
+    Planner row estimate for the whole audit table (summed over partitions).
+    None when the table has not been analyzed yet.
+    """
+    result = await db.execute(text("""
+        SELECT COALESCE(sum(c.reltuples) FILTER (WHERE c.reltuples > 0), 0), count(*) FILTER (WHERE c.reltuples >= 0)
+        FROM pg_class c
+        WHERE c.oid = to_regclass('audit_logs')
+           OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass('audit_logs'))
+    """))
+    estimate, analyzed = result.one()
+    if not analyzed:
+        return None
+    return int(estimate)
+
+
 async def get_audit_logs(
     db: AsyncSession,
     action: Optional[str] = None,
     entity_type: Optional[str] = None,
     user_id: Optional[int] = None,
     limit: int = 100,
-    offset: int = 0
-) -> tuple[list[AuditLog], int]:
+    offset: int = 0,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    count: str = "exact",
+    response: Optional[Response] = None
+) -> tuple[list[AuditLog], Optional[int], bool]:
     """
-    Retrieve audit logs with optional filtering
+    Retrieve audit logs with optional filtering, keyset-paginated on
+    (created_at, id) - see app.pagination. When `response` is given the
+    X-Next-Cursor / X-Sync-Cursor headers are set on it.
+    
+    count:
+        exact    - SELECT count(*) over the filters
+        estimate - planner estimate when unfiltered (exact otherwise)
+        none     - skip counting
     
     Returns:
-        Tuple of (logs list, total count)
+        Tuple of (logs list, total count or None, whether the count is an estimate)
     """
     from sqlalchemy.orm import selectinload
     
+    if count not in AUDIT_COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count must be one of: {', '.join(AUDIT_COUNT_MODES)}")
+    
     filters = []
     
     if action:
@@ -110,19 +159,30 @@ async def get_audit_logs(
         filters.append(AuditLog.user_id == user_id)
     
     # Get total count
-    count_query = select(AuditLog)
-    if filters:
-        count_query = count_query.filter(*filters)
-    count_result = await db.execute(count_query)
-    total_count = len(count_result.scalars().all())
+    total_count = None
+    estimated = False
+    if count == "estimate" and not filters:
+        total_count = await estimate_audit_log_count(db)
+        estimated = total_count is not None
+    if count != "none" and total_count is None:
+        count_query = select(func.count()).select_from(AuditLog)
+        if filters:
+            count_query = count_query.filter(*filters)
+        total_count = (await db.execute(count_query)).scalar() or 0
     
     # Get paginated results with eager loading of user
     query = select(AuditLog).options(selectinload(AuditLog.user))
     if filters:
         query = query.filter(*filters)
-    query = query.order_by(AuditLog.created_at.desc()).limit(limit).offset(offset)
+    query = keyset_page(query, AuditLog.created_at, AuditLog.id, limit, before, since)
+    if offset:
+        query = query.offset(offset)
     
     result = await db.execute(query)
     logs = result.scalars().all()
+    if response is not None:
+        logs = page_cursors(logs, response, limit, since)
+    else:
+        logs = logs[:clamp_page_size(limit)]
     
-    return logs, total_count
+    return logs, total_count, estimated
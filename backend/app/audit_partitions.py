@@ -0,0 +1,384 @@
+"""
+Monthly partitions, retention and archival for audit_logs
+
+The audit table grows by millions of rows a year and is almost always
+read newest-first. Once converted (`audit_maintenance.py --partition`) it is a
+PostgreSQL table partitioned by RANGE (created_at) with one partition per
+month, named audit_logs_yYYYYmMM, plus a DEFAULT partition that catches
+anything outside the prepared months.
+
+`run_audit_maintenance` keeps the table healthy:
+
+- creates the partitions for the current month and the next
+  AUDIT_PARTITION_MONTHS_AHEAD months
+- when AUDIT_RETENTION_MONTHS is set, writes each expired month to a
+  gzipped JSON-lines file in AUDIT_ARCHIVE_DIR and then drops it - a
+  partitioned table drops whole partitions, an unpartitioned one deletes
+  the archived rows
+
+`AuditMaintenance` runs it periodically in the background (started and
+stopped with the app); `audit_maintenance.py` runs it once from the shell.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+
+
+AUDIT_TABLE = "audit_logs"
+DEFAULT_PARTITION = "audit_logs_default"
+
+# Rows read per round trip while archiving
+ARCHIVE_FETCH_SIZE = 2000
+
+_PARTITION_NAME = re.compile(r"^audit_logs_y(\d{4})m(\d{2})$")
+
+_ARCHIVE_COLUMNS = (
+    "id", "user_id", "action", "entity_type", "entity_id", "description", "old_values",
+    "new_values", "ip_address", "user_agent", "status", "error_message", "created_at"
+)
+
+
+def add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"audit_logs_y{year:04d}m{month:02d}"
+
+
+def partition_bounds(year: int, month: int) -> Tuple[date, date]:
+    """[first day of the month, first day of the next month)"""
+    next_year, next_month = add_months(year, month, 1)
+    return date(year, month, 1), date(next_year, next_month, 1)
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text(f"SELECT relkind FROM pg_class WHERE oid = to_regclass('{AUDIT_TABLE}')")
+    )
+    return result.scalar() == "p"
+
+
+async def list_month_partitions(conn: AsyncConnection) -> List[Tuple[int, int]]:
+    """(year, month) of every monthly partition, oldest first"""
+    result = await conn.execute(text(f"""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('{AUDIT_TABLE}')
+    """))
+    months = []
+    for (name,) in result.all():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append((int(match.group(1)), int(match.group(2))))
+    return sorted(months)
+
+
+async def _default_has_rows(conn: AsyncConnection, start: date, end: date) -> bool:
+    if not (await conn.execute(text(f"SELECT to_regclass('{DEFAULT_PARTITION}')"))).scalar():
+        return False
+    # Hold off writers to DEFAULT until the partition exists, so no row can
+    # land in the month's range between this check and the CREATE/ATTACH
+    await conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE"))
+    result = await conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)"),
+        {"start": datetime.combine(start, datetime.min.time()), "end": datetime.combine(end, datetime.min.time())}
+    )
+    return bool(result.scalar())
+
+
+async def create_month_partition(conn: AsyncConnection, year: int, month: int):
+    """
+    Create the partition for a month. PostgreSQL refuses a new partition
+    while the DEFAULT partition holds rows in its range, so those rows are
+    first moved into a standalone table that is then attached as the
+    partition - all in the caller's transaction.
+    """
+    name = partition_name(year, month)
+    start, end = partition_bounds(year, month)
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+
+    if (await conn.execute(text(f"SELECT to_regclass('{name}')"))).scalar():
+        return
+    if not await _default_has_rows(conn, start, end):
+        await conn.execute(text(f"CREATE TABLE {name} PARTITION OF {AUDIT_TABLE} {bounds}"))
+        return
+
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE {AUDIT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    await conn.execute(
+        text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= :start AND created_at < :end
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """),
+        {"start": datetime.combine(start, datetime.min.time()), "end": datetime.combine(end, datetime.min.time())}
+    )
+    # Attaching builds the partitioned indexes and foreign key on the new table
+    await conn.execute(text(f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {name} {bounds}"))
+
+
+async def ensure_audit_partitions(
+    conn: AsyncConnection,
+    months_ahead: int,
+    today: Optional[date] = None
+) -> List[str]:
+    """Create missing partitions from the current month up to `months_ahead` months out"""
+    today = today or date.today()
+    existing = set(await list_month_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        year, month = add_months(today.year, today.month, offset)
+        if (year, month) not in existing:
+            await create_month_partition(conn, year, month)
+            created.append(partition_name(year, month))
+    return created
+
+
+async def convert_to_partitioned(conn: AsyncConnection, months_ahead: int, keep_legacy: bool = False) -> int:
+    """
+    Rebuild an ordinary audit_logs table as a monthly-partitioned one.
+    Rows are copied into partitions covering their months; ids and the id
+    sequence are preserved. Returns the number of rows moved.
+    """
+    legacy = f"{AUDIT_TABLE}_unpartitioned"
+    sequence = (await conn.execute(text(f"SELECT pg_get_serial_sequence('{AUDIT_TABLE}', 'id')"))).scalar()
+
+    await conn.execute(text(f"ALTER TABLE {AUDIT_TABLE} RENAME TO {legacy}"))
+    await conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {AUDIT_TABLE}_pkey TO {legacy}_pkey"))
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    # Index names are schema-wide; the partitioned table reuses them
+    for index in ("idx_auditlog_user_id", "idx_auditlog_action", "idx_auditlog_entity_type",
+                  "idx_auditlog_created_at", "ix_audit_logs_created_id", "ix_audit_logs_id", "ix_audit_logs_user_id",
+                  "ix_audit_logs_action", "ix_audit_logs_entity_type", "ix_audit_logs_created_at"):
+        await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+    id_default = f"DEFAULT nextval('{sequence}')" if sequence else "GENERATED BY DEFAULT AS IDENTITY"
+    # The partition key has to be part of the primary key
+    await conn.execute(text(f"""
+        CREATE TABLE {AUDIT_TABLE} (
+            id INTEGER NOT NULL {id_default},
+            user_id INTEGER,
+            action VARCHAR(100) NOT NULL,
+            entity_type VARCHAR(50) NOT NULL,
+            entity_id INTEGER,
+            description TEXT,
+            old_values JSON,
+            new_values JSON,
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(500),
+            status VARCHAR(20) DEFAULT 'success',
+            error_message TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at),
+            CONSTRAINT fk_auditlog_user FOREIGN KEY (user_id)
+                REFERENCES users(id) ON DELETE SET NULL
+        ) PARTITION BY RANGE (created_at)
+    """))
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {AUDIT_TABLE}.id"))
+    for statement in (
+        f"CREATE INDEX idx_auditlog_created_at ON {AUDIT_TABLE} (created_at)",
+        f"CREATE INDEX ix_audit_logs_created_id ON {AUDIT_TABLE} (created_at, id)",
+        f"CREATE INDEX idx_auditlog_user_id ON {AUDIT_TABLE} (user_id)",
+        f"CREATE INDEX idx_auditlog_action ON {AUDIT_TABLE} (action)",
+        f"CREATE INDEX idx_auditlog_entity_type ON {AUDIT_TABLE} (entity_type)",
+    ):
+        await conn.execute(text(statement))
+
+    oldest = (await conn.execute(text(f"SELECT min(created_at) FROM {legacy}"))).scalar()
+    today = date.today()
+    year, month = (oldest.year, oldest.month) if oldest else (today.year, today.month)
+    last_year, last_month = add_months(today.year, today.month, months_ahead)
+    while (year, month) <= (last_year, last_month):
+        await create_month_partition(conn, year, month)
+        year, month = add_months(year, month, 1)
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {AUDIT_TABLE} DEFAULT"))
+
+    columns = ", ".join(_ARCHIVE_COLUMNS[:-1])
+    moved = await conn.execute(text(f"""
+        INSERT INTO {AUDIT_TABLE} ({columns}, created_at)
+        SELECT {columns}, COALESCE(created_at, CURRENT_TIMESTAMP) FROM {legacy}
+    """))
+    if not keep_legacy:
+        await conn.execute(text(f"DROP TABLE {legacy}"))
+    return moved.rowcount
+
+
+def retention_cutoff(retention_months: int, today: Optional[date] = None) -> date:
+    """First day of the oldest month that is kept"""
+    today = today or date.today()
+    year, month = add_months(today.year, today.month, -retention_months)
+    return date(year, month, 1)
+
+
+def _archive_row(row) -> str:
+    values = {}
+    for column in _ARCHIVE_COLUMNS:
+        value = getattr(row, column)
+        values[column] = value.isoformat() if isinstance(value, (datetime, date)) else value
+    return json.dumps(values, ensure_ascii=False, default=str) + "\n"
+
+
+async def _export_rows(conn: AsyncConnection, source: str, where: str, params: Dict, path: str) -> int:
+    """Stream matching rows into a gzipped JSON-lines file; returns the row count"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    result = await conn.stream(
+        text(f"SELECT {', '.join(_ARCHIVE_COLUMNS)} FROM {source} WHERE {where} ORDER BY created_at, id")
+        .execution_options(yield_per=ARCHIVE_FETCH_SIZE),
+        params
+    )
+    # Overwrite: a rerun after a failed transaction rewrites the same month
+    archive = await asyncio.to_thread(gzip.open, path, "wt", encoding="utf-8")
+    try:
+        async for rows in result.partitions(ARCHIVE_FETCH_SIZE):
+            await asyncio.to_thread(archive.write, "".join(_archive_row(row) for row in rows))
+            count += len(rows)
+    finally:
+        await asyncio.to_thread(archive.close)
+    return count
+
+
+def archive_path(archive_dir: str, source: str, year: int, month: int) -> str:
+    return os.path.join(archive_dir, f"{source}_{year:04d}-{month:02d}.jsonl.gz")
+
+
+async def archive_expired_audit_logs(
+    conn: AsyncConnection,
+    retention_months: int,
+    archive_dir: str,
+    today: Optional[date] = None
+) -> Dict[str, int]:
+    """
+    Archive and remove audit rows older than the retention window.
+    Returns {"YYYY-MM": archived row count} for each month removed.
+    """
+    cutoff = retention_cutoff(retention_months, today)
+    archived: Dict[str, int] = {}
+
+    if await is_partitioned(conn):
+        for year, month in await list_month_partitions(conn):
+            _, end = partition_bounds(year, month)
+            if end > cutoff:
+                break
+            name = partition_name(year, month)
+            count = await _export_rows(conn, name, "true", {}, archive_path(archive_dir, AUDIT_TABLE, year, month))
+            await conn.execute(text(f"DROP TABLE {name}"))
+            archived[f"{year:04d}-{month:02d}"] = count
+        # Stragglers that landed in the default partition
+        default_exists = await conn.execute(text(f"SELECT to_regclass('{DEFAULT_PARTITION}')"))
+        sources = [DEFAULT_PARTITION] if default_exists.scalar() else []
+    else:
+        sources = [AUDIT_TABLE]
+
+    for source in sources:
+        oldest = await conn.execute(
+            text(f"SELECT min(created_at) FROM {source} WHERE created_at < :cutoff"),
+            {"cutoff": datetime.combine(cutoff, datetime.min.time())}
+        )
+        first = oldest.scalar()
+        if first is None:
+            continue
+        year, month = first.year, first.month
+        while date(year, month, 1) < cutoff:
+            start, end = partition_bounds(year, month)
+            params = {
+                "start": datetime.combine(start, datetime.min.time()),
+                "end": datetime.combine(end, datetime.min.time())
+            }
+            where = "created_at >= :start AND created_at < :end"
+            path = archive_path(archive_dir, source, year, month)
+            count = await _export_rows(conn, source, where, params, path)
+            if not count:
+                os.remove(path)
+            else:
+                await conn.execute(text(f"DELETE FROM {source} WHERE {where}"), params)
+                key = f"{year:04d}-{month:02d}"
+                archived[key] = archived.get(key, 0) + count
+            year, month = add_months(year, month, 1)
+
+    return archived
+
+
+async def _try_maintenance_lock(conn: AsyncConnection) -> bool:
+    """Transaction-scoped advisory lock shared by all workers"""
+    result = await conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('audit_maintenance'))"))
+    return bool(result.scalar())
+
+
+async def run_audit_maintenance(today: Optional[date] = None) -> Dict[str, object]:
+    """Prepare upcoming partitions and apply the retention policy"""
+    from app.database import engine
+
+    summary: Dict[str, object] = {"partitioned": False, "created": [], "archived": {}}
+    async with engine.begin() as conn:
+        # Every worker runs this loop; only one at a time does the work
+        if not await _try_maintenance_lock(conn):
+            summary["skipped"] = True
+            return summary
+        if await is_partitioned(conn):
+            summary["partitioned"] = True
+            summary["created"] = await ensure_audit_partitions(conn, settings.AUDIT_PARTITION_MONTHS_AHEAD, today)
+
+    if settings.AUDIT_RETENTION_MONTHS > 0:
+        async with engine.begin() as conn:
+            if await _try_maintenance_lock(conn):
+                summary["archived"] = await archive_expired_audit_logs(
+                    conn, settings.AUDIT_RETENTION_MONTHS, settings.AUDIT_ARCHIVE_DIR, today
+                )
+    return summary
+
+
+class AuditMaintenance:
+    """Runs `run_audit_maintenance` every AUDIT_MAINTENANCE_INTERVAL_HOURS"""
+
+    def __init__(self, interval_hours: float = 24.0):
+        self.interval_hours = interval_hours
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.interval_hours <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                summary = await run_audit_maintenance()
+                if summary.get("created") or summary.get("archived"):
+                    print(f"Audit maintenance: created {summary['created']}, archived {summary['archived']}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Audit maintenance error: {e}")
+            await asyncio.sleep(self.interval_hours * 3600)
+
+
+# Global instance
+audit_maintenance = AuditMaintenance(interval_hours=settings.AUDIT_MAINTENANCE_INTERVAL_HOURS)
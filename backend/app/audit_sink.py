@@ -0,0 +1,154 @@
+"""
+Buffered audit-log writer
+
+`log_action` used to add the AuditLog to the caller's session and flush,
+so every audited request paid an extra round trip inside its transaction
+(and rows logged after the caller's last commit were never committed).
+
+When the sink is running, `log_action` serializes the event and puts it
+on a bounded in-process queue instead; a background task writes queued
+events in batches with its own session. A full queue applies
+back-pressure rather than dropping events, failed batches are retried,
+and `stop()` drains the queue before the process exits.
+
+Actions that must commit or roll back together with the change they
+describe call `log_action(..., sync=True)`, which keeps the old
+in-transaction behaviour. Scripts that never start the sink get that
+behaviour too.
+"""
+
+import asyncio
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.models import AuditLog
+
+
+# Attempts per batch before its events are written to stderr instead
+WRITE_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 0.5
+
+
+class AuditSink:
+    """Bounded queue of audit events drained in batches by one background task"""
+
+    def __init__(self, queue_size: int = 10000, batch_size: int = 200, flush_interval: float = 1.0):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        print(f"✓ Audit sink started (batch {self.batch_size}, queue {self.queue_size})")
+
+    async def stop(self, timeout: float = 30.0):
+        """Stop accepting events and write everything already queued"""
+        if self._task is None:
+            return
+        task, queue = self._task, self._queue
+        # New events go through the synchronous path from here on
+        self._task = None
+        await queue.put(None)
+        try:
+            await asyncio.wait_for(task, timeout)
+            # Producers that were blocked on a full queue may have landed after the sentinel
+            late = self._drain(queue)
+            if late:
+                await self._write(late)
+        except asyncio.TimeoutError:
+            print(f"Audit sink: {queue.qsize()} events not written before shutdown timeout")
+            self._dump(self._drain(queue))
+        self._queue = None
+
+    async def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Queue one event; False when the sink is not running (caller writes it itself)"""
+        if not self.running:
+            return False
+        # Waits while the queue is full so events are never dropped
+        await self._queue.put(event)
+        return True
+
+    async def _run(self):
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            first = await queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self._write(batch)
+
+        # Shutdown: whatever is still queued goes out in full batches
+        pending = self._drain(queue)
+        for start in range(0, len(pending), self.batch_size):
+            await self._write(pending[start:start + self.batch_size])
+
+    @staticmethod
+    def _drain(queue: asyncio.Queue) -> List[Dict[str, Any]]:
+        events = []
+        while not queue.empty():
+            event = queue.get_nowait()
+            if event is not None:
+                events.append(event)
+        return events
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        from app.database import async_session_maker
+
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(insert(AuditLog), batch)
+                    await session.commit()
+                self.written += len(batch)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Audit sink: batch of {len(batch)} failed (attempt {attempt}/{WRITE_ATTEMPTS}): {e}")
+                if attempt < WRITE_ATTEMPTS:
+                    await asyncio.sleep(RETRY_DELAY_SECONDS * attempt)
+        self.failed += len(batch)
+        self._dump(batch)
+
+    @staticmethod
+    def _dump(events: List[Dict[str, Any]]):
+        """Last resort: keep undeliverable events in the process log"""
+        for event in events:
+            print(f"AUDIT_UNWRITTEN {json.dumps(event, default=str)}", file=sys.stderr)
+
+
+# Global instance
+audit_sink = AuditSink(
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS
+)
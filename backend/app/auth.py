@@ -2,6 +2,7 @@
 Authentication utilities
 """
 
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
@@ -9,11 +10,12 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, and_
 
 from app.config import settings
 from app.database import get_db
-from app.models import User, UserType
+from app.models import User, UserType, Employee, Manager, Department
+from app.principal_cache import Principal, load_principal, principal_cache
 from app.schemas import TokenData
 
 # Password hashing - use argon2 due to bcrypt/passlib compatibility issues
@@ -48,14 +50,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
-) -> User:
+) -> Principal:
     """Get current authenticated user"""
+    return await get_user_from_token(token, db)
+
+
+async def get_user_from_token(token: Optional[str], db: AsyncSession) -> Principal:
+    """
+    Resolve a JWT to its principal, from the principal cache when warm.
+    Used directly by endpoints that cannot take the Authorization header
+    (e.g. EventSource streams pass ?token=).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    if not token:
+        raise credentials_exception
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
@@ -65,22 +79,23 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    result = await db.execute(select(User).filter(User.username == token_data.username))
-    user = result.scalars().first()
-    
-    if user is None:
-        raise credentials_exception
-    return user
+    principal = principal_cache.get(token_data.username)
+    if principal is None:
+        principal = await load_principal(db, token_data.username)
+        if principal is None:
+            raise credentials_exception
+        principal_cache.put(principal)
+    return principal
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
-async def require_admin(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_admin(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require admin or sub-admin role"""
     if current_user.user_type not in [UserType.ADMIN, UserType.SUB_ADMIN]:
         raise HTTPException(
@@ -90,7 +105,7 @@ async def require_admin(current_user: User = Depends(get_current_active_user)) -
     return current_user
 
 
-async def require_admin_only(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_admin_only(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require admin role only (not sub-admin) - for sensitive operations"""
     if current_user.user_type != UserType.ADMIN:
         raise HTTPException(
@@ -100,7 +115,7 @@ async def require_admin_only(current_user: User = Depends(get_current_active_use
     return current_user
 
 
-async def require_manager(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_manager(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require manager role"""
     if current_user.user_type not in [UserType.ADMIN, UserType.MANAGER]:
         raise HTTPException(
@@ -110,7 +125,7 @@ async def require_manager(current_user: User = Depends(get_current_active_user))
     return current_user
 
 
-async def require_employee(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_employee(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require employee role"""
     if current_user.user_type != UserType.EMPLOYEE:
         raise HTTPException(
@@ -118,3 +133,62 @@ async def require_employee(current_user: User = Depends(get_current_active_user)
             detail="Employee access required"
         )
     return current_user
+
+
+@dataclass
+class CallerContext:
+    """
+    The caller's own records, loaded once per request.
+
+    `employee` / `manager` are the rows linked to the user (either may be
+    None, e.g. for admins) and `department` is the department the caller is
+    scoped to (the managed department for managers).
+    """
+    principal: Principal
+    employee: Optional[Employee] = None
+    manager: Optional[Manager] = None
+    department: Optional[Department] = None
+
+    @property
+    def department_id(self) -> Optional[int]:
+        return self.principal.department_id
+
+
+_CALLER_CONTEXT_KEY = "caller_context"
+
+
+async def resolve_caller(principal: Principal, db: AsyncSession) -> CallerContext:
+    """
+    Load the caller's Employee, Manager and Department in one joined query.
+    The result is memoised on the request's session, so every dependency and
+    helper sharing that session gets the same objects.
+    """
+    cached = db.info.get(_CALLER_CONTEXT_KEY)
+    if cached is not None and cached.principal.id == principal.id:
+        return cached
+
+    if principal.employee_id is None and principal.manager_id is None and principal.department_id is None:
+        context = CallerContext(principal=principal)
+    else:
+        result = await db.execute(
+            select(Employee, Manager, Department)
+            .select_from(User)
+            .outerjoin(Employee, and_(Employee.user_id == User.id, Employee.id == principal.employee_id))
+            .outerjoin(Manager, and_(Manager.user_id == User.id, Manager.id == principal.manager_id))
+            .outerjoin(Department, Department.id == principal.department_id)
+            .filter(User.id == principal.id)
+        )
+        row = result.first()
+        employee, manager, department = row if row is not None else (None, None, None)
+        context = CallerContext(principal=principal, employee=employee, manager=manager, department=department)
+
+    db.info[_CALLER_CONTEXT_KEY] = context
+    return context
+
+
+async def get_caller(
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+) -> CallerContext:
+    """Request-scoped caller context (employee / manager / department)"""
+    return await resolve_caller(current_user, db)
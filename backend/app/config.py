@@ -15,6 +15,41 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
     
+    # Schedule solver (CP-SAT runs in a separate process pool)
+    SOLVER_POOL_SIZE: int = 2  # Worker processes available for solves
+    SOLVER_MAX_CONCURRENT: int = 2  # Solves allowed to run at the same time
+    SOLVER_QUEUE_TIMEOUT_SECONDS: float = 30.0  # How long a solve may wait for a free slot
+    SOLVER_NUM_WORKERS: int = 0  # CP-SAT search workers per solve (0 = cores / SOLVER_MAX_CONCURRENT)
+    
+    # Authenticated principal cache (per process; entries also dropped on user/manager/employee changes)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Live "today" attendance board cache per department (seconds; 0 disables)
+    TODAY_BOARD_CACHE_SECONDS: float = 5.0
+    
+    # Schedule delta sync: days tombstones of deleted schedules are kept (older cursors must resync; 0 = forever)
+    SCHEDULE_TOMBSTONE_RETENTION_DAYS: float = 30.0
+    
+    # Notification push: "memory" (single worker) or "postgres" (LISTEN/NOTIFY across workers)
+    NOTIFICATION_BROKER: str = "memory"
+    
+    # Buffered audit writer (False = every log_action writes inside the caller's transaction)
+    AUDIT_BUFFERED: bool = True
+    AUDIT_QUEUE_SIZE: int = 10000  # Events held in memory before log_action waits
+    AUDIT_BATCH_SIZE: int = 200  # Events per INSERT batch
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0  # Longest an event waits for its batch to fill
+    
+    # Audit log storage (monthly partitions once converted with audit_maintenance.py --partition)
+    AUDIT_PARTITION_MONTHS_AHEAD: int = 3  # Partitions prepared beyond the current month
+    AUDIT_RETENTION_MONTHS: int = 0  # Months kept in the database (0 = keep everything)
+    AUDIT_ARCHIVE_DIR: str = "audit_archive"  # Expired months are written here before removal
+    AUDIT_MAINTENANCE_INTERVAL_HOURS: float = 24.0  # Background maintenance period (0 disables)
+    
+    # Japanese holiday calendar (precomputed span around the current year)
+    HOLIDAY_CALENDAR_YEARS_BACK: int = 5
+    HOLIDAY_CALENDAR_YEARS_AHEAD: int = 10
+    
     # CORS - Allow all localhost ports for development
     CORS_ORIGINS: list = [
         "http://localhost:3000", 
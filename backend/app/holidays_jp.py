@@ -3,23 +3,111 @@ Japanese Calendar and Holiday Utilities
 
 Provides functions to check if a date is a Japanese public holiday
 and to get holiday information.
+
+The calendar is precomputed once per process for a configurable span of
+years: a dense flag array indexed by day ordinal, prefix sums of holidays
+and working days, and the required-shift count of every ISO week. Range and
+week queries are then O(1) lookups or slices instead of day-by-day walks.
+Dates outside the span fall back to the holidays library.
 """
 
+import bisect
+from array import array
 from datetime import date, datetime, timedelta
 from typing import Optional, Dict, List
 import holidays as holidays_lib
 
+from app.config import settings
+
+
+# Day flags stored in the dense calendar array
+FLAG_HOLIDAY = 1
+FLAG_WEEKEND = 2
+FLAG_WORKING = 4
+
+# Changes only with the holidays package; part of the /calendar/holidays ETag
+HOLIDAY_DATA_VERSION = getattr(holidays_lib, "__version__", "unknown")
+
 
 class JapaneseCalendar:
     """Utility class for Japanese calendar operations"""
     
-    def __init__(self):
-        """Initialize Japanese holidays library"""
-        self.holidays_jp = holidays_lib.Japan()
+    def __init__(self, start_year: Optional[int] = None, end_year: Optional[int] = None):
+        """Initialize Japanese holidays library and precompute the calendar span"""
+        this_year = date.today().year
+        self.start_year = start_year or this_year - settings.HOLIDAY_CALENDAR_YEARS_BACK
+        self.end_year = end_year or this_year + settings.HOLIDAY_CALENDAR_YEARS_AHEAD
+        self.holidays_jp = holidays_lib.Japan(years=range(self.start_year, self.end_year + 1))
+        self._build()
+    
+    def _build(self):
+        """Fill the flag array, prefix sums and per-week required shifts"""
+        self._first = date(self.start_year, 1, 1).toordinal()
+        self._last = date(self.end_year, 12, 31).toordinal()
+        size = self._last - self._first + 1
+        
+        self._flags = bytearray(size)
+        self._names: Dict[int, str] = {}
+        # prefix[i] = count over the first i days of the span
+        self._holiday_prefix = array('i', [0]) * (size + 1)
+        self._working_prefix = array('i', [0]) * (size + 1)
+        self._weekday_holiday_prefix = array('i', [0]) * (size + 1)
+        
+        for holiday_date, name in self.holidays_jp.items():
+            ordinal = holiday_date.toordinal()
+            if self._first <= ordinal <= self._last:
+                self._names[ordinal] = name
+        self._holiday_ordinals = sorted(self._names)
+        
+        for i in range(size):
+            ordinal = self._first + i
+            flags = 0
+            weekday = (ordinal - 1) % 7  # date.fromordinal(1) is a Monday
+            if weekday >= 5:
+                flags |= FLAG_WEEKEND
+            if ordinal in self._names:
+                flags |= FLAG_HOLIDAY
+            if not flags:
+                flags = FLAG_WORKING
+            self._flags[i] = flags
+            self._holiday_prefix[i + 1] = self._holiday_prefix[i] + (1 if flags & FLAG_HOLIDAY else 0)
+            self._working_prefix[i + 1] = self._working_prefix[i] + (1 if flags & FLAG_WORKING else 0)
+            self._weekday_holiday_prefix[i + 1] = self._weekday_holiday_prefix[i] + (
+                1 if flags & FLAG_HOLIDAY and weekday < 5 else 0
+            )
+        
+        # Required shifts for every Monday-starting week inside the span
+        first_monday = self._first + (7 - (self._first - 1) % 7) % 7
+        self._first_monday_offset = first_monday - self._first
+        self._week_required = bytearray(
+            self._required_from_holidays(self._weekday_holidays_between(start, start + 6))
+            for start in range(self._first_monday_offset, size - 6, 7)
+        )
+    
+    def _offset(self, target_date: date) -> Optional[int]:
+        """Index of a date in the precomputed span, or None if outside it"""
+        ordinal = target_date.toordinal()
+        if self._first <= ordinal <= self._last:
+            return ordinal - self._first
+        return None
+    
+    def _weekday_holidays_between(self, start: int, end: int) -> int:
+        return self._weekday_holiday_prefix[end + 1] - self._weekday_holiday_prefix[start]
+    
+    @staticmethod
+    def _required_from_holidays(weekday_holidays: int) -> int:
+        # Base 5 shifts, minus 1 for each weekday holiday (never below 4)
+        return max(4, 5 - weekday_holidays)
+    
+    def _in_span(self, start_date: date, end_date: date) -> bool:
+        return self._offset(start_date) is not None and self._offset(end_date) is not None
     
     def is_holiday(self, target_date: date) -> bool:
         """Check if a date is a Japanese public holiday"""
-        return target_date in self.holidays_jp
+        offset = self._offset(target_date)
+        if offset is None:
+            return target_date in self.holidays_jp
+        return bool(self._flags[offset] & FLAG_HOLIDAY)
     
     def is_weekend(self, target_date: date) -> bool:
         """Check if a date is Saturday or Sunday"""
@@ -28,41 +116,80 @@ class JapaneseCalendar:
     
     def is_weekend_or_holiday(self, target_date: date) -> bool:
         """Check if a date is either weekend or public holiday"""
-        return self.is_weekend(target_date) or self.is_holiday(target_date)
+        offset = self._offset(target_date)
+        if offset is None:
+            return self.is_weekend(target_date) or self.is_holiday(target_date)
+        return not self._flags[offset] & FLAG_WORKING
     
     def get_holiday_name(self, target_date: date) -> Optional[str]:
         """Get the name of the holiday for a given date"""
-        if target_date in self.holidays_jp:
-            return self.holidays_jp[target_date]
-        return None
+        offset = self._offset(target_date)
+        if offset is None:
+            return self.holidays_jp.get(target_date)
+        return self._names.get(self._first + offset)
     
     def get_holidays_in_range(self, start_date: date, end_date: date) -> Dict[date, str]:
         """Get all holidays within a date range"""
-        holidays_in_range = {}
-        current_date = start_date
-        
-        while current_date <= end_date:
-            if current_date in self.holidays_jp:
-                holidays_in_range[current_date] = self.holidays_jp[current_date]
-            current_date += timedelta(days=1)
-        
-        return holidays_in_range
+        if not self._in_span(start_date, end_date):
+            return self._walk_holidays(start_date, end_date)
+        lo = bisect.bisect_left(self._holiday_ordinals, start_date.toordinal())
+        hi = bisect.bisect_right(self._holiday_ordinals, end_date.toordinal())
+        return {
+            date.fromordinal(ordinal): self._names[ordinal]
+            for ordinal in self._holiday_ordinals[lo:hi]
+        }
     
     def get_non_working_days_in_range(self, start_date: date, end_date: date) -> Dict[date, str]:
         """Get all non-working days (weekends and holidays) in a date range"""
+        if not self._in_span(start_date, end_date):
+            return self._walk_non_working_days(start_date, end_date)
         non_working = {}
-        current_date = start_date
-        
-        while current_date <= end_date:
-            if self.is_weekend(current_date):
-                day_name = current_date.strftime('%A')
-                non_working[current_date] = day_name
-            elif current_date in self.holidays_jp:
-                non_working[current_date] = self.holidays_jp[current_date]
-            current_date += timedelta(days=1)
-        
+        start = self._offset(start_date)
+        for i, flags in enumerate(self._flags[start:self._offset(end_date) + 1], start):
+            if flags & FLAG_WORKING:
+                continue
+            current_date = date.fromordinal(self._first + i)
+            if flags & FLAG_WEEKEND:
+                non_working[current_date] = current_date.strftime('%A')
+            else:
+                non_working[current_date] = self._names[self._first + i]
         return non_working
     
+    def get_day_counts(self, start_date: date, end_date: date) -> Dict[str, int]:
+        """
+        Count days in a range: public holidays (any weekday), weekends that
+        are not holidays, and working days (neither).
+        """
+        if not self._in_span(start_date, end_date):
+            holidays_in_range = self._walk_holidays(start_date, end_date)
+            total = (end_date - start_date).days + 1
+            weekends = sum(
+                1 for i in range(total)
+                if (start_date + timedelta(days=i)).weekday() >= 5
+                and (start_date + timedelta(days=i)) not in holidays_in_range
+            )
+            return {
+                'total_days': total,
+                'holidays': len(holidays_in_range),
+                'weekends': weekends,
+                'working_days': total - len(holidays_in_range) - weekends
+            }
+        start = self._offset(start_date)
+        end = self._offset(end_date) + 1
+        total = end - start
+        holidays_count = self._holiday_prefix[end] - self._holiday_prefix[start]
+        working = self._working_prefix[end] - self._working_prefix[start]
+        return {
+            'total_days': total,
+            'holidays': holidays_count,
+            'weekends': total - holidays_count - working,
+            'working_days': working
+        }
+    
+    def count_working_days(self, start_date: date, end_date: date) -> int:
+        """Number of days in the range that are neither weekend nor holiday"""
+        return self.get_day_counts(start_date, end_date)['working_days']
+    
     def get_shifts_required_for_week(self, week_start: date) -> int:
         """
         Get the number of shifts required for a week, considering holidays.
@@ -74,20 +201,18 @@ class JapaneseCalendar:
         Returns the minimum shifts required for the week.
         """
         week_end = week_start + timedelta(days=6)  # Full week Mon-Sun
+        if not self._in_span(week_start, week_end):
+            weekday_holidays = sum(
+                1 for i in range(7)
+                if (week_start + timedelta(days=i)).weekday() < 5 and self.is_holiday(week_start + timedelta(days=i))
+            )
+            return self._required_from_holidays(weekday_holidays)
         
-        # Count weekday holidays
-        weekday_holidays = 0
-        current_date = week_start
-        
-        while current_date <= week_end:
-            # Check if it's a weekday (Mon-Fri) and a holiday
-            if current_date.weekday() < 5 and self.is_holiday(current_date):
-                weekday_holidays += 1
-            current_date += timedelta(days=1)
-        
-        # Base 5 shifts, minus 1 for each weekday holiday
-        required_shifts = max(4, 5 - weekday_holidays)
-        return required_shifts
+        start = self._offset(week_start)
+        week_index, remainder = divmod(start - self._first_monday_offset, 7)
+        if remainder == 0 and 0 <= week_index < len(self._week_required):
+            return self._week_required[week_index]
+        return self._required_from_holidays(self._weekday_holidays_between(start, start + 6))
     
     def get_week_info(self, week_start: date) -> Dict:
         """Get comprehensive week information for scheduling"""
@@ -103,33 +228,56 @@ class JapaneseCalendar:
             'required_shifts': 5
         }
         
-        current_date = week_start
-        while current_date <= week_end:
+        for i in range(7):
+            current_date = week_start + timedelta(days=i)
+            is_weekend = self.is_weekend(current_date)
+            holiday_name = self.get_holiday_name(current_date)
+            is_holiday = holiday_name is not None
             day_info = {
                 'date': current_date,
                 'day_name': current_date.strftime('%A'),
-                'is_weekend': self.is_weekend(current_date),
-                'is_holiday': self.is_holiday(current_date),
-                'holiday_name': self.get_holiday_name(current_date),
-                'is_non_working': self.is_weekend_or_holiday(current_date)
+                'is_weekend': is_weekend,
+                'is_holiday': is_holiday,
+                'holiday_name': holiday_name,
+                'is_non_working': is_weekend or is_holiday
             }
             
             week_info['days'].append(day_info)
             
-            if day_info['is_weekend']:
+            if is_weekend:
                 week_info['weekend_count'] += 1
             
-            if day_info['is_holiday']:
+            if is_holiday:
                 week_info['holiday_count'] += 1
-                if not day_info['is_weekend']:
+                if not is_weekend:
                     week_info['weekday_holiday_count'] += 1
-            
-            current_date += timedelta(days=1)
         
         # Calculate required shifts
-        week_info['required_shifts'] = max(4, 5 - week_info['weekday_holiday_count'])
+        week_info['required_shifts'] = self.get_shifts_required_for_week(week_start)
         
         return week_info
+    
+    # ----- Day-by-day fallbacks for dates outside the precomputed span -----
+    
+    def _walk_holidays(self, start_date: date, end_date: date) -> Dict[date, str]:
+        holidays_in_range = {}
+        current_date = start_date
+        while current_date <= end_date:
+            if current_date in self.holidays_jp:
+                holidays_in_range[current_date] = self.holidays_jp[current_date]
+            current_date += timedelta(days=1)
+        return holidays_in_range
+    
+    def _walk_non_working_days(self, start_date: date, end_date: date) -> Dict[date, str]:
+        non_working = {}
+        current_date = start_date
+        while current_date <= end_date:
+            if self.is_weekend(current_date):
+                non_working[current_date] = current_date.strftime('%A')
+            elif current_date in self.holidays_jp:
+                non_working[current_date] = self.holidays_jp[current_date]
+            current_date += timedelta(days=1)
+        return non_working
 
 
 # Global instance
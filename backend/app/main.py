@@ -3,17 +3,19 @@ FastAPI Main Application - Shift Scheduler V5.1
 Complete with Employee Portal, Messaging, and Check-In/Out
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse, StreamingResponse
 import io
+import json
+import asyncio
 import calendar
 from calendar import monthrange
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update, and_, or_, func, Float, Integer
+from sqlalchemy import select, delete, update, and_, or_, func, exists, true, null, case, cast, literal_column, Float, Integer, Numeric
 from sqlalchemy.orm import selectinload, with_loader_criteria
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Optional
@@ -22,22 +24,44 @@ from collections import defaultdict
 from ortools.sat.python import cp_model
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, async_session_maker
 from app.models import (
     User, Department, Manager, Employee, Role, Schedule, LeaveRequest,
     CheckInOut, Message, Notification,
     UserType, LeaveStatus, Attendance, Unavailability, Shift,
     OvertimeTracking, OvertimeRequest, OvertimeWorked, OvertimeStatus,
-    CompOffRequest, CompOffTracking, CompOffDetail, SubAdmin, AuditLog
+    CompOffRequest, CompOffTracking, CompOffDetail, SubAdmin, AuditLog, ScheduleDeletion
 )
 from app.schemas import *
 from app.auth import (
     get_password_hash, verify_password, create_access_token,
-    get_current_active_user, require_admin, require_admin_only, require_manager, require_employee
+    get_current_active_user, get_user_from_token, require_admin, require_admin_only, require_manager, require_employee,
+    CallerContext, get_caller
 )
+from app.principal_cache import Principal
 from app.audit import log_action, get_audit_logs
+from app.audit_sink import audit_sink
+from app.audit_partitions import audit_maintenance, ensure_audit_partitions, is_partitioned as is_audit_partitioned
 from app.schedule_generator import ShiftScheduleGenerator
-from app.holidays_jp import jp_calendar, is_japanese_holiday, get_japanese_holiday_name
+from app.planning_context import PlanningContext
+from app.solver_service import solver_service
+from app.schedule_jobs import schedule_jobs, ScheduleJob, ScheduleJobCancelled
+from app.schedule_repair import repair_schedule
+from app.schedule_writer import ScheduleBuffer
+from app.schedule_validation import ScheduleBatchValidator, validate_schedule_batch
+from app.xlsx_export import StreamingWorkbook, EXPORT_FETCH_SIZE
+from app.attendance_export import (
+    index_by_employee_date, leave_days_index, comprehensive_employee_rows, EMPLOYEE_BATCH_SIZE
+)
+from app.notification_stream import notification_broker, notification_event_stream, queue_notification_push
+from app.pagination import keyset_page, page_cursors, id_keyset_page, id_page_cursor
+from app.attendance_rollup import employee_rollup_totals, install_rollup_triggers, backfill_empty_rollups
+from app.today_board import build_today_board, today_board_cache
+from app.holidays_jp import jp_calendar, is_japanese_holiday, get_japanese_holiday_name, HOLIDAY_DATA_VERSION
+from app.schedule_changes import install_change_tracking, read_schedule_changes, tombstone_purger
+from app.resource_versions import (
+    SCHEDULES_SCOPE, ROLES_SCOPE, install_version_triggers, read_version, make_etag, conditional_response
+)
 from app.excel_translations import get_excel_translation, get_headers_translated
 
 app = FastAPI(
@@ -53,6 +77,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Sync-Cursor", "X-Total-Count", "X-Total-Count-Estimated", "ETag", "Last-Modified"],
 )
 
 
@@ -609,6 +634,153 @@ async def cleanup_duplicate_managers():
         print(f"Cleanup duplicate managers error: {e}")
 
 
+async def add_feed_indexes():
+    """Indexes for keyset-paginated notification/message feeds and unread counts"""
+    from app.database import engine
+    from sqlalchemy import text
+    
+    statements = [
+        # Feed pages: (user, created_at, id) range scans
+        "CREATE INDEX IF NOT EXISTS ix_notifications_user_created ON notifications (user_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_messages_recipient_created ON messages (recipient_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_messages_sender_created ON messages (sender_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_messages_department_created ON messages (department_id, created_at, id)",
+        # Unread badges: partial indexes only hold unread rows, so counts stay small
+        "CREATE INDEX IF NOT EXISTS ix_notifications_user_unread ON notifications (user_id) WHERE is_read = false",
+        "CREATE INDEX IF NOT EXISTS ix_messages_recipient_unread ON messages (recipient_id) WHERE is_read = false",
+        "CREATE INDEX IF NOT EXISTS ix_messages_department_unread ON messages (department_id) WHERE is_read = false",
+    ]
+    
+    try:
+        async with engine.begin() as conn:
+            for statement in statements:
+                try:
+                    await conn.execute(text(statement))
+                except Exception as e:
+                    print(f"Note: Feed index - {e}")
+            print("✓ Feed indexes ready")
+    except Exception as e:
+        print(f"Feed index migration error: {e}")
+
+
+async def add_department_detail_indexes():
+    """Indexes behind the per-employee lookups of the department details view"""
+    from app.database import engine
+    from sqlalchemy import text
+    
+    statements = [
+        # Latest check-in per employee: one backward index scan, first row wins
+        "CREATE INDEX IF NOT EXISTS ix_check_ins_employee_date ON check_ins (employee_id, date, check_in_time)",
+        # Today's shift per employee
+        "CREATE INDEX IF NOT EXISTS ix_schedules_employee_date ON schedules (employee_id, date)",
+    ]
+    
+    try:
+        async with engine.begin() as conn:
+            for statement in statements:
+                try:
+                    await conn.execute(text(statement))
+                except Exception as e:
+                    print(f"Note: Department detail index - {e}")
+            print("✓ Department detail indexes ready")
+    except Exception as e:
+        print(f"Department detail index migration error: {e}")
+
+
+async def add_directory_indexes():
+    """Indexes behind the username/email existence check and employee search"""
+    from app.database import engine
+    from sqlalchemy import text
+    
+    statements = [
+        "CREATE INDEX IF NOT EXISTS ix_users_username_lower ON users (lower(username))",
+        "CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email))",
+        # Substring search needs trigrams; without pg_trgm search falls back to a scan
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_employees_search_trgm ON employees USING gin (({EMPLOYEE_SEARCH_SQL}) gin_trgm_ops)",
+    ]
+    
+    # One transaction per statement so a refused extension does not undo the rest
+    for statement in statements:
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(statement))
+        except Exception as e:
+            print(f"Note: Directory index - {e}")
+    print("✓ Directory indexes ready")
+
+
+async def create_resource_versions():
+    """Change counters and the triggers that bump them (ETags for schedules, roles and shifts)"""
+    from app.database import engine
+    from app.models import Base, ResourceVersion
+    
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[ResourceVersion.__table__])
+            await install_version_triggers(conn)
+            print("✓ Resource version triggers ready")
+    except Exception as e:
+        print(f"Resource version migration error: {e}")
+
+
+async def add_schedule_change_tracking():
+    """change_txid stamps and the deletion log behind GET /schedules/changes"""
+    from app.database import engine
+    from app.models import Base, ScheduleDeletion
+    
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[ScheduleDeletion.__table__])
+            await install_change_tracking(conn)
+            print("✓ Schedule change tracking ready")
+    except Exception as e:
+        print(f"Schedule change tracking migration error: {e}")
+
+
+async def prepare_audit_log_storage():
+    """Keyset index for audit log pages; upcoming monthly partitions once partitioned"""
+    from app.database import engine
+    from sqlalchemy import text
+    
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_audit_logs_created_id ON audit_logs (created_at, id)"
+            ))
+            if await is_audit_partitioned(conn):
+                created = await ensure_audit_partitions(conn, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+                print(f"✓ Audit log partitions ready{' (created ' + ', '.join(created) + ')' if created else ''}")
+            else:
+                print("✓ Audit log indexes ready (run audit_maintenance.py --partition to partition by month)")
+    except Exception as e:
+        print(f"Audit log storage migration error: {e}")
+
+
+async def create_attendance_rollup_tables():
+    """Attendance rollup tables, the triggers that maintain them and the first backfill"""
+    from app.database import engine
+    from app.models import Base, AttendanceDailyRollup, AttendanceMonthlyRollup
+    
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                Base.metadata.create_all,
+                tables=[AttendanceDailyRollup.__table__, AttendanceMonthlyRollup.__table__]
+            )
+            await install_rollup_triggers(conn)
+            print("✓ Attendance rollup triggers ready")
+        
+        # Separate transaction: the backfill must see the triggers committed,
+        # so attendance written meanwhile is not missed
+        async with engine.begin() as conn:
+            counts = await backfill_empty_rollups(conn)
+            if counts:
+                print(f"✓ Attendance rollups backfilled: {counts['daily_rows']} daily, {counts['monthly_rows']} monthly rows")
+    except Exception as e:
+        print(f"Attendance rollup migration error: {e}")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Run all database migrations on startup"""
@@ -626,11 +798,36 @@ async def startup_event():
     await fix_user_email_constraint()
     await cleanup_duplicate_users()
     await cleanup_duplicate_managers()
+    await add_feed_indexes()
+    await add_department_detail_indexes()
+    await create_attendance_rollup_tables()
+    await prepare_audit_log_storage()
+    await create_resource_versions()
+    await add_schedule_change_tracking()
+    await add_directory_indexes()
     
     print("="*60)
     print("All migrations completed!")
     print("="*60 + "\n")
 
+    await notification_broker.start()
+    await audit_maintenance.start()
+    if settings.AUDIT_BUFFERED:
+        await audit_sink.start()
+    await tombstone_purger.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release background workers on shutdown"""
+    schedule_jobs.cancel_all()
+    solver_service.shutdown()
+    await notification_broker.stop()
+    await audit_maintenance.stop()
+    await tombstone_purger.stop()
+    # Write out queued audit events before the process exits
+    await audit_sink.stop()
+
 
 # =============== HELPER FUNCTIONS ===============
 
@@ -736,71 +933,11 @@ async def validate_5_shifts_per_week(
     - Exception 2: Comp-off taken/earned on Mon-Fri counts as fulfilling shift requirement
     - Exception 3: Comp-off earned/taken on Sat-Sun are bonus shifts (don't count)
     
+    For many pairs use ScheduleBatchValidator, which loads them in one query.
     Returns: (is_valid, error_message)
     """
-    week_start = target_date - timedelta(days=target_date.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    # Get required shifts for this week (considering Japanese holidays)
-    required_shifts = jp_calendar.get_shifts_required_for_week(week_start)
-    
-    # Count WEEKDAY (Mon-Fri) coverage: regular shifts + comp-off (both count toward requirement)
-    weekday_coverage_query = select(func.count(Schedule.id)).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'comp_off_taken', 'comp_off_earned', 'leave_half_morning', 'leave_half_afternoon']),
-        # Only count Mon-Fri (1=Mon, 5=Fri in PostgreSQL extraction)
-        func.extract('dow', Schedule.date).in_([1, 2, 3, 4, 5])
-    )
-    
-    if exclude_schedule_id:
-        weekday_coverage_query = weekday_coverage_query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(weekday_coverage_query)
-    weekday_coverage = result.scalar() or 0
-    
-    # Count weekend (Sat-Sun) shifts - only comp-off (earning extra time off) don't count
-    weekend_regular_query = select(func.count(Schedule.id)).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'leave_half_morning', 'leave_half_afternoon']),  # Regular shifts only
-        # Only count Sat-Sun (6=Sat, 0=Sun in PostgreSQL extraction)
-        func.extract('dow', Schedule.date).in_([6, 0])
-    )
-    
-    if exclude_schedule_id:
-        weekend_regular_query = weekend_regular_query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(weekend_regular_query)
-    weekend_regular_shifts = result.scalar() or 0
-    
-    # Get week info for detailed error messaging
-    week_info = jp_calendar.get_week_info(week_start)
-    holiday_str = ""
-    if week_info['weekday_holiday_count'] > 0:
-        holiday_names = [day['holiday_name'] for day in week_info['days'] if day['holiday_name']]
-        holiday_str = f" (Contains {week_info['weekday_holiday_count']} weekday holiday(s): {', '.join(holiday_names)})"
-    
-    # Check if target is weekday or weekend
-    target_weekday = target_date.weekday()  # 0=Mon, 5=Sat, 6=Sun
-    
-    if target_weekday >= 5:
-        # Weekend (Sat-Sun) shift
-        # Check if weekday requirement is already met
-        if weekday_coverage >= required_shifts:
-            return False, f"Cannot assign weekend shift on {target_date} - weekday requirement already met. Employee has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str}"
-        # Weekend regular shifts also count toward total
-        total_shifts = weekday_coverage + weekend_regular_shifts
-        if total_shifts >= required_shifts:
-            return False, f"Cannot assign more than {required_shifts} shifts per week. Employee has {weekday_coverage} weekday + {weekend_regular_shifts} weekend shifts (total: {total_shifts}){holiday_str}"
-    else:
-        # Weekday (Mon-Fri) shift
-        if weekday_coverage >= required_shifts:
-            return False, f"Cannot assign more than {required_shifts} weekday shifts per week. Employee already has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str} (Mon-Sun: {week_start} to {week_end})"
-    
-    return True, ""
+    validator = await ScheduleBatchValidator.load(db, [(employee_id, target_date)], [exclude_schedule_id])
+    return validator.check_weekly(employee_id, target_date)
 
 
 async def validate_consecutive_shifts_limit(
@@ -814,40 +951,10 @@ async def validate_consecutive_shifts_limit(
     Validate that adding a shift on target_date doesn't exceed consecutive shift limit
     Returns: (is_valid, error_message)
     """
-    week_start = target_date - timedelta(days=target_date.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    query = select(Schedule).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'comp_off_taken', 'leave_half_morning', 'leave_half_afternoon'])
-    ).order_by(Schedule.date)
-    
-    if exclude_schedule_id:
-        query = query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(query)
-    existing_schedules = result.scalars().all()
-    
-    # Collect all dates including the new one
-    all_dates = sorted([s.date for s in existing_schedules] + [target_date])
-    all_dates = list(dict.fromkeys(all_dates))  # Remove duplicates while preserving order
-    
-    # Find the longest consecutive sequence
-    max_consecutive_found = 1
-    current_consecutive = 1
-    for i in range(1, len(all_dates)):
-        if (all_dates[i] - all_dates[i-1]).days == 1:
-            current_consecutive += 1
-            max_consecutive_found = max(max_consecutive_found, current_consecutive)
-        else:
-            current_consecutive = 1
-    
-    if max_consecutive_found > max_consecutive:
-        return False, f"Cannot create {max_consecutive_found} consecutive shifts. Maximum allowed is {max_consecutive} consecutive shifts."
-    
-    return True, ""
+    validator = await ScheduleBatchValidator.load(
+        db, [(employee_id, target_date)], [exclude_schedule_id], max_consecutive=max_consecutive
+    )
+    return validator.check_consecutive(employee_id, target_date)
 
 
 # Health check
@@ -977,21 +1084,18 @@ async def read_users_me(
     db: AsyncSession = Depends(get_db)
 ):
     # For managers, include their department_id
-    if current_user.user_type == UserType.MANAGER:
-        mgr_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-        manager = mgr_result.scalars().first()
-        if manager:
-            # Create a response with manager_department_id
-            response_dict = {
-                "id": current_user.id,
-                "username": current_user.username,
-                "email": current_user.email,
-                "full_name": current_user.full_name,
-                "user_type": current_user.user_type,
-                "is_active": current_user.is_active,
-                "manager_department_id": manager.department_id
-            }
-            return response_dict
+    if current_user.user_type == UserType.MANAGER and current_user.manager_id is not None:
+        # Create a response with manager_department_id
+        response_dict = {
+            "id": current_user.id,
+            "username": current_user.username,
+            "email": current_user.email,
+            "full_name": current_user.full_name,
+            "user_type": current_user.user_type,
+            "is_active": current_user.is_active,
+            "manager_department_id": current_user.department_id
+        }
+        return response_dict
     
     return current_user
 
@@ -1033,6 +1137,26 @@ async def list_users(
     return result.scalars().all()
 
 
+@app.get("/admin/users/exists")
+async def check_user_exists(
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Case-insensitive check whether a username and/or email is taken"""
+    if not username and not email:
+        raise HTTPException(status_code=400, detail="Provide username or email")
+    
+    checks = {}
+    if username:
+        checks["username_exists"] = exists().where(func.lower(User.username) == username.strip().lower())
+    if email:
+        checks["email_exists"] = exists().where(func.lower(User.email) == email.strip().lower())
+    row = (await db.execute(select(*(check.label(name) for name, check in checks.items())))).one()
+    return dict(row._mapping)
+
+
 @app.delete("/admin/users/{user_id}")
 async def delete_user(
     user_id: int,
@@ -1161,7 +1285,8 @@ async def create_sub_admin(
             description=f"Created sub-admin for: {display_name}",
             new_values={"employee_id": sub_admin.employee_id, "manager_id": sub_admin.manager_id, "user_id": emp_user.id},
             ip_address=request.client.host if request else None,
-            status="success"
+            status="success",
+            sync=True
         )
     except Exception as log_err:
         print(f"Warning: Failed to log action: {log_err}")
@@ -1266,7 +1391,8 @@ async def delete_sub_admin(
             entity_id=sub_admin_id,
             description=f"Deleted sub-admin for: {display_name}",
             ip_address=request.client.host if request else None,
-            status="success"
+            status="success",
+            sync=True
         )
     except:
         pass
@@ -1285,20 +1411,33 @@ async def get_audit_logs_endpoint(
     user_id: Optional[int] = None,
     limit: int = 100,
     offset: int = 0,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    count: str = "exact",
+    response: Response = None,
     current_user: User = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get audit logs with optional filtering"""
+    """Get audit logs with optional filtering (keyset cursors, total in X-Total-Count)"""
     
-    logs, total = await get_audit_logs(
+    logs, total, estimated = await get_audit_logs(
         db=db,
         action=action,
         entity_type=entity_type,
         user_id=user_id,
         limit=limit,
-        offset=offset
+        offset=offset,
+        before=before,
+        since=since,
+        count=count,
+        response=response
     )
     
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+        if estimated:
+            response.headers["X-Total-Count-Estimated"] = "true"
+    
     return logs
 
 
@@ -1410,93 +1549,141 @@ async def list_departments(
     return result.scalars().all()
 
 
+# Sortable columns of the department details employee list
+DEPARTMENT_DETAIL_SORTS = ("id", "employee_id", "first_name", "last_name", "email", "latest_check_in", "shift_start")
+
+
 @app.get("/departments/{department_id}/details", response_model=DepartmentDetailResponse)
 async def get_department_details(
     department_id: int,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort_by: str = "id",
+    sort_order: str = "asc",
     current_user: User = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Get department details with manager and employees + attendance info"""
-    # Get department
+    if sort_by not in DEPARTMENT_DETAIL_SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort_by must be one of: {', '.join(DEPARTMENT_DETAIL_SORTS)}"
+        )
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort_order must be 'asc' or 'desc'")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    
+    # Department and its manager's user in one query
     dept_result = await db.execute(
-        select(Department).filter(Department.id == department_id)
+        select(Department, Manager.id, Manager.user_id, User.username, User.full_name, User.email)
+        .outerjoin(Manager, Manager.department_id == Department.id)
+        .outerjoin(User, User.id == Manager.user_id)
+        .filter(Department.id == department_id)
+        .order_by(Manager.id)
+        .limit(1)
     )
-    department = dept_result.scalars().first()
+    dept_row = dept_result.first()
     
-    if not department:
+    if not dept_row:
         raise HTTPException(status_code=404, detail="Department not found")
     
-    # Get manager for this department
-    mgr_result = await db.execute(
-        select(Manager).filter(Manager.department_id == department_id)
-    )
-    manager = mgr_result.scalars().first()
+    department, manager_pk, manager_user_id, manager_username, manager_full_name, manager_email = dept_row
     manager_info = None
-    if manager:
-        user_result = await db.execute(
-            select(User).filter(User.id == manager.user_id)
-        )
-        manager_user = user_result.scalars().first()
-        if manager_user:
-            manager_info = {
-                "id": manager.id,
-                "user_id": manager.user_id,
-                "username": manager_user.username,
-                "full_name": manager_user.full_name,
-                "email": manager_user.email
-            }
-    
-    # Get all employees in this department
-    emp_result = await db.execute(
-        select(Employee).filter(
-            Employee.department_id == department_id,
-            Employee.is_active == True
-        ).order_by(Employee.id)
-    )
-    employees = emp_result.scalars().all()
+    if manager_pk is not None and manager_username is not None:
+        manager_info = {
+            "id": manager_pk,
+            "user_id": manager_user_id,
+            "username": manager_username,
+            "full_name": manager_full_name,
+            "email": manager_email
+        }
     
-    # Get today's date
     today = date.today()
     
-    # Get latest attendance for each employee
-    employee_list = []
-    for emp in employees:
-        # Get latest check-in/out
-        checkin_result = await db.execute(
-            select(CheckInOut).filter(
-                CheckInOut.employee_id == emp.id
-            ).order_by(CheckInOut.date.desc(), CheckInOut.check_in_time.desc()).limit(1)
-        )
-        latest_checkin = checkin_result.scalars().first()
-        
-        # Get today's schedule for assigned shift time
-        schedule_result = await db.execute(
-            select(Schedule).filter(
-                Schedule.employee_id == emp.id,
-                Schedule.date == today
+    # Latest check-in and today's shift per employee, as LATERAL subqueries
+    # (index lookups per employee instead of two queries per employee)
+    latest_checkin = (
+        select(CheckInOut.check_in_time, CheckInOut.check_out_time)
+        .where(CheckInOut.employee_id == Employee.id)
+        .order_by(CheckInOut.date.desc(), CheckInOut.check_in_time.desc())
+        .limit(1)
+        .lateral("latest_checkin")
+    )
+    today_shift = (
+        select(Schedule.start_time, Schedule.end_time)
+        .where(Schedule.employee_id == Employee.id, Schedule.date == today)
+        .order_by(Schedule.id)
+        .limit(1)
+        .lateral("today_shift")
+    )
+    
+    sort_columns = {
+        "id": Employee.id,
+        "employee_id": Employee.employee_id,
+        "first_name": Employee.first_name,
+        "last_name": Employee.last_name,
+        "email": Employee.email,
+        "latest_check_in": latest_checkin.c.check_in_time,
+        "shift_start": today_shift.c.start_time,
+    }
+    sort_column = sort_columns[sort_by]
+    sort_column = sort_column.desc() if sort_order == "desc" else sort_column.asc()
+    
+    emp_query = (
+        select(
+            Employee.id, Employee.employee_id, Employee.first_name, Employee.last_name, Employee.email,
+            latest_checkin.c.check_in_time, latest_checkin.c.check_out_time,
+            today_shift.c.start_time, today_shift.c.end_time,
+            func.count().over().label("total_count")
+        )
+        .outerjoin(latest_checkin, true())
+        .outerjoin(today_shift, true())
+        .filter(Employee.department_id == department_id, Employee.is_active == True)
+        .order_by(sort_column.nulls_last(), Employee.id)
+        .offset(offset)
+    )
+    if limit is not None:
+        emp_query = emp_query.limit(limit)
+    rows = (await db.execute(emp_query)).all()
+    
+    if rows:
+        total_employees = rows[0].total_count
+    elif offset:
+        # Paged past the end: the window count has no row to ride on
+        count_result = await db.execute(
+            select(func.count(Employee.id)).filter(
+                Employee.department_id == department_id,
+                Employee.is_active == True
             )
         )
-        today_schedule = schedule_result.scalars().first()
-        
+        total_employees = count_result.scalar() or 0
+    else:
+        total_employees = 0
+    
+    employee_list = []
+    for row in rows:
         # Calculate total hours assigned
         total_hrs_assigned = None
-        if today_schedule and today_schedule.start_time and today_schedule.end_time:
-            start_h, start_m = map(int, today_schedule.start_time.split(':'))
-            end_h, end_m = map(int, today_schedule.end_time.split(':'))
+        if row.start_time and row.end_time:
+            start_h, start_m = map(int, row.start_time.split(':'))
+            end_h, end_m = map(int, row.end_time.split(':'))
             start_decimal = start_h + start_m / 60
             end_decimal = end_h + end_m / 60
             total_hrs_assigned = end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
         
         employee_list.append({
-            "id": emp.id,
-            "employee_id": emp.employee_id,
-            "first_name": emp.first_name,
-            "last_name": emp.last_name,
-            "email": emp.email,
-            "assigned_shift_time": f"{today_schedule.start_time} - {today_schedule.end_time}" if today_schedule and today_schedule.start_time and today_schedule.end_time else None,
+            "id": row.id,
+            "employee_id": row.employee_id,
+            "first_name": row.first_name,
+            "last_name": row.last_name,
+            "email": row.email,
+            "assigned_shift_time": f"{row.start_time} - {row.end_time}" if row.start_time and row.end_time else None,
             "total_hrs_assigned": f"{total_hrs_assigned:.2f}" if total_hrs_assigned else None,
-            "latest_check_in": latest_checkin.check_in_time if latest_checkin else None,
-            "latest_check_out": latest_checkin.check_out_time if latest_checkin else None
+            "latest_check_in": row.check_in_time,
+            "latest_check_out": row.check_out_time
         })
     
     return {
@@ -1505,7 +1692,10 @@ async def get_department_details(
         "name": department.name,
         "description": department.description,
         "manager": manager_info,
-        "employees": employee_list
+        "employees": employee_list,
+        "total_employees": total_employees,
+        "limit": limit,
+        "offset": offset
     }
 
 
@@ -1710,35 +1900,88 @@ async def create_manager(
 
 
 
+# Fields of GET /managers and the columns they come from
+MANAGER_FIELDS = {
+    "id": Manager.id,
+    "manager_id": Manager.manager_id,
+    "user_id": Manager.user_id,
+    "username": User.username,
+    "full_name": User.full_name,
+    "email": User.email,
+    "department_id": Manager.department_id,
+    "is_active": Manager.is_active,
+}
+
+# Fields of GET /employees a `fields=` projection may pick (nested department excluded)
+EMPLOYEE_FIELDS = (
+    "id", "employee_id", "first_name", "last_name", "email", "phone", "address",
+    "department_id", "role_id", "user_id", "employment_type", "weekly_hours",
+    "daily_max_hours", "shifts_per_week", "paid_leave_per_year", "skills", "is_active",
+)
+
+# Text searched by GET /employees?search=; ix_employees_search_trgm indexes this exact expression
+EMPLOYEE_SEARCH_SQL = "lower(first_name || ' ' || last_name || ' ' || employee_id || ' ' || email)"
+
+
+def parse_fields(fields: Optional[str], allowed) -> Optional[List[str]]:
+    """Field names from a `fields=a,b` parameter (id always first); None when not given"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
+
+
+def search_pattern(search: str) -> str:
+    """Lower-cased substring LIKE pattern with wildcards in the term escaped"""
+    term = search.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{term}%"
+
+
+def projected_response(rows: List[Dict], response: Response) -> JSONResponse:
+    """Partial rows bypass the full response model; keep the headers already set (cursor)"""
+    return JSONResponse(content=rows, headers=dict(response.headers))
+
+
 @app.get("/managers", response_model=List[ManagerDetailResponse])
 async def list_managers(
+    response: Response,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: User = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(Manager)
+    """Active managers with their user details, optionally paged, searched and projected"""
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    selected = parse_fields(fields, MANAGER_FIELDS)
+    
+    query = (
+        select(*(MANAGER_FIELDS[name].label(name) for name in selected or MANAGER_FIELDS))
+        .join(User, User.id == Manager.user_id)
         .filter(Manager.is_active == True)
-        .options(selectinload(Manager.user))
     )
-    managers = result.scalars().all()
+    if search and search.strip():
+        pattern = search_pattern(search)
+        query = query.filter(or_(
+            func.lower(User.full_name).like(pattern, escape="\\"),
+            func.lower(User.username).like(pattern, escape="\\"),
+            func.lower(User.email).like(pattern, escape="\\"),
+            func.lower(Manager.manager_id).like(pattern, escape="\\")
+        ))
     
-    # Build response with user details
-    response = []
-    for manager in managers:
-        user = manager.user
-        response.append({
-            'id': manager.id,
-            'manager_id': manager.manager_id,
-            'user_id': manager.user_id,
-            'username': user.username if user else None,
-            'full_name': user.full_name if user else None,
-            'email': user.email if user else None,
-            'department_id': manager.department_id,
-            'is_active': manager.is_active,
-        })
-
-    return response
+    result = await db.execute(id_keyset_page(query, Manager.id, limit, after))
+    managers = [dict(row._mapping) for row in id_page_cursor(result.all(), response, limit, after)]
+    if selected:
+        return projected_response(managers, response)
+    return managers
 
 
 @app.get("/managers-for-sub-admin")
@@ -1784,14 +2027,12 @@ async def list_managers_for_sub_admin(
 @app.get("/managers/me")
 async def get_current_manager(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get the current manager's information"""
     # Get manager record for current user
-    result = await db.execute(
-        select(Manager).filter(Manager.user_id == current_user.id)
-    )
-    manager = result.scalars().first()
+    manager = caller.manager
     
     if not manager:
         raise HTTPException(status_code=404, detail="Manager not found")
@@ -1914,13 +2155,13 @@ async def delete_manager(
 async def create_employee(
     emp_data: EmployeeCreate,
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     # Managers can only create in their department
     # Get the manager's department from Manager table
-    result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-    manager_record = result.scalars().first()
+    manager_record = caller.manager
     
     if manager_record and emp_data.department_id != manager_record.department_id:
         raise HTTPException(status_code=403, detail="Can only create employees in your department")
@@ -2008,51 +2249,50 @@ async def create_employee(
 
 @app.get("/employees", response_model=List[EmployeeResponse])
 async def list_employees(
+    response: Response,
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     show_inactive: bool = False,  # Query parameter to show inactive employees
     department_id: int = None,  # Optional department filter for admins
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    selected = parse_fields(fields, EMPLOYEE_FIELDS)
     filters = []
+    if not show_inactive:
+        filters.append(Employee.is_active == True)
 
     if current_user.user_type == UserType.ADMIN or current_user.user_type == UserType.SUB_ADMIN:
         # Admin and Sub-Admin see all employees, or filtered by department if provided
         if department_id:
             filters.append(Employee.department_id == department_id)
-        if not show_inactive:
-            filters.append(Employee.is_active == True)
-        query = select(Employee).options(selectinload(Employee.department))
-        if filters:
-            query = query.filter(*filters)
-        result = await db.execute(query)
     elif current_user.user_type == UserType.MANAGER:
-        # Get manager's department from Manager table
-        manager_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-        manager = manager_result.scalars().first()
-
-        if manager:
-            filters.append(Employee.department_id == manager.department_id)
-            if not show_inactive:
-                filters.append(Employee.is_active == True)
-            query = select(Employee).options(selectinload(Employee.department))
-            if filters:
-                query = query.filter(*filters)
-            result = await db.execute(query)
-        else:
+        manager = caller.manager
+        if not manager:
             # No manager record, return empty list
-            result = await db.execute(
-                select(Employee).filter(Employee.id == -1)  # Returns empty
-            )
+            return projected_response([], response) if selected else []
+        filters.append(Employee.department_id == manager.department_id)
     else:  # Employee
-        if not show_inactive:
-            filters.append(Employee.is_active == True)
         filters.append(Employee.user_id == current_user.id)
+
+    if search and search.strip():
+        filters.append(literal_column(EMPLOYEE_SEARCH_SQL).like(search_pattern(search), escape="\\"))
+
+    if selected:
+        query = select(*(getattr(Employee, name) for name in selected))
+    else:
         query = select(Employee).options(selectinload(Employee.department))
-        if filters:
-            query = query.filter(*filters)
-        result = await db.execute(query)
+    result = await db.execute(id_keyset_page(query.filter(*filters), Employee.id, limit, after))
 
-    return result.scalars().all()
+    if selected:
+        rows = id_page_cursor(result.all(), response, limit, after)
+        return projected_response([dict(row._mapping) for row in rows], response)
+    return id_page_cursor(result.scalars().all(), response, limit, after)
 
 
 @app.put("/employees/{employee_id}", response_model=EmployeeResponse)
@@ -2060,6 +2300,7 @@ async def update_employee(
     employee_id: int,
     emp_data: EmployeeCreate,
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(Employee).filter(Employee.id == employee_id))
@@ -2070,8 +2311,7 @@ async def update_employee(
     
     if current_user.user_type == UserType.MANAGER:
         # Get manager's department from Manager table
-        manager_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-        manager = manager_result.scalars().first()
+        manager = caller.manager
         
         if not manager or employee.department_id != manager.department_id:
             raise HTTPException(status_code=403, detail="Can only edit employees in your department")
@@ -2248,11 +2488,13 @@ async def create_role(
 
 @app.get("/roles", response_model=List[RoleDetailResponse])
 async def list_roles(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user),
     department_id: int = None,  # Optional department filter for admins
     db: AsyncSession = Depends(get_db)
 ):
-    """List all roles with their shifts (eager loaded)"""
+    """List all roles with their shifts (eager loaded); supports If-None-Match"""
     stmt = select(Role).options(
         selectinload(Role.shifts),
         with_loader_criteria(Shift, Shift.is_active == True)
@@ -2260,6 +2502,7 @@ async def list_roles(
 
     if current_user.user_type == UserType.ADMIN or current_user.user_type == UserType.SUB_ADMIN:
         # Admins can see all active roles, or filter by department if provided
+        scope_department = department_id
         if department_id:
             stmt = stmt.filter(Role.department_id == department_id, Role.is_active == True)
         else:
@@ -2267,11 +2510,18 @@ async def list_roles(
     else:
         # For managers, use get_manager_department helper
         manager_dept = await get_manager_department(current_user, db)
+        scope_department = manager_dept
         stmt = stmt.filter(
             Role.department_id == manager_dept,
             Role.is_active == True
         )
 
+    stamp, last_modified = await read_version(db, ROLES_SCOPE)
+    etag = make_etag("roles", current_user.user_type.value, scope_department, stamp)
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+
     result = await db.execute(stmt)
     return result.scalars().unique().all()
 
@@ -2372,6 +2622,12 @@ async def delete_role(
 # Helper functions to resolve department ownership
 async def get_user_department(user: User, db: AsyncSession) -> Optional[int]:
     """Resolve the department for a manager or employee user"""
+    if isinstance(user, Principal):
+        # Already resolved (and cached) at authentication time
+        if user.user_type in (UserType.MANAGER, UserType.EMPLOYEE):
+            return user.department_id
+        return None
+    
     if user.user_type == UserType.MANAGER:
         result = await db.execute(select(Manager).filter(Manager.user_id == user.id))
         manager = result.scalars().first()
@@ -2398,6 +2654,7 @@ async def get_manager_department(user: User, db: AsyncSession) -> Optional[int]:
 async def check_in(
     check_in_data: CheckInCreate,
     current_user: User = Depends(require_employee),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     try:
@@ -2405,10 +2662,7 @@ async def check_in(
         print(f"[CHECK-IN] User ID: {current_user.id}, Date: {today}")
         
         # Get employee by user_id
-        result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = result.scalars().first()
+        employee = caller.employee
         
         if not employee:
             error_msg = f"Employee record not found for user_id: {current_user.id}"
@@ -2509,6 +2763,7 @@ async def check_in(
         
         db.add(check_in)
         await db.commit()
+        today_board_cache.invalidate(employee.department_id)
         
         # Also create or update Attendance record immediately on check-in
         try:
@@ -2578,6 +2833,7 @@ async def check_in(
 async def check_out(
     check_out_data: CheckOutCreate,
     current_user: User = Depends(require_employee),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     try:
@@ -2585,10 +2841,7 @@ async def check_out(
         print(f"[CHECK-OUT] User ID: {current_user.id}, Date: {today}")
         
         # Get employee by user_id
-        result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = result.scalars().first()
+        employee = caller.employee
         
         if not employee:
             error_msg = f"Employee record not found for user_id: {current_user.id}"
@@ -2615,6 +2868,7 @@ async def check_out(
         check_in.notes = check_out_data.notes
 
         await db.commit()
+        today_board_cache.invalidate(employee.department_id)
         await db.refresh(check_in, ['employee', 'schedule'])
 
         # Create or update Attendance record with overtime calculation
@@ -2764,6 +3018,7 @@ async def check_out(
 async def record_attendance(
     attendance_data: dict,
     current_user: User = Depends(require_employee),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Record attendance for a schedule (check-in)"""
@@ -2771,10 +3026,7 @@ async def record_attendance(
         today = date.today()
         
         # Get employee by user_id
-        result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = result.scalars().first()
+        employee = caller.employee
         
         if not employee:
             raise HTTPException(status_code=400, detail="Employee record not found")
@@ -2831,6 +3083,7 @@ async def get_attendance(
     employee_id: int = None,
     department_id: int = None,  # Optional department filter for admins
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get attendance records with optional filters"""
@@ -2847,10 +3100,7 @@ async def get_attendance(
         manager_dept = None
         if current_user.user_type == UserType.EMPLOYEE:
             # Get employee by user_id
-            emp_result = await db.execute(
-                select(Employee).filter(Employee.user_id == current_user.id)
-            )
-            target_employee = emp_result.scalars().first()
+            target_employee = caller.employee
             if target_employee:
                 query = query.filter(Attendance.employee_id == target_employee.id)
             else:
@@ -2923,94 +3173,55 @@ async def get_todays_attendance(
         if not department_id:
             raise HTTPException(status_code=400, detail="Manager department not found")
 
-    # Get all employees in department
-    emp_result = await db.execute(
-        select(Employee).filter(
-            Employee.department_id == department_id,
-            Employee.is_active == True
-        )
+    return await today_board_cache.get(
+        department_id, today, lambda: build_today_board(db, department_id, today)
     )
-    employees = emp_result.scalars().all()
 
-    # Get today's schedules
-    sched_result = await db.execute(
-        select(Schedule).filter(
-            Schedule.department_id == department_id,
-            Schedule.date == today
-        )
-    )
-    schedules = sched_result.scalars().all()
-    schedule_map = {s.employee_id: s for s in schedules}
 
-    # Get today's check-ins for this department's employees
-    employee_ids = [e.id for e in employees]
-    checkin_result = await db.execute(
-        select(CheckInOut).filter(
-            CheckInOut.date == today,
-            CheckInOut.employee_id.in_(employee_ids)
+@app.get("/attendance/today/departments")
+async def get_todays_attendance_all_departments(
+    department_ids: Optional[str] = None,
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Today's attendance boards for several departments (admin dashboard).
+    department_ids is a comma-separated list; all active departments when omitted.
+    """
+    today = date.today()
+
+    query = select(Department.id, Department.name)
+    if department_ids:
+        try:
+            ids = [int(part) for part in department_ids.split(',') if part.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="department_ids must be comma-separated integers")
+        query = query.filter(Department.id.in_(ids))
+    else:
+        query = query.filter(Department.is_active == True)
+    dept_result = await db.execute(query.order_by(Department.id))
+
+    departments = []
+    for dept_id, dept_name in dept_result.all():
+        board = await today_board_cache.get(
+            dept_id, today, lambda dept_id=dept_id: build_today_board(db, dept_id, today)
         )
-    )
-    checkins = {c.employee_id: c for c in checkin_result.scalars().all()}
+        departments.append({"department_id": dept_id, "department_name": dept_name, **board})
+
+    return {"date": today.isoformat(), "departments": departments}
+
+
+ATTENDANCE_STATS_GROUPS = ("department", "employee", "week", "month")
+ON_TIME_STATUSES = ("on-time",)
+LATE_STATUSES = ("slightly-late", "late")
 
-    # Build attendance summary - include all employees with schedules + all checked-in employees
-    attendance_summary = []
-    included_employees = set()
-    
-    # First, add all employees with schedules
-    for schedule in schedules:
-        checkin = checkins.get(schedule.employee_id)
-        employee = next((e for e in employees if e.id == schedule.employee_id), None)
-
-        status = "absent"
-        if checkin:
-            if checkin.check_out_time:
-                status = "completed"
-            elif checkin.check_in_status == "on-time":
-                status = "present"
-            else:
-                status = checkin.check_in_status
-
-        attendance_summary.append({
-            "employee_id": schedule.employee_id,
-            "employee_name": f"{employee.first_name} {employee.last_name}" if employee else "Unknown",
-            "schedule_id": schedule.id,
-            "scheduled_time": f"{schedule.start_time} - {schedule.end_time}",
-            "check_in_time": checkin.check_in_time.isoformat() if checkin and checkin.check_in_time else None,
-            "check_out_time": checkin.check_out_time.isoformat() if checkin and checkin.check_out_time else None,
-            "status": status
-        })
-        included_employees.add(schedule.employee_id)
-    
-    # Then, add any checked-in employees who don't have a schedule
-    for employee_id, checkin in checkins.items():
-        if employee_id not in included_employees:
-            employee = next((e for e in employees if e.id == employee_id), None)
-            
-            status = "absent"
-            if checkin:
-                if checkin.check_out_time:
-                    status = "completed"
-                elif checkin.check_in_status == "on-time":
-                    status = "present"
-                else:
-                    status = checkin.check_in_status
-            
-            attendance_summary.append({
-                "employee_id": employee_id,
-                "employee_name": f"{employee.first_name} {employee.last_name}" if employee else "Unknown",
-                "schedule_id": None,
-                "scheduled_time": "No Schedule",
-                "check_in_time": checkin.check_in_time.isoformat() if checkin and checkin.check_in_time else None,
-                "check_out_time": checkin.check_out_time.isoformat() if checkin and checkin.check_out_time else None,
-                "status": status
-            })
 
+def _attendance_stats_counts(total: int, on_time: int, late: int) -> dict:
     return {
-        "date": today.isoformat(),
-        "total_scheduled": len(schedules),
-        "total_checked_in": len(checkins),
-        "total_shown": len(attendance_summary),
-        "attendance": attendance_summary
+        "total_days": total,
+        "on_time": on_time,
+        "late": late,
+        "on_time_percentage": round((on_time / total * 100) if total > 0 else 0, 2)
     }
 
 
@@ -3018,14 +3229,42 @@ async def get_todays_attendance(
 async def get_attendance_stats(
     start_date: date,
     end_date: date,
+    group_by: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get attendance statistics"""
-    query = select(CheckInOut).filter(
+    """
+    Get attendance statistics, computed with COUNT(*) FILTER aggregates.
+    Optional group_by: department, employee, week (ISO) or month.
+    """
+    if group_by is not None and group_by not in ATTENDANCE_STATS_GROUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by must be one of: {', '.join(ATTENDANCE_STATS_GROUPS)}"
+        )
+
+    total_col = func.count(CheckInOut.id).label("total")
+    on_time_col = func.count(CheckInOut.id).filter(CheckInOut.check_in_status.in_(ON_TIME_STATUSES)).label("on_time")
+    late_col = func.count(CheckInOut.id).filter(CheckInOut.check_in_status.in_(LATE_STATUSES)).label("late")
+
+    key_cols = []
+    if group_by == "department":
+        key_cols = [Department.id, Department.name]
+    elif group_by == "employee":
+        key_cols = [Employee.id, Employee.employee_id, Employee.first_name, Employee.last_name, Employee.department_id]
+    elif group_by == "week":
+        key_cols = [func.date_trunc('week', CheckInOut.date).label("period_start")]
+    elif group_by == "month":
+        key_cols = [func.date_trunc('month', CheckInOut.date).label("period_start")]
+
+    query = select(*key_cols, total_col, on_time_col, late_col).filter(
         CheckInOut.date >= start_date,
         CheckInOut.date <= end_date
     )
+    if group_by in ("department", "employee"):
+        query = query.join(Employee, CheckInOut.employee_id == Employee.id)
+    if group_by == "department":
+        query = query.join(Department, Employee.department_id == Department.id)
 
     if current_user.user_type == UserType.EMPLOYEE:
         query = query.filter(CheckInOut.employee_id == current_user.employee_id)
@@ -3037,23 +3276,226 @@ async def get_attendance_stats(
         else:
             query = query.filter(CheckInOut.employee_id == -1)  # Return empty
 
+    if key_cols:
+        query = query.group_by(*key_cols).order_by(*key_cols)
+
     result = await db.execute(query)
-    records = result.scalars().all()
+    rows = result.all()
+
+    if not group_by:
+        total, on_time, late = rows[0] if rows else (0, 0, 0)
+        return _attendance_stats_counts(total, on_time, late)
+
+    groups = []
+    for row in rows:
+        entry = _attendance_stats_counts(row.total, row.on_time, row.late)
+        if group_by == "department":
+            entry.update({"department_id": row[0], "department_name": row[1]})
+        elif group_by == "employee":
+            entry.update({
+                "employee_id": row[0],
+                "employee_code": row[1],
+                "employee_name": f"{row[2]} {row[3]}",
+                "department_id": row[4],
+            })
+        else:
+            period_start = row.period_start.date() if isinstance(row.period_start, datetime) else row.period_start
+            if group_by == "week":
+                iso_year, iso_week, _ = period_start.isocalendar()
+                period = f"{iso_year}-W{iso_week:02d}"
+            else:
+                period = period_start.strftime("%Y-%m")
+            entry.update({"period": period, "period_start": period_start.isoformat()})
+        groups.append(entry)
+
+    totals = _attendance_stats_counts(
+        sum(g["total_days"] for g in groups),
+        sum(g["on_time"] for g in groups),
+        sum(g["late"] for g in groups)
+    )
+    return {**totals, "group_by": group_by, "groups": groups}
+
 
-    total = len(records)
-    on_time = len([r for r in records if r.check_in_status == "on-time"])
-    late = len([r for r in records if r.check_in_status in ["slightly-late", "late"]])
+# Attendance Reports (Excel Export)
+# ===== ATTENDANCE EXPORT HELPERS =====
 
+async def _attendance_export_totals(
+    db: AsyncSession,
+    employee_ids: List[int],
+    start_date: date,
+    end_date: date
+) -> dict:
+    """Department totals for the export summary, summed from the attendance rollups"""
+    if not employee_ids:
+        return {'worked_hours': 0, 'overtime_hours': 0, 'days_worked': 0, 'record_count': 0}
+    totals = employee_rollup_totals(start_date, end_date, employee_ids)
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(totals.c.worked_hours), 0),
+            func.coalesce(func.sum(totals.c.worked_days), 0),
+            func.coalesce(func.sum(totals.c.overtime_hours), 0),
+            func.coalesce(func.sum(totals.c.record_count), 0)
+        )
+    )
+    worked_hours, days_worked, overtime_hours, record_count = result.one()
     return {
-        "total_days": total,
-        "on_time": on_time,
-        "late": late,
-        "on_time_percentage": round((on_time / total * 100) if total > 0 else 0, 2)
+        'worked_hours': worked_hours,
+        'overtime_hours': overtime_hours,
+        'days_worked': days_worked,
+        'record_count': record_count
     }
 
 
-# Attendance Reports (Excel Export)
-@app.get("/attendance/export/monthly")
+async def _attendance_export_lookups(
+    db: AsyncSession,
+    employee_ids: List[int],
+    start_date: date,
+    end_date: date
+):
+    """
+    Schedule rows plus comp-off earned/used flags keyed by (employee_id, date).
+    Only the columns the exports print are loaded, not full ORM objects.
+    """
+    schedule_map = {}
+    comp_off_earned_map = {}
+    comp_off_used_map = {}
+    if not employee_ids:
+        return schedule_map, comp_off_earned_map, comp_off_used_map
+
+    sched_result = await db.execute(
+        select(Schedule.employee_id, Schedule.date, Schedule.start_time, Schedule.end_time, Schedule.status).filter(
+            Schedule.employee_id.in_(employee_ids),
+            Schedule.date >= start_date,
+            Schedule.date <= end_date
+        )
+    )
+    for sched in sched_result.all():
+        schedule_map[(sched.employee_id, sched.date)] = sched
+        # Track comp-off earned days
+        if sched.status == 'comp_off_earned':
+            comp_off_earned_map[(sched.employee_id, sched.date)] = True
+
+    # Comp-off details for used days
+    compoff_details_result = await db.execute(
+        select(CompOffDetail.employee_id, CompOffDetail.date).filter(
+            CompOffDetail.employee_id.in_(employee_ids),
+            CompOffDetail.date >= start_date,
+            CompOffDetail.date <= end_date,
+            CompOffDetail.type == 'used'
+        )
+    )
+    for employee_id, detail_date in compoff_details_result.all():
+        detail_date = detail_date.date() if hasattr(detail_date, 'date') else detail_date
+        comp_off_used_map[(employee_id, detail_date)] = True
+
+    return schedule_map, comp_off_earned_map, comp_off_used_map
+
+
+async def _stream_attendance_rows(
+    db: AsyncSession,
+    employee_ids: List[int],
+    start_date: date,
+    end_date: date
+):
+    """Yield attendance rows ordered by date and employee from a server-side cursor"""
+    if not employee_ids:
+        return
+    result = await db.stream(
+        select(
+            Attendance.employee_id, Attendance.date, Attendance.in_time, Attendance.out_time,
+            Attendance.worked_hours, Attendance.break_minutes, Attendance.overtime_hours, Attendance.status
+        ).filter(
+            Attendance.employee_id.in_(employee_ids),
+            Attendance.date >= start_date,
+            Attendance.date <= end_date
+        ).order_by(Attendance.date, Attendance.employee_id)
+        .execution_options(yield_per=EXPORT_FETCH_SIZE)
+    )
+    async for record in result:
+        yield record
+
+
+async def _comprehensive_export_indexes(
+    db: AsyncSession,
+    employee_ids: List[int],
+    start_date: date,
+    end_date: date
+):
+    """
+    (employee_id, date) indexes of one employee batch for the comprehensive
+    export: attendance, check-ins, schedules and approved leave, each read
+    column-only from a server-side cursor.
+    """
+    async def fetch_streamed(query):
+        result = await db.stream(query.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        return [row async for row in result]
+
+    attendance_rows = await fetch_streamed(
+        select(
+            Attendance.employee_id, Attendance.date, Attendance.in_time, Attendance.out_time,
+            Attendance.worked_hours, Attendance.break_minutes, Attendance.overtime_hours,
+            Attendance.status, Attendance.notes
+        ).filter(
+            Attendance.employee_id.in_(employee_ids),
+            Attendance.date >= start_date,
+            Attendance.date <= end_date
+        ).order_by(Attendance.employee_id, Attendance.date, Attendance.id)
+    )
+    checkin_rows = await fetch_streamed(
+        select(
+            CheckInOut.employee_id, CheckInOut.date, CheckInOut.check_in_time,
+            CheckInOut.check_out_time, CheckInOut.check_in_status
+        ).filter(
+            CheckInOut.employee_id.in_(employee_ids),
+            CheckInOut.date >= start_date,
+            CheckInOut.date <= end_date
+        ).order_by(CheckInOut.employee_id, CheckInOut.date, CheckInOut.id)
+    )
+    schedule_rows = await fetch_streamed(
+        select(Schedule.employee_id, Schedule.date, Schedule.start_time, Schedule.end_time, Schedule.status).filter(
+            Schedule.employee_id.in_(employee_ids),
+            Schedule.date >= start_date,
+            Schedule.date <= end_date
+        ).order_by(Schedule.employee_id, Schedule.date, Schedule.id)
+    )
+    leave_rows = await fetch_streamed(
+        select(
+            LeaveRequest.employee_id, LeaveRequest.start_date, LeaveRequest.end_date,
+            LeaveRequest.leave_type, LeaveRequest.duration_type
+        ).filter(
+            LeaveRequest.employee_id.in_(employee_ids),
+            LeaveRequest.start_date <= end_date,
+            LeaveRequest.end_date >= start_date,
+            LeaveRequest.status == LeaveStatus.APPROVED
+        ).order_by(LeaveRequest.employee_id, LeaveRequest.start_date, LeaveRequest.id)
+    )
+    return (
+        index_by_employee_date(attendance_rows, keep_first=True),
+        index_by_employee_date(checkin_rows),
+        index_by_employee_date(schedule_rows),
+        leave_days_index(leave_rows, start_date, end_date)
+    )
+
+
+def _export_shift_cells(schedule) -> tuple:
+    """(assigned shift, total hours assigned) cells for an export row"""
+    total_hrs_assigned = '-'
+    assigned_shift = '-'
+    if schedule and schedule.start_time and schedule.end_time:
+        assigned_shift = f"{schedule.start_time} - {schedule.end_time}"
+        try:
+            start_h, start_m = map(int, schedule.start_time.split(':'))
+            end_h, end_m = map(int, schedule.end_time.split(':'))
+            start_decimal = start_h + start_m / 60
+            end_decimal = end_h + end_m / 60
+            hours = end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
+            total_hrs_assigned = f"{hours:.2f}"
+        except:
+            pass
+    return assigned_shift, total_hrs_assigned
+
+
+@app.get("/attendance/export/monthly")
 async def export_monthly_attendance(
     department_id: int,
     year: int,
@@ -3093,101 +3535,69 @@ async def export_monthly_attendance(
         emp_result = await db.execute(emp_query)
         employees = emp_result.scalars().all()
 
-        # Get attendance for the month
+        # Month range
         start_date = date(year, month, 1)
         end_date = date(year, month, monthrange(year, month)[1])
 
-        att_result = await db.execute(
-            select(Attendance).filter(
-                Attendance.employee_id.in_([e.id for e in employees]) if employees else False,
-                Attendance.date >= start_date,
-                Attendance.date <= end_date
-            ).order_by(Attendance.date, Attendance.employee_id)
-        )
-        attendance_records = att_result.scalars().all()
-
-        # Create workbook
-        wb = Workbook()
-        
-        # Define professional styles
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        title_font = Font(bold=True, size=14)
-        section_font = Font(bold=True, size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+        employee_ids = [e.id for e in employees]
+        employees_by_id = {e.id: e for e in employees}
+
+        # Department totals come from one aggregate; detail rows are streamed below
+        totals = await _attendance_export_totals(db, employee_ids, start_date, end_date)
+        total_worked_hours = totals['worked_hours']
+        total_overtime_hours = totals['overtime_hours']
+        working_days_actual = totals['days_worked']
+
+        # Create write-only workbook (rows go straight to disk, styles are shared)
+        workbook = StreamingWorkbook()
+        summary_ws = workbook.create_sheet("Summary", widths={'A': 35, 'B': 20})
+        ws = workbook.create_sheet(
+            get_excel_translation('attendance_details', language),
+            widths={
+                'A': 13,  # Employee ID
+                'B': 22,  # Name
+                'C': 14,  # Date
+                'D': 30,  # Leave Status
+                'E': 18,  # Assigned Shift
+                'F': 16,  # Total Hrs Assigned
+                'G': 12,  # Check-In
+                'H': 12,  # Check-Out
+                'I': 16,  # Total Hrs Worked
+                'J': 12,  # Break Time
+                'K': 16,  # Overtime Hours
+                'L': 12,  # Status
+                'M': 15,  # Comp-Off Earned
+                'N': 15,  # Comp-Off Used
+            }
         )
-        center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        summary_font = Font(bold=True, color="000000")
-        
-        # Create Summary Sheet First
-        summary_ws = wb.active
-        summary_ws.title = "Summary"
         
         # Title
-        summary_ws['A1'] = f"{department.name} - {get_excel_translation('monthly_attendance_summary', language)}"
-        summary_ws['A1'].font = title_font
-        summary_ws.merge_cells('A1:B1')
-        
-        summary_ws['A2'] = f"{calendar.month_name[month]} {year}"
-        summary_ws['A2'].font = Font(size=11)
-        summary_ws.merge_cells('A2:B2')
-        
-        summary_ws['A3'] = ""
+        summary_ws.append([f"{department.name} - {get_excel_translation('monthly_attendance_summary', language)}"], style='report_title')
+        summary_ws.merge_last(1, 2)
+        summary_ws.append([f"{calendar.month_name[month]} {year}"], style='report_subtitle')
+        summary_ws.merge_last(1, 2)
+        summary_ws.append([""])
         
         # Get all dates in the month to calculate statistics
-        from dateutil.rrule import rrule, DAILY
-        import datetime
-        all_dates = list(rrule(DAILY, dtstart=start_date, until=end_date))
+        total_days_in_month = (end_date - start_date).days + 1
         
-        # Calculate public holidays and weekends
-        from app.holidays_jp import JapaneseCalendar
-        jp_calendar = JapaneseCalendar()
+        # Calculate public holidays and weekends (shared precomputed calendar)
         jp_holidays_dict = jp_calendar.get_holidays_in_range(start_date, end_date)
         
         # Count working days, holidays, weekends
-        public_holidays = 0
-        weekends = 0
-        working_days_available = 0
-        
-        for current_date in all_dates:
-            date_obj = current_date.date() if hasattr(current_date, 'date') else current_date
-            is_weekend = date_obj.weekday() >= 5  # Saturday = 5, Sunday = 6
-            is_public_holiday = date_obj in jp_holidays_dict
-            
-            if is_public_holiday:
-                public_holidays += 1
-            elif is_weekend:
-                weekends += 1
-            else:
-                working_days_available += 1
-        
-        # Calculate totals from attendance records
-        total_worked_hours = 0
-        total_overtime_hours = 0
-        working_days_actual = 0
-        
-        for record in attendance_records:
-            if record.worked_hours and record.worked_hours > 0:
-                total_worked_hours += record.worked_hours
-                working_days_actual += 1
-            if record.overtime_hours:
-                total_overtime_hours += record.overtime_hours
+        day_counts = jp_calendar.get_day_counts(start_date, end_date)
+        public_holidays = day_counts['holidays']
+        weekends = day_counts['weekends']
+        working_days_available = day_counts['working_days']
         
         # Summary data with styling
-        summary_ws['A4'] = get_excel_translation('department_statistics', language)
-        summary_ws['A4'].font = section_font
-        summary_ws['A4'].fill = summary_fill
-        summary_ws['A4'].border = border
-        summary_ws['B4'].fill = summary_fill
-        summary_ws['B4'].border = border
+        summary_ws.append(
+            [get_excel_translation('department_statistics', language), None],
+            style=['report_section', 'report_section_fill']
+        )
         
         summary_data = [
-            [get_excel_translation('total_days_in_month', language), len(all_dates)],
+            [get_excel_translation('total_days_in_month', language), total_days_in_month],
             [get_excel_translation('public_holidays', language), public_holidays],
             [get_excel_translation('weekends', language), weekends],
             [get_excel_translation('total_non_working_days', language), public_holidays + weekends],
@@ -3198,54 +3608,28 @@ async def export_monthly_attendance(
             [get_excel_translation('total_overtime_hours_all', language), f'{total_overtime_hours:.2f}'],
         ]
         
-        row = 5
         for label, value in summary_data:
-            summary_ws[f'A{row}'] = label
-            summary_ws[f'B{row}'] = value
-            if label:  # Skip empty rows
-                summary_ws[f'A{row}'].font = summary_font
-                summary_ws[f'A{row}'].fill = summary_fill
-                summary_ws[f'B{row}'].border = border
-                summary_ws[f'B{row}'].alignment = Alignment(horizontal='right')
-            summary_ws[f'A{row}'].border = border
-            row += 1
+            if label:
+                summary_ws.append([label, value], style=['report_summary_label', 'report_summary_value'])
+            else:  # Spacer row keeps only the label border
+                summary_ws.append([label, value], style=['report_bordered', None])
         
         # Holiday Details
-        holiday_row = row + 1
-        summary_ws[f'A{holiday_row}'] = get_excel_translation('public_holidays_in_month', language)
-        summary_ws[f'A{holiday_row}'].font = section_font
-        summary_ws[f'A{holiday_row}'].fill = summary_fill
-        summary_ws[f'A{holiday_row}'].border = border
-        summary_ws[f'B{holiday_row}'].fill = summary_fill
-        summary_ws[f'B{holiday_row}'].border = border
-        summary_ws.merge_cells(f'A{holiday_row}:B{holiday_row}')
-        
-        holiday_row += 1
+        summary_ws.blank()
+        summary_ws.append(
+            [get_excel_translation('public_holidays_in_month', language), None],
+            style=['report_section', 'report_section_fill']
+        )
+        summary_ws.merge_last(1, 2)
         for holiday_date, holiday_name in jp_holidays_dict.items():
-            summary_ws[f'A{holiday_row}'] = holiday_date.isoformat()
-            summary_ws[f'B{holiday_row}'] = holiday_name
-            summary_ws[f'A{holiday_row}'].border = border
-            summary_ws[f'B{holiday_row}'].border = border
-            holiday_row += 1
-        
-        # Adjust column widths for summary
-        summary_ws.column_dimensions['A'].width = 35
-        summary_ws.column_dimensions['B'].width = 20
-        
-        # Create Attendance Details Sheet
-        ws = wb.create_sheet("Attendance Details")
-        ws.title = f"{get_excel_translation('attendance_details', language)}"
-
-        # Title and Info
-        ws['A1'] = f"{department.name} - {get_excel_translation('monthly_attendance_report', language)}"
-        ws['A1'].font = title_font
-        ws.merge_cells('A1:N1')
-
-        ws['A2'] = f"{calendar.month_name[month]} {year} | {get_excel_translation('total_employees', language)}: {len(employees)}"
-        ws['A2'].font = Font(size=11)
-        ws.merge_cells('A2:N2')
-
-        ws['A3'] = ""
+            summary_ws.append([holiday_date.isoformat(), holiday_name], style='report_bordered')
+        
+        # Attendance Details Sheet - Title and Info
+        ws.append([f"{department.name} - {get_excel_translation('monthly_attendance_report', language)}"], style='report_title')
+        ws.merge_last(1, 14)
+        ws.append([f"{calendar.month_name[month]} {year} | {get_excel_translation('total_employees', language)}: {len(employees)}"], style='report_subtitle')
+        ws.merge_last(1, 14)
+        ws.append([""])
 
         # Headers - Same as weekly format for consistency
         headers = [
@@ -3264,50 +3648,17 @@ async def export_monthly_attendance(
             get_excel_translation('comp_off_earned', language),
             get_excel_translation('comp_off_used', language)
         ]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = center_alignment
-            cell.border = border
+        ws.append(headers, style='report_header')
 
-        # Get schedules for shift information
-        sched_result = await db.execute(
-            select(Schedule).filter(
-                Schedule.employee_id.in_([e.id for e in employees]) if employees else False,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date
-            )
+        # Schedules, comp-off and leave lookups keyed by (employee_id, date)
+        schedule_map, comp_off_earned_map, comp_off_used_map = await _attendance_export_lookups(
+            db, employee_ids, start_date, end_date
         )
-        schedules = sched_result.scalars().all()
-        schedule_map = {}
-        comp_off_earned_map = {}
-        for sched in schedules:
-            schedule_map[(sched.employee_id, sched.date)] = sched
-            # Track comp-off earned days
-            if sched.status == 'comp_off_earned':
-                comp_off_earned_map[(sched.employee_id, sched.date)] = True
-
-        # Get comp-off details for used days
-        compoff_details_result = await db.execute(
-            select(CompOffDetail).filter(
-                CompOffDetail.employee_id.in_([e.id for e in employees]) if employees else False,
-                CompOffDetail.date >= start_date,
-                CompOffDetail.date <= end_date,
-                CompOffDetail.type == 'used'
-            )
-        )
-        compoff_details = compoff_details_result.scalars().all()
-        comp_off_used_map = {}
-        for detail in compoff_details:
-            detail_date = detail.date.date() if hasattr(detail.date, 'date') else detail.date
-            comp_off_used_map[(detail.employee_id, detail_date)] = True
         
         # Get approved leave requests for the month
         leaves_result = await db.execute(
             select(LeaveRequest).filter(
-                LeaveRequest.employee_id.in_([e.id for e in employees]) if employees else False,
+                LeaveRequest.employee_id.in_(employee_ids) if employees else False,
                 LeaveRequest.start_date <= end_date,
                 LeaveRequest.end_date >= start_date,
                 LeaveRequest.status == LeaveStatus.APPROVED
@@ -3327,25 +3678,17 @@ async def export_monthly_attendance(
                     }
                     leave_map[(leave.employee_id, current_date)] = leave_info
 
-        # Data - Similar to weekly format
-        row = 5
-        for record in attendance_records:
-            employee = next((e for e in employees if e.id == record.employee_id), None)
+        # Data - streamed from a server-side cursor, similar to weekly format
+        center_cols = {1, 3, 7, 8, 9, 10, 11, 12, 13, 14}
+        row_styles = [
+            'report_cell_center' if col in center_cols else 'report_cell_left' for col in range(1, 15)
+        ]
+        alt_row_styles = [style + '_alt' for style in row_styles]
+        async for record in _stream_attendance_rows(db, employee_ids, start_date, end_date):
+            employee = employees_by_id.get(record.employee_id)
             if employee:
                 schedule = schedule_map.get((record.employee_id, record.date))
-                total_hrs_assigned = '-'
-                assigned_shift = '-'
-                if schedule and schedule.start_time and schedule.end_time:
-                    assigned_shift = f"{schedule.start_time} - {schedule.end_time}"
-                    try:
-                        start_h, start_m = map(int, schedule.start_time.split(':'))
-                        end_h, end_m = map(int, schedule.end_time.split(':'))
-                        start_decimal = start_h + start_m / 60
-                        end_decimal = end_h + end_m / 60
-                        hours = end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
-                        total_hrs_assigned = f"{hours:.2f}"
-                    except:
-                        pass
+                assigned_shift, total_hrs_assigned = _export_shift_cells(schedule)
 
                 # Check if comp-off earned or used on this date
                 comp_off_earned_str = '✓ Yes' if comp_off_earned_map.get((record.employee_id, record.date)) else '-'
@@ -3372,62 +3715,26 @@ async def export_monthly_attendance(
                     else:
                         leave_status = f"{leave_info['leave_type'].upper()} - Full Day (1.0)"
 
-                ws.cell(row=row, column=1).value = employee.employee_id
-                ws.cell(row=row, column=2).value = f"{employee.first_name} {employee.last_name}"
-                ws.cell(row=row, column=3).value = record.date.isoformat()
-                ws.cell(row=row, column=4).value = leave_status
-                ws.cell(row=row, column=5).value = assigned_shift
-                ws.cell(row=row, column=6).value = total_hrs_assigned
-                ws.cell(row=row, column=7).value = record.in_time or '-'
-                ws.cell(row=row, column=8).value = record.out_time or '-'
-                ws.cell(row=row, column=9).value = f"{record.worked_hours:.2f}" if record.worked_hours else '-'
-                ws.cell(row=row, column=10).value = f"{record.break_minutes}" if record.break_minutes else '-'
-                ws.cell(row=row, column=11).value = f"{record.overtime_hours:.2f}" if record.overtime_hours else '-'
-                ws.cell(row=row, column=12).value = record.status or '-'
-                ws.cell(row=row, column=13).value = comp_off_earned_str
-                ws.cell(row=row, column=14).value = comp_off_used_str
-                
-                # Apply borders and alignment to all cells
-                for col in range(1, 15):
-                    cell = ws.cell(row=row, column=col)
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center') if col in [1, 3, 7, 8, 9, 10, 11, 12, 13, 14] else Alignment(horizontal='left', vertical='center')
-                    # Alternate row colors for better readability
-                    if row % 2 == 0:
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-                
-                row += 1
-        
-        # Set Summary as the active sheet so it shows first
-        wb.active = wb['Summary']
-        
-        # Adjust column widths for better readability
-        ws.column_dimensions['A'].width = 13  # Employee ID
-        ws.column_dimensions['B'].width = 22  # Name
-        ws.column_dimensions['C'].width = 14  # Date
-        ws.column_dimensions['D'].width = 30  # Leave Status
-        ws.column_dimensions['E'].width = 18  # Assigned Shift
-        ws.column_dimensions['F'].width = 16  # Total Hrs Assigned
-        ws.column_dimensions['G'].width = 12  # Check-In
-        ws.column_dimensions['H'].width = 12  # Check-Out
-        ws.column_dimensions['I'].width = 16  # Total Hrs Worked
-        ws.column_dimensions['J'].width = 12  # Break Time
-        ws.column_dimensions['K'].width = 16  # Overtime Hours
-        ws.column_dimensions['L'].width = 12  # Status
-        ws.column_dimensions['M'].width = 15  # Comp-Off Earned
-        ws.column_dimensions['N'].width = 15  # Comp-Off Used
-
-        # Save to bytes
-        file_bytes = io.BytesIO()
-        wb.save(file_bytes)
-        file_bytes.seek(0)
-
-        return StreamingResponse(
-            iter([file_bytes.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename={department.name}_attendance_{year}-{month:02d}{'_' + employment_type if employment_type else ''}.xlsx"
-            }
+                # Alternate row colors for better readability (sheet row numbers are 1-based)
+                ws.append([
+                    employee.employee_id,
+                    f"{employee.first_name} {employee.last_name}",
+                    record.date.isoformat(),
+                    leave_status,
+                    assigned_shift,
+                    total_hrs_assigned,
+                    record.in_time or '-',
+                    record.out_time or '-',
+                    f"{record.worked_hours:.2f}" if record.worked_hours else '-',
+                    f"{record.break_minutes}" if record.break_minutes else '-',
+                    f"{record.overtime_hours:.2f}" if record.overtime_hours else '-',
+                    record.status or '-',
+                    comp_off_earned_str,
+                    comp_off_used_str
+                ], style=alt_row_styles if (ws.row + 1) % 2 == 0 else row_styles)
+
+        return workbook.response(
+            f"{department.name}_attendance_{year}-{month:02d}{'_' + employment_type if employment_type else ''}.xlsx"
         )
     except Exception as e:
         print(f"Export error: {str(e)}")
@@ -3462,289 +3769,91 @@ async def export_monthly_comprehensive_attendance(
         if not department:
             raise HTTPException(status_code=404, detail="Department not found")
 
-        # Get employees in department
+        # Employee header columns only; their daily rows are loaded batch by batch below
         emp_result = await db.execute(
-            select(Employee).filter(Employee.department_id == department_id, Employee.is_active == True)
-            .order_by(Employee.first_name)
+            select(
+                Employee.id, Employee.employee_id, Employee.first_name, Employee.last_name,
+                Employee.email, Employee.phone
+            ).filter(Employee.department_id == department_id, Employee.is_active == True)
+            .order_by(Employee.first_name, Employee.id)
         )
-        employees = emp_result.scalars().all()
+        employees = emp_result.all()
 
-        # Get attendance for the month
         start_date = date(year, month, 1)
         end_date = date(year, month, monthrange(year, month)[1])
 
-        att_result = await db.execute(
-            select(Attendance).filter(
-                Attendance.employee_id.in_([e.id for e in employees]) if employees else False,
-                Attendance.date >= start_date,
-                Attendance.date <= end_date
-            ).order_by(Attendance.employee_id, Attendance.date)
-        )
-        attendance_records = att_result.scalars().all()
-
-        # Get check-in details
-        checkin_result = await db.execute(
-            select(CheckInOut).filter(
-                CheckInOut.employee_id.in_([e.id for e in employees]) if employees else False,
-                CheckInOut.date >= start_date,
-                CheckInOut.date <= end_date
-            ).order_by(CheckInOut.employee_id, CheckInOut.date)
-        )
-        checkin_records = checkin_result.scalars().all()
-        
-        # Create checkin map for easy lookup
-        checkin_map = {}
-        for record in checkin_records:
-            checkin_map[(record.employee_id, record.date)] = record
-
-        # Get schedules
-        sched_result = await db.execute(
-            select(Schedule).filter(
-                Schedule.employee_id.in_([e.id for e in employees]) if employees else False,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date
-            )
-        )
-        schedules = sched_result.scalars().all()
-        schedule_map = {}
-        for sched in schedules:
-            schedule_map[(sched.employee_id, sched.date)] = sched
-
-        # Get approved leave requests
-        leaves_result = await db.execute(
-            select(LeaveRequest).filter(
-                LeaveRequest.employee_id.in_([e.id for e in employees]) if employees else False,
-                LeaveRequest.start_date <= end_date,
-                LeaveRequest.end_date >= start_date,
-                LeaveRequest.status == LeaveStatus.APPROVED
-            )
-        )
-        leave_requests = leaves_result.scalars().all()
-        leave_map = {}
-        for leave in leave_requests:
-            for i in range((leave.end_date - leave.start_date).days + 1):
-                current_date = leave.start_date + timedelta(days=i)
-                if start_date <= current_date <= end_date:
-                    leave_info = {
-                        'leave_type': leave.leave_type,
-                        'duration_type': leave.duration_type or 'full_day',
-                    }
-                    leave_map[(leave.employee_id, current_date)] = leave_info
-
-        # Create workbook
-        wb = Workbook()
-        summary_ws = wb.active
-        summary_ws.title = "Summary"
-        
-        # Styles
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        emp_header_fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
-        emp_header_font = Font(bold=True, color="FFFFFF", size=10)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+        totals = await _attendance_export_totals(db, [e.id for e in employees], start_date, end_date)
+        attendance_count = totals['record_count']
+
+        # Create write-only workbook (rows go straight to disk, styles are shared)
+        workbook = StreamingWorkbook()
+        summary_ws = workbook.create_sheet("Summary", widths={'A': 25, 'B': 15, 'C': 20, 'D': 20})
+        details_ws = workbook.create_sheet(
+            "All Employee Details",
+            widths={
+                'A': 12, 'B': 5, 'C': 14, 'D': 12, 'E': 12, 'F': 12,
+                'G': 10, 'H': 10, 'I': 12, 'J': 14, 'K': 20,
+            }
         )
         
         # Summary Sheet
-        summary_ws['A1'] = f"{department.name} - Monthly Attendance Summary"
-        summary_ws['A1'].font = Font(bold=True, size=14)
-        summary_ws.merge_cells('A1:D1')
-        
-        summary_ws['A2'] = f"{calendar.month_name[month]} {year}"
-        summary_ws['A2'].font = Font(bold=True, size=12)
-        summary_ws.merge_cells('A2:D2')
+        summary_ws.append([f"{department.name} - Monthly Attendance Summary"], style='report_title')
+        summary_ws.merge_last(1, 4)
+        summary_ws.append([f"{calendar.month_name[month]} {year}"], style='report_subtitle_bold')
+        summary_ws.merge_last(1, 4)
+        summary_ws.blank()
         
         # Department summary stats
-        summary_ws['A4'] = "Report Statistics:"
-        summary_ws['A4'].font = Font(bold=True, size=11)
-        
-        summary_ws['A5'] = "Total Employees"
-        summary_ws['B5'] = len(employees)
-        summary_ws['A6'] = "Total Attendance Records"
-        summary_ws['B6'] = len(attendance_records)
-        summary_ws['A7'] = "Month"
-        summary_ws['B7'] = f"{calendar.month_name[month]} {year}"
-        
-        for row in range(5, 8):
-            summary_ws[f'A{row}'].font = Font(bold=True)
-            summary_ws[f'B{row}'].border = border
-        
-        summary_ws.column_dimensions['A'].width = 25
-        summary_ws.column_dimensions['B'].width = 15
-        summary_ws.column_dimensions['C'].width = 20
-        summary_ws.column_dimensions['D'].width = 20
-
-        # Create Employee Details Sheet with all daily records
-        details_ws = wb.create_sheet("All Employee Details")
-        
-        # Title
-        details_ws['A1'] = f"{department.name} - Complete Monthly Attendance"
-        details_ws['A1'].font = Font(bold=True, size=13)
-        details_ws.merge_cells('A1:M1')
-        
-        details_ws['A2'] = f"{calendar.month_name[month]} {year}"
-        details_ws['A2'].font = Font(bold=True, size=11)
-        details_ws.merge_cells('A2:M2')
-        
-        current_row = 4
-        
-        # Process each employee
-        for employee in employees:
-            # Employee Header with details
-            details_ws[f'A{current_row}'] = "EMPLOYEE DETAILS"
-            details_ws[f'A{current_row}'].fill = emp_header_fill
-            details_ws[f'A{current_row}'].font = emp_header_font
-            details_ws.merge_cells(f'A{current_row}:M{current_row}')
-            current_row += 1
-            
-            # Employee info row
-            emp_info = f"ID: {employee.employee_id} | Name: {employee.first_name} {employee.last_name} | Email: {employee.email} | Phone: {employee.phone or 'N/A'}"
-            details_ws[f'A{current_row}'] = emp_info
-            details_ws[f'A{current_row}'].font = Font(size=10)
-            details_ws.merge_cells(f'A{current_row}:M{current_row}')
-            current_row += 1
-            
-            # Column headers for this employee
-            headers = ['Date', 'Day', 'Shift Time', 'Check-In', 'Check-Out', 'Worked Hours', 'Break Min', 'Overtime', 'Status', 'Leave/Comp-Off', 'Notes']
-            for col, header in enumerate(headers, 1):
-                cell = details_ws.cell(row=current_row, column=col)
-                cell.value = header
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.border = border
-            current_row += 1
-            
-            # Get employee's attendance for the month
-            emp_attendance = [r for r in attendance_records if r.employee_id == employee.id]
-            
-            # Generate all dates and show attendance
-            from dateutil.rrule import rrule, DAILY
-            all_dates = list(rrule(DAILY, dtstart=start_date, until=end_date))
-            
-            for current_date in all_dates:
-                date_obj = current_date.date() if hasattr(current_date, 'date') else current_date
-                day_name = date_obj.strftime('%A')[:3]
-                
-                # Get attendance record for this date
-                att_rec = next((r for r in emp_attendance if r.date == date_obj), None)
-                
-                # Get schedule
-                schedule = schedule_map.get((employee.id, date_obj))
-                
-                # Get leave info
-                leave_info = leave_map.get((employee.id, date_obj))
-                
-                # Get check-in details
-                checkin = checkin_map.get((employee.id, date_obj))
-                
-                # Build leave/comp-off status
-                leave_status = '-'
-                if schedule and schedule.status in ['leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_taken']:
-                    if schedule.status == 'leave_half_morning':
-                        leave_status = "LEAVE-AM"
-                    elif schedule.status == 'leave_half_afternoon':
-                        leave_status = "LEAVE-PM"
-                    elif schedule.status == 'comp_off_taken':
-                        leave_status = "COMP-OFF"
-                    else:
-                        leave_status = "LEAVE"
-                elif leave_info:
-                    if 'half' in leave_info['duration_type']:
-                        leave_status = f"{leave_info['leave_type']}-Half"
-                    else:
-                        leave_status = leave_info['leave_type']
-                
-                # Shift time
-                shift_time = '-'
-                if schedule and schedule.start_time and schedule.end_time:
-                    shift_time = f"{schedule.start_time}-{schedule.end_time}"
-                
-                # Check-in/out times
-                check_in_time = '-'
-                check_out_time = '-'
-                if att_rec:
-                    check_in_time = att_rec.in_time or '-'
-                    check_out_time = att_rec.out_time or '-'
-                elif checkin:
-                    check_in_time = checkin.check_in_time.strftime('%H:%M') if checkin.check_in_time else '-'
-                    check_out_time = checkin.check_out_time.strftime('%H:%M') if checkin.check_out_time else '-'
-                
-                # Worked hours
-                worked_hours = '-'
-                if att_rec and att_rec.worked_hours:
-                    worked_hours = f"{att_rec.worked_hours:.2f}"
-                
-                # Break
-                break_mins = '-'
-                if att_rec and att_rec.break_minutes:
-                    break_mins = str(att_rec.break_minutes)
-                
-                # Overtime
-                overtime = '-'
-                if att_rec and att_rec.overtime_hours and att_rec.overtime_hours > 0:
-                    overtime = f"{att_rec.overtime_hours:.2f}"
-                
-                # Status
-                status_val = '-'
-                if att_rec and att_rec.status:
-                    status_val = att_rec.status
-                elif checkin and checkin.check_in_status:
-                    status_val = checkin.check_in_status
+        summary_ws.append(["Report Statistics:"], style='report_label_bold')
+        summary_stats = [
+            ["Total Employees", len(employees)],
+            ["Total Attendance Records", attendance_count],
+            ["Month", f"{calendar.month_name[month]} {year}"],
+        ]
+        for label, value in summary_stats:
+            summary_ws.append([label, value], style=['report_bold', 'report_bordered'])
+
+        # Employee Details Sheet with all daily records
+        details_ws.append([f"{department.name} - Complete Monthly Attendance"], style='report_title_small')
+        details_ws.merge_last(1, 13)
+        details_ws.append([f"{calendar.month_name[month]} {year}"], style='report_label_bold')
+        details_ws.merge_last(1, 13)
+        details_ws.blank()
+        
+        headers = ['Date', 'Day', 'Shift Time', 'Check-In', 'Check-Out', 'Worked Hours', 'Break Min', 'Overtime', 'Status', 'Leave/Comp-Off', 'Notes']
+        row_styles = ['report_cell_center'] * 10 + ['report_cell_left']
+        
+        # Generate all dates once
+        month_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        
+        # Process employees a batch at a time so only one batch's month is in memory
+        for batch_start in range(0, len(employees), EMPLOYEE_BATCH_SIZE):
+            batch = employees[batch_start:batch_start + EMPLOYEE_BATCH_SIZE]
+            attendance_index, checkin_index, schedule_index, leave_index = await _comprehensive_export_indexes(
+                db, [e.id for e in batch], start_date, end_date
+            )
+            for employee in batch:
+                # Employee Header with details
+                details_ws.append(["EMPLOYEE DETAILS"], style='report_emp_header')
+                details_ws.merge_last(1, 13)
                 
-                # Notes
-                notes = att_rec.notes if att_rec and att_rec.notes else ''
+                # Employee info row
+                emp_info = f"ID: {employee.employee_id} | Name: {employee.first_name} {employee.last_name} | Email: {employee.email} | Phone: {employee.phone or 'N/A'}"
+                details_ws.append([emp_info], style='report_text')
+                details_ws.merge_last(1, 13)
                 
-                # Write row
-                details_ws.cell(row=current_row, column=1).value = date_obj.isoformat()
-                details_ws.cell(row=current_row, column=2).value = day_name
-                details_ws.cell(row=current_row, column=3).value = shift_time
-                details_ws.cell(row=current_row, column=4).value = check_in_time
-                details_ws.cell(row=current_row, column=5).value = check_out_time
-                details_ws.cell(row=current_row, column=6).value = worked_hours
-                details_ws.cell(row=current_row, column=7).value = break_mins
-                details_ws.cell(row=current_row, column=8).value = overtime
-                details_ws.cell(row=current_row, column=9).value = status_val
-                details_ws.cell(row=current_row, column=10).value = leave_status
-                details_ws.cell(row=current_row, column=11).value = notes
+                # Column headers for this employee
+                details_ws.append(headers, style='report_header')
                 
-                # Apply borders and alignment
-                for col in range(1, 12):
-                    cell = details_ws.cell(row=current_row, column=col)
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center' if col != 11 else 'left', vertical='center')
+                for day_row in comprehensive_employee_rows(
+                    employee.id, month_dates, attendance_index, schedule_index, leave_index, checkin_index
+                ):
+                    details_ws.append(day_row, style=row_styles)
                 
-                current_row += 1
-            
-            # Add summary for this employee
-            current_row += 1
-            
-        # Adjust column widths
-        details_ws.column_dimensions['A'].width = 12
-        details_ws.column_dimensions['B'].width = 5
-        details_ws.column_dimensions['C'].width = 14
-        details_ws.column_dimensions['D'].width = 12
-        details_ws.column_dimensions['E'].width = 12
-        details_ws.column_dimensions['F'].width = 12
-        details_ws.column_dimensions['G'].width = 10
-        details_ws.column_dimensions['H'].width = 10
-        details_ws.column_dimensions['I'].width = 12
-        details_ws.column_dimensions['J'].width = 14
-        details_ws.column_dimensions['K'].width = 20
-        
-        # Save to bytes
-        file_bytes = io.BytesIO()
-        wb.save(file_bytes)
-        file_bytes.seek(0)
+                # Add summary for this employee
+                details_ws.blank()
 
-        return StreamingResponse(
-            iter([file_bytes.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={department.name}_complete_attendance_{year}-{month:02d}.xlsx"}
-        )
+        return workbook.response(f"{department.name}_complete_attendance_{year}-{month:02d}.xlsx")
     except Exception as e:
         print(f"Comprehensive export error: {str(e)}")
         import traceback
@@ -3792,100 +3901,54 @@ async def export_weekly_attendance(
         emp_result = await db.execute(emp_query)
         employees = emp_result.scalars().all()
         
-        # Get attendance for the week
-        att_result = await db.execute(
-            select(Attendance).filter(
-                Attendance.employee_id.in_([e.id for e in employees]) if employees else False,
-                Attendance.date >= start_date,
-                Attendance.date <= end_date
-            ).order_by(Attendance.date, Attendance.employee_id)
-        )
-        attendance_records = att_result.scalars().all()
-        
-        # Create workbook
-        wb = Workbook()
-        
-        # Define professional styles (same as monthly)
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        title_font = Font(bold=True, size=14)
-        section_font = Font(bold=True, size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+        employee_ids = [e.id for e in employees]
+        employees_by_id = {e.id: e for e in employees}
+
+        # Weekly totals come from one aggregate; detail rows are streamed below
+        totals = await _attendance_export_totals(db, employee_ids, start_date, end_date)
+        total_worked_hours = totals['worked_hours']
+        total_overtime_hours = totals['overtime_hours']
+        present_count = totals['days_worked']
+        
+        # Create write-only workbook (rows go straight to disk, styles are shared)
+        workbook = StreamingWorkbook()
+        summary_ws = workbook.create_sheet("Summary", widths={'A': 35, 'B': 20})
+        ws = workbook.create_sheet(
+            get_excel_translation('attendance_details', language),
+            widths={
+                'A': 13,  # Employee ID
+                'B': 22,  # Name
+                'C': 14,  # Date
+                'D': 18,  # Assigned Shift
+                'E': 16,  # Total Hrs Assigned
+                'F': 12,  # Check-In
+                'G': 12,  # Check-Out
+                'H': 16,  # Total Hrs Worked
+                'I': 12,  # Break Time
+                'J': 16,  # Overtime Hours
+                'K': 12,  # Status
+                'L': 15,  # Comp-Off Earned
+                'M': 15,  # Comp-Off Used
+            }
         )
-        center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        summary_font = Font(bold=True, color="000000")
-        
-        # Create Summary Sheet First
-        summary_ws = wb.active
-        summary_ws.title = "Summary"
         
         # Summary Title
-        summary_ws['A1'] = f"{department.name} - {get_excel_translation('weekly_attendance_summary', language)}"
-        summary_ws['A1'].font = title_font
-        summary_ws.merge_cells('A1:B1')
-        
-        summary_ws['A2'] = f"{start_date.isoformat()} to {end_date.isoformat()}"
-        summary_ws['A2'].font = Font(size=11)
-        summary_ws.merge_cells('A2:B2')
-        
-        summary_ws['A3'] = ""
+        summary_ws.append([f"{department.name} - {get_excel_translation('weekly_attendance_summary', language)}"], style='report_title')
+        summary_ws.merge_last(1, 2)
+        summary_ws.append([f"{start_date.isoformat()} to {end_date.isoformat()}"], style='report_subtitle')
+        summary_ws.merge_last(1, 2)
+        summary_ws.append([""])
         
-        # Get schedules for shift information
-        sched_result = await db.execute(
-            select(Schedule).filter(
-                Schedule.employee_id.in_([e.id for e in employees]) if employees else False,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date
-            )
-        )
-        schedules = sched_result.scalars().all()
-        schedule_map = {}
-        comp_off_earned_map = {}
-        for sched in schedules:
-            schedule_map[(sched.employee_id, sched.date)] = sched
-            # Track comp-off earned days
-            if sched.status == 'comp_off_earned':
-                comp_off_earned_map[(sched.employee_id, sched.date)] = True
-
-        # Get comp-off details for used days
-        compoff_details_result = await db.execute(
-            select(CompOffDetail).filter(
-                CompOffDetail.employee_id.in_([e.id for e in employees]) if employees else False,
-                CompOffDetail.date >= start_date,
-                CompOffDetail.date <= end_date,
-                CompOffDetail.type == 'used'
-            )
+        # Schedules and comp-off lookups keyed by (employee_id, date)
+        schedule_map, comp_off_earned_map, comp_off_used_map = await _attendance_export_lookups(
+            db, employee_ids, start_date, end_date
         )
-        compoff_details = compoff_details_result.scalars().all()
-        comp_off_used_map = {}
-        for detail in compoff_details:
-            detail_date = detail.date.date() if hasattr(detail.date, 'date') else detail.date
-            comp_off_used_map[(detail.employee_id, detail_date)] = True
-        
-        # Calculate totals from attendance records for summary
-        total_worked_hours = 0
-        total_overtime_hours = 0
-        present_count = 0
-        
-        for record in attendance_records:
-            if record.worked_hours and record.worked_hours > 0:
-                total_worked_hours += record.worked_hours
-                present_count += 1
-            if record.overtime_hours:
-                total_overtime_hours += record.overtime_hours
         
         # Summary data with styling
-        summary_ws['A4'] = get_excel_translation('weekly_statistics', language)
-        summary_ws['A4'].font = section_font
-        summary_ws['A4'].fill = summary_fill
-        summary_ws['A4'].border = border
-        summary_ws['B4'].fill = summary_fill
-        summary_ws['B4'].border = border
+        summary_ws.append(
+            [get_excel_translation('weekly_statistics', language), None],
+            style=['report_section', 'report_section_fill']
+        )
         
         summary_data = [
             [get_excel_translation('total_employees', language), len(employees)],
@@ -3894,35 +3957,15 @@ async def export_weekly_attendance(
             [get_excel_translation('total_overtime_hours_all', language), f'{total_overtime_hours:.2f}'],
         ]
         
-        row = 5
         for label, value in summary_data:
-            summary_ws[f'A{row}'] = label
-            summary_ws[f'B{row}'] = value
-            summary_ws[f'A{row}'].font = summary_font
-            summary_ws[f'A{row}'].fill = summary_fill
-            summary_ws[f'A{row}'].border = border
-            summary_ws[f'B{row}'].border = border
-            summary_ws[f'B{row}'].alignment = Alignment(horizontal='right')
-            row += 1
-        
-        # Adjust column widths for summary
-        summary_ws.column_dimensions['A'].width = 35
-        summary_ws.column_dimensions['B'].width = 20
+            summary_ws.append([label, value], style=['report_summary_label', 'report_summary_value'])
         
-        # Create Attendance Details Sheet
-        ws = wb.create_sheet(get_excel_translation('attendance_details', language))
-        ws.title = get_excel_translation('attendance_details', language)
-        
-        # Title and Info
-        ws['A1'] = f"{department.name} - {get_excel_translation('weekly_attendance_report', language)}"
-        ws['A1'].font = title_font
-        ws.merge_cells('A1:M1')
-
-        ws['A2'] = f"{start_date.isoformat()} to {end_date.isoformat()} | {get_excel_translation('total_employees', language)}: {len(employees)}"
-        ws['A2'].font = Font(size=11)
-        ws.merge_cells('A2:M2')
-
-        ws['A3'] = ""
+        # Attendance Details Sheet - Title and Info
+        ws.append([f"{department.name} - {get_excel_translation('weekly_attendance_report', language)}"], style='report_title')
+        ws.merge_last(1, 13)
+        ws.append([f"{start_date.isoformat()} to {end_date.isoformat()} | {get_excel_translation('total_employees', language)}: {len(employees)}"], style='report_subtitle')
+        ws.merge_last(1, 13)
+        ws.append([""])
         
         # Headers - Added Comp-Off columns
         headers = [
@@ -3940,92 +3983,43 @@ async def export_weekly_attendance(
             get_excel_translation('comp_off_earned', language),
             get_excel_translation('comp_off_used', language)
         ]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = center_alignment
-            cell.border = border
+        ws.append(headers, style='report_header')
         
-        # Data
-        row = 5
-        for record in attendance_records:
-            employee = next((e for e in employees if e.id == record.employee_id), None)
+        # Data - streamed from a server-side cursor
+        center_cols = {1, 3, 6, 7, 8, 9, 10, 11, 12, 13}
+        row_styles = [
+            'report_cell_center' if col in center_cols else 'report_cell_left' for col in range(1, 14)
+        ]
+        alt_row_styles = [style + '_alt' for style in row_styles]
+        async for record in _stream_attendance_rows(db, employee_ids, start_date, end_date):
+            employee = employees_by_id.get(record.employee_id)
             if employee:
                 schedule = schedule_map.get((record.employee_id, record.date))
-                total_hrs_assigned = '-'
-                assigned_shift = '-'
-                if schedule and schedule.start_time and schedule.end_time:
-                    assigned_shift = f"{schedule.start_time} - {schedule.end_time}"
-                    try:
-                        start_h, start_m = map(int, schedule.start_time.split(':'))
-                        end_h, end_m = map(int, schedule.end_time.split(':'))
-                        start_decimal = start_h + start_m / 60
-                        end_decimal = end_h + end_m / 60
-                        hours = end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
-                        total_hrs_assigned = f"{hours:.2f}"
-                    except:
-                        pass
+                assigned_shift, total_hrs_assigned = _export_shift_cells(schedule)
 
                 # Check if comp-off earned or used on this date
                 comp_off_earned_str = '✓ Yes' if comp_off_earned_map.get((record.employee_id, record.date)) else '-'
                 comp_off_used_str = '✓ Yes' if comp_off_used_map.get((record.employee_id, record.date)) else '-'
 
-                ws.cell(row=row, column=1).value = employee.employee_id
-                ws.cell(row=row, column=2).value = f"{employee.first_name} {employee.last_name}"
-                ws.cell(row=row, column=3).value = record.date.isoformat()
-                ws.cell(row=row, column=4).value = assigned_shift
-                ws.cell(row=row, column=5).value = total_hrs_assigned
-                ws.cell(row=row, column=6).value = record.in_time or '-'
-                ws.cell(row=row, column=7).value = record.out_time or '-'
-                ws.cell(row=row, column=8).value = f"{record.worked_hours:.2f}" if record.worked_hours else '-'
-                ws.cell(row=row, column=9).value = f"{record.break_minutes}" if record.break_minutes else '-'
-                ws.cell(row=row, column=10).value = f"{record.overtime_hours:.2f}" if record.overtime_hours else '-'
-                ws.cell(row=row, column=11).value = record.status or '-'
-                ws.cell(row=row, column=12).value = comp_off_earned_str
-                ws.cell(row=row, column=13).value = comp_off_used_str
-                
-                # Apply borders and alignment to all cells
-                for col in range(1, 14):
-                    cell = ws.cell(row=row, column=col)
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center') if col in [1, 3, 6, 7, 8, 9, 10, 11, 12, 13] else Alignment(horizontal='left', vertical='center')
-                    # Alternate row colors for better readability
-                    if row % 2 == 0:
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-                
-                row += 1
-
-        # Adjust column widths for better readability
-        ws.column_dimensions['A'].width = 13  # Employee ID
-        ws.column_dimensions['B'].width = 22  # Name
-        ws.column_dimensions['C'].width = 14  # Date
-        ws.column_dimensions['D'].width = 18  # Assigned Shift
-        ws.column_dimensions['E'].width = 16  # Total Hrs Assigned
-        ws.column_dimensions['F'].width = 12  # Check-In
-        ws.column_dimensions['G'].width = 12  # Check-Out
-        ws.column_dimensions['H'].width = 16  # Total Hrs Worked
-        ws.column_dimensions['I'].width = 12  # Break Time
-        ws.column_dimensions['J'].width = 16  # Overtime Hours
-        ws.column_dimensions['K'].width = 12  # Status
-        ws.column_dimensions['L'].width = 15  # Comp-Off Earned
-        ws.column_dimensions['M'].width = 15  # Comp-Off Used
-
-        # Set Summary as the active sheet so it shows first
-        wb.active = wb['Summary']
-
-        # Save to bytes
-        file_bytes = io.BytesIO()
-        wb.save(file_bytes)
-        file_bytes.seek(0)
-
-        return StreamingResponse(
-            iter([file_bytes.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename={department.name}_attendance_weekly_{start_date.isoformat()}_to_{end_date.isoformat()}{'_' + employment_type if employment_type else ''}.xlsx"
-            }
+                # Alternate row colors for better readability (sheet row numbers are 1-based)
+                ws.append([
+                    employee.employee_id,
+                    f"{employee.first_name} {employee.last_name}",
+                    record.date.isoformat(),
+                    assigned_shift,
+                    total_hrs_assigned,
+                    record.in_time or '-',
+                    record.out_time or '-',
+                    f"{record.worked_hours:.2f}" if record.worked_hours else '-',
+                    f"{record.break_minutes}" if record.break_minutes else '-',
+                    f"{record.overtime_hours:.2f}" if record.overtime_hours else '-',
+                    record.status or '-',
+                    comp_off_earned_str,
+                    comp_off_used_str
+                ], style=alt_row_styles if (ws.row + 1) % 2 == 0 else row_styles)
+
+        return workbook.response(
+            f"{department.name}_attendance_weekly_{start_date.isoformat()}_to_{end_date.isoformat()}{'_' + employment_type if employment_type else ''}.xlsx"
         )
     except Exception as e:
         print(f"Weekly export error: {str(e)}")
@@ -4089,6 +4083,7 @@ async def export_employee_monthly_attendance(
     employee_id: Optional[str] = None,
     language: str = 'en',
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Export employee's monthly attendance report with summary stats
@@ -4114,18 +4109,12 @@ async def export_employee_monthly_attendance(
             
             # For MANAGER, check if employee belongs to their department
             if current_user.user_type == UserType.MANAGER:
-                mgr_result = await db.execute(
-                    select(Manager).filter(Manager.user_id == current_user.id)
-                )
-                manager = mgr_result.scalars().first()
+                manager = caller.manager
                 if manager and employee.department_id != manager.department_id:
                     raise HTTPException(status_code=403, detail="Can only download reports for employees in your department")
         else:
             # Get current user's employee record
-            emp_result = await db.execute(
-                select(Employee).filter(Employee.user_id == current_user.id)
-            )
-            employee = emp_result.scalars().first()
+            employee = caller.employee
             if not employee:
                 raise HTTPException(status_code=404, detail="Employee not found")
         
@@ -4233,26 +4222,14 @@ async def export_employee_monthly_attendance(
         from dateutil.rrule import rrule, DAILY
         all_dates = list(rrule(DAILY, dtstart=start_date, until=end_date))
         
-        # Get public holidays
-        from app.holidays_jp import JapaneseCalendar
-        jp_calendar = JapaneseCalendar()
-        jp_holidays_dict = jp_calendar.get_holidays_in_range(start_date, end_date)
+        # Get public holidays (shared precomputed calendar)
+        day_counts = jp_calendar.get_day_counts(start_date, end_date)
         
         # Count statistics
         total_days_in_month = len(all_dates)
-        public_holidays = len(jp_holidays_dict)
-        weekends = 0
-        working_days_available = 0
-        
-        for current_date in all_dates:
-            date_obj = current_date.date() if hasattr(current_date, 'date') else current_date
-            is_weekend = date_obj.weekday() >= 5
-            is_public_holiday = date_obj in jp_holidays_dict
-            
-            if is_weekend and not is_public_holiday:
-                weekends += 1
-            elif not is_public_holiday and not is_weekend:
-                working_days_available += 1
+        public_holidays = day_counts['holidays']
+        weekends = day_counts['weekends']
+        working_days_available = day_counts['working_days']
         
         # Count leave types
         paid_leave_days = 0
@@ -4548,6 +4525,7 @@ async def export_employee_monthly_attendance(
 async def create_leave_request(
     leave_data: LeaveRequestCreate,
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     # Validate that required fields are provided
@@ -4565,8 +4543,7 @@ async def create_leave_request(
     # Employee can only request for themselves
     if current_user.user_type == UserType.EMPLOYEE:
         # Find employee record linked to this user
-        result = await db.execute(select(Employee).filter(Employee.user_id == current_user.id))
-        employee = result.scalars().first()
+        employee = caller.employee
         if not employee or leave_data.employee_id != employee.id:
             raise HTTPException(status_code=403, detail="Can only request leave for yourself")
     
@@ -4664,15 +4641,13 @@ async def create_leave_request(
 @app.get("/leave-requests", response_model=List[LeaveRequestResponse])
 async def list_leave_requests(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     department_id: int = None,  # Optional department filter for admins
     db: AsyncSession = Depends(get_db)
 ):
     if current_user.user_type == UserType.EMPLOYEE:
         # Get employee record for current user
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalars().first()
+        employee = caller.employee
         if not employee:
             return []
 
@@ -4732,6 +4707,7 @@ async def get_manager_leave_requests(
 async def cancel_leave_request(
     leave_id: int,
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Allow an employee to withdraw a pending leave request before review"""
@@ -4744,8 +4720,7 @@ async def cancel_leave_request(
     if current_user.user_type != UserType.EMPLOYEE:
         raise HTTPException(status_code=403, detail="Only employees can cancel their leave requests")
 
-    emp_result = await db.execute(select(Employee).filter(Employee.user_id == current_user.id))
-    employee = emp_result.scalar_one_or_none()
+    employee = caller.employee
 
     if not employee or leave_request.employee_id != employee.id:
         raise HTTPException(status_code=403, detail="Cannot cancel leave for another employee")
@@ -4762,15 +4737,13 @@ async def cancel_leave_request(
 @app.get("/leave-statistics")
 async def get_leave_statistics(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get leave statistics for current employee (or all if manager/admin)"""
     if current_user.user_type == UserType.EMPLOYEE:
         # Get employee record for current user
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalars().first()
+        employee = caller.employee
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
         
@@ -4832,6 +4805,7 @@ async def get_leave_statistics(
 async def get_employee_leave_statistics(
     employee_id: str,
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get leave statistics for a specific employee (manager only) with monthly breakdown"""
@@ -4839,8 +4813,7 @@ async def get_employee_leave_statistics(
     from collections import defaultdict
     
     # Get the manager record for current user
-    manager_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-    manager = manager_result.scalars().first()
+    manager = caller.manager
     
     if not manager:
         raise HTTPException(status_code=403, detail="User is not a manager")
@@ -4964,6 +4937,7 @@ async def export_leave_compoff_report(
     employee_id: str,
     language: str = 'en',
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Manager exports leave and comp-off report for an employee as Excel
@@ -4972,8 +4946,7 @@ async def export_leave_compoff_report(
     from datetime import date, datetime
     
     # Get the manager record for current user
-    manager_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-    manager = manager_result.scalars().first()
+    manager = caller.manager
     
     if not manager:
         raise HTTPException(status_code=403, detail="User is not a manager")
@@ -5333,6 +5306,7 @@ async def approve_leave(
     leave_id: int,
     approval_data: LeaveApproval,
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(LeaveRequest).filter(LeaveRequest.id == leave_id))
@@ -5342,8 +5316,7 @@ async def approve_leave(
         raise HTTPException(status_code=404, detail="Leave request not found")
 
     # Get the manager record for current user
-    manager_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-    manager = manager_result.scalars().first()
+    manager = caller.manager
 
     if not manager:
         raise HTTPException(status_code=403, detail="User is not a manager")
@@ -5360,9 +5333,21 @@ async def approve_leave(
     employee = emp_result.scalars().first()
 
     # Create schedule entries for all leave types
+    repair_summary = None
     if employee:
         # Handle regular paid/unpaid leaves
         if leave_request.leave_type in ['paid', 'unpaid']:
+            # Full-day leave frees the employee's work shifts: hand them to colleagues
+            # in the same role and week instead of regenerating the department
+            if not (leave_request.duration_type and leave_request.duration_type.startswith('half_day')):
+                leave_days = (leave_request.end_date - leave_request.start_date).days + 1
+                repair_summary = await repair_schedule(
+                    db,
+                    [(employee.id, leave_request.start_date + timedelta(days=i)) for i in range(leave_days)],
+                    reason=f"{leave_request.leave_type} leave approved",
+                    release_uncovered=True
+                )
+
             current_date = leave_request.start_date
             while current_date <= leave_request.end_date:
                 # Check if schedule already exists for this date
@@ -5570,6 +5555,14 @@ async def approve_leave(
             else:
                 print(f"[DEBUG] Day {current_date}: No same-day scheduled shift found, using default: {day_shift_start_time}-{day_shift_end_time}", flush=True)
             
+            # Hand the day's work shift to a colleague where possible so the row survives
+            day_repair = await repair_schedule(db, [(employee.id, current_date)], reason="comp-off taken")
+            if repair_summary is None:
+                repair_summary = day_repair
+            else:
+                for key in ("reassigned", "uncovered", "skipped", "feedback"):
+                    repair_summary[key].extend(day_repair[key])
+            
             # Delete any existing non-comp_off_taken schedules for this date to avoid conflicts
             existing_result = await db.execute(
                 select(Schedule).filter(
@@ -5665,7 +5658,10 @@ async def approve_leave(
     except Exception as e:
         print(f"Failed to log leave approval: {e}")
 
-    return {"message": "Leave approved successfully"}
+    response = {"message": "Leave approved successfully"}
+    if repair_summary:
+        response["schedule_repair"] = repair_summary
+    return response
 
 
 @app.post("/manager/reject-leave/{leave_id}")
@@ -5673,6 +5669,7 @@ async def reject_leave(
     leave_id: int,
     approval_data: LeaveApproval,
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(LeaveRequest).filter(LeaveRequest.id == leave_id))
@@ -5686,8 +5683,7 @@ async def reject_leave(
         raise HTTPException(status_code=400, detail="Leave request already rejected")
 
     # Get the manager record for current user
-    manager_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-    manager = manager_result.scalars().first()
+    manager = caller.manager
 
     if not manager:
         raise HTTPException(status_code=403, detail="User is not a manager")
@@ -5790,6 +5786,7 @@ async def reject_leave(
 async def create_comp_off_request(
     comp_off_data: CompOffRequestCreate,
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Employee or Manager creates comp-off request"""
@@ -5809,10 +5806,7 @@ async def create_comp_off_request(
             raise HTTPException(status_code=404, detail="Employee not found")
 
         # Get manager record
-        manager_result = await db.execute(
-            select(Manager).filter(Manager.user_id == current_user.id)
-        )
-        manager = manager_result.scalars().first()
+        manager = caller.manager
 
         if not manager:
             raise HTTPException(status_code=404, detail="Manager record not found")
@@ -5821,10 +5815,7 @@ async def create_comp_off_request(
         manager_id = manager.id
     else:
         # Employee creating comp-off for themselves
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalars().first()
+        employee = caller.employee
 
         if not employee:
             raise HTTPException(status_code=404, detail="Employee record not found")
@@ -5902,6 +5893,7 @@ async def create_comp_off_request(
 @app.get("/comp-off-requests", response_model=List[CompOffRequestResponse])
 async def list_comp_off_requests(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db),
     department_id: int = None
 ):
@@ -5909,10 +5901,7 @@ async def list_comp_off_requests(
     try:
         if current_user.user_type == UserType.EMPLOYEE:
             # Employees see only their own requests
-            emp_result = await db.execute(
-                select(Employee).filter(Employee.user_id == current_user.id)
-            )
-            employee = emp_result.scalars().first()
+            employee = caller.employee
 
             if not employee:
                 return []
@@ -5927,10 +5916,7 @@ async def list_comp_off_requests(
             
         elif current_user.user_type == UserType.MANAGER:
             # Managers see comp-off requests from employees in their department only
-            manager_result = await db.execute(
-                select(Manager).filter(Manager.user_id == current_user.id)
-            )
-            manager = manager_result.scalars().first()
+            manager = caller.manager
 =======
         result = await db.execute(
             select(CompOffRequest)
@@ -6008,13 +5994,11 @@ async def list_comp_off_requests(
 @app.get("/comp-off-tracking", response_model=CompOffTrackingResponse)
 async def get_comp_off_tracking(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get comp-off balance for the current employee"""
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalars().first()
+    employee = caller.employee
     
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
@@ -6038,13 +6022,11 @@ async def get_comp_off_tracking(
 @app.get("/comp-off/balance")
 async def get_comp_off_balance(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get comp-off balance for the current employee (returns simple balance format)"""
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalars().first()
+    employee = caller.employee
     
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
@@ -6068,13 +6050,11 @@ async def get_comp_off_balance(
 @app.get("/comp-off/monthly-breakdown")
 async def get_monthly_comp_off_breakdown(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get month-wise comp-off breakdown showing earned and used days"""
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalars().first()
+    employee = caller.employee
     
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
@@ -6133,13 +6113,11 @@ async def get_monthly_comp_off_breakdown(
 async def validate_comp_off_available(
     month: str,  # Format: "2025-12"
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Check if comp-off is available and not expired for a given month"""
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalars().first()
+    employee = caller.employee
     
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
@@ -6204,6 +6182,7 @@ async def approve_comp_off(
     comp_off_id: int,
     approval_data: LeaveApproval,
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Manager approves comp-off request and creates schedule for that day"""
@@ -6216,10 +6195,7 @@ async def approve_comp_off(
         raise HTTPException(status_code=404, detail="Comp-off request not found")
     
     # Get the manager record
-    manager_result = await db.execute(
-        select(Manager).filter(Manager.user_id == current_user.id)
-    )
-    manager = manager_result.scalars().first()
+    manager = caller.manager
     
     if not manager:
         raise HTTPException(status_code=403, detail="User is not a manager")
@@ -6502,6 +6478,7 @@ async def reject_comp_off(
     comp_off_id: int,
     approval_data: LeaveApproval,
     current_user: User = Depends(require_manager),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Manager rejects comp-off request"""
@@ -6516,10 +6493,7 @@ async def reject_comp_off(
     previous_status = comp_off.status
     
     # Get the manager record
-    manager_result = await db.execute(
-        select(Manager).filter(Manager.user_id == current_user.id)
-    )
-    manager = manager_result.scalars().first()
+    manager = caller.manager
     
     if not manager:
         raise HTTPException(status_code=403, detail="User is not a manager")
@@ -6643,6 +6617,7 @@ async def cancel_comp_off_request(
 @app.get("/comp-off-statistics")
 async def get_comp_off_statistics(
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get comp-off statistics for current employee"""
@@ -6650,10 +6625,7 @@ async def get_comp_off_statistics(
         raise HTTPException(status_code=403, detail="Only employees can access their comp-off statistics")
     
     # Get employee record
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalars().first()
+    employee = caller.employee
     
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
@@ -6685,6 +6657,7 @@ async def get_comp_off_statistics(
 async def export_comp_off_report(
     language: str = 'en',
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Export comp-off records as Excel for current employee
@@ -6694,10 +6667,7 @@ async def export_comp_off_report(
         raise HTTPException(status_code=403, detail="Only employees can download their comp-off reports")
     
     # Get employee
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalars().first()
+    employee = caller.employee
     
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
@@ -6825,42 +6795,76 @@ async def send_message(
     return message
 
 
+def message_visibility_filter(user_id: int, department_id: Optional[int]):
+    """Messages a user can see: sent by them, sent to them, or sent to their department"""
+    conditions = [
+        and_(
+            Message.sender_id == user_id,
+            Message.is_deleted_by_sender == False
+        ),
+        and_(
+            Message.recipient_id == user_id,
+            Message.is_deleted_by_recipient == False
+        ),
+    ]
+    if department_id is not None:
+        conditions.append(
+            and_(
+                Message.department_id == department_id,
+                Message.is_deleted_by_recipient == False
+            )
+        )
+    return or_(*conditions)
+
+
 @app.get("/messages", response_model=List[MessageResponse])
 async def get_messages(
+    response: Response,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Keyset-paginated message feed, newest first.
+    `before` pages back through older messages; `since` returns only
+    messages newer than a previous X-Sync-Cursor (oldest first).
+    """
+    user_department_id = await get_user_department(current_user, db)
+    query = select(Message).options(
+        selectinload(Message.sender),
+        selectinload(Message.recipient)
+    ).filter(message_visibility_filter(current_user.id, user_department_id))
+
+    result = await db.execute(
+        keyset_page(query, Message.created_at, Message.id, limit=limit, before=before, since=since)
+    )
+    return page_cursors(result.scalars().all(), response, limit=limit, since=since)
+
+
+@app.get("/messages/unread-count")
+async def get_unread_message_count(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    # Get messages: either sent by user, sent to user, or sent to their department
+    """Unread messages addressed to the user or their department (served by partial indexes)"""
     user_department_id = await get_user_department(current_user, db)
-    department_filters = []
+    addressed = [
+        and_(Message.recipient_id == current_user.id, Message.is_deleted_by_recipient == False)
+    ]
     if user_department_id is not None:
-        department_filters.append(
-            and_(
-                Message.department_id == user_department_id,
-                Message.is_deleted_by_recipient == False
-            )
+        addressed.append(
+            and_(Message.department_id == user_department_id, Message.is_deleted_by_recipient == False)
         )
-    
     result = await db.execute(
-        select(Message).options(
-            selectinload(Message.sender),
-            selectinload(Message.recipient)
-        ).filter(
-            or_(
-                and_(
-                    Message.sender_id == current_user.id,  # Messages sent by the user
-                    Message.is_deleted_by_sender == False
-                ),
-                and_(
-                    Message.recipient_id == current_user.id,
-                    Message.is_deleted_by_recipient == False
-                ),
-                *department_filters
-            )
-        ).order_by(Message.created_at.desc())
+        select(func.count(Message.id)).filter(
+            Message.is_read == False,
+            Message.sender_id != current_user.id,
+            or_(*addressed)
+        )
     )
-    
-    return result.scalars().all()
+    return {"unread_count": result.scalar() or 0}
 
 
 @app.delete("/messages/{message_id}")
@@ -6933,6 +6937,8 @@ async def create_notification(
         )
         db.add(notification)
         await db.flush()
+        # Pushed to the recipient's open streams once the caller commits
+        queue_notification_push(db, notification)
         return notification
     except Exception as e:
         print(f"Error creating notification: {e}")
@@ -6942,17 +6948,76 @@ async def create_notification(
 # Notifications
 @app.get("/notifications", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
     unread_only: bool = False,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
+    """
+    Keyset-paginated notifications, newest first.
+    `before` pages back through older notifications; `since` returns only
+    notifications newer than a previous X-Sync-Cursor (oldest first).
+    """
     query = select(Notification).filter(Notification.user_id == current_user.id)
 
     if unread_only:
         query = query.filter(Notification.is_read == False)
 
-    result = await db.execute(query.order_by(Notification.created_at.desc()))
-    return result.scalars().all()
+    result = await db.execute(
+        keyset_page(query, Notification.created_at, Notification.id, limit=limit, before=before, since=since)
+    )
+    return page_cursors(result.scalars().all(), response, limit=limit, since=since)
+
+
+@app.get("/notifications/unread-count")
+async def get_unread_notification_count(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Badge count only - an index-only count over the partial unread index"""
+    result = await db.execute(
+        select(func.count(Notification.id)).filter(
+            Notification.user_id == current_user.id,
+            Notification.is_read == False
+        )
+    )
+    return {"unread_count": result.scalar() or 0}
+
+
+@app.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None,
+    last_event_id: Optional[int] = None
+):
+    """
+    Server-Sent Events stream of new notifications for the current user.
+
+    EventSource cannot send headers, so the JWT may be passed as ?token=.
+    Reconnects resume after the Last-Event-ID header (or ?last_event_id=).
+    """
+    if not token:
+        auth_header = request.headers.get("authorization", "")
+        if auth_header.lower().startswith("bearer "):
+            token = auth_header[7:]
+    # Authenticate with a short-lived session; the stream itself holds no connection
+    async with async_session_maker() as db:
+        user = await get_user_from_token(token, db)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+    header_cursor = request.headers.get("last-event-id")
+    if header_cursor and header_cursor.isdigit():
+        last_event_id = int(header_cursor)
+
+    return StreamingResponse(
+        notification_event_stream(request, user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.post("/notifications/{notification_id}/mark-read")
@@ -6984,19 +7049,15 @@ async def mark_all_notifications_read(
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
-        select(Notification).filter(
-            Notification.user_id == current_user.id,
-            Notification.is_read == False
-        )
+        update(Notification)
+        .where(Notification.user_id == current_user.id, Notification.is_read == False)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
     )
-    notifications = result.scalars().all()
-
-    for notification in notifications:
-        notification.is_read = True
 
     await db.commit()
 
-    return {"message": f"{len(notifications)} notifications marked as read"}
+    return {"message": f"{result.rowcount} notifications marked as read"}
 
 
 @app.delete("/notifications/{notification_id}")
@@ -7026,11 +7087,19 @@ async def delete_notification(
 @app.get("/calendar/holidays")
 async def get_holidays(
     year: int,
-    month: int
+    month: int,
+    request: Request,
+    response: Response
 ):
     """Get Japanese holidays for a specific month (public endpoint)"""
     from calendar import monthrange
     
+    # The result only depends on the month and the holiday data
+    etag = make_etag("holidays", year, month, HOLIDAY_DATA_VERSION)
+    not_modified = conditional_response(request, response, etag, cache_control="public, max-age=86400", vary=())
+    if not_modified:
+        return not_modified
+    
     # Get the calendar days for the month
     _, days_in_month = monthrange(year, month)
     start_date = date(year, month, 1)
@@ -7181,85 +7250,148 @@ async def get_week_info(
 
 @app.get("/schedules", response_model=List[ScheduleResponse])
 async def get_schedules(
+    request: Request,
+    response: Response,
     start_date: date = None,
     end_date: date = None,
     department_id: int = None,  # Optional department filter for admins
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
-    query = select(Schedule).options(
-        selectinload(Schedule.employee).selectinload(Employee.user),
-        selectinload(Schedule.role)
-    )
-
+    # Shift times ride along with each row (used for full-day leave placeholders)
+    # and a window count tells whether the (employee, date) has a 'scheduled' row
+    scheduled_in_day = func.count().filter(Schedule.status == 'scheduled').over(
+        partition_by=(Schedule.employee_id, Schedule.date)
+    )
+    query = select(
+        Schedule.id, Schedule.department_id, Schedule.employee_id, Schedule.role_id, Schedule.shift_id,
+        Schedule.date, Schedule.start_time, Schedule.end_time, Schedule.status, Schedule.notes,
+        Shift.start_time.label("shift_start_time"), Shift.end_time.label("shift_end_time"),
+        scheduled_in_day.label("scheduled_in_day")
+    ).outerjoin(Shift, Shift.id == Schedule.shift_id)
+
+    scope_departments = None
     if current_user.user_type == UserType.EMPLOYEE:
         # Get employee by user_id
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalars().first()
+        employee = caller.employee
         if employee:
             query = query.filter(Schedule.employee_id == employee.id)
+            scope_departments = [employee.department_id]
         else:
             return []
     elif current_user.user_type == UserType.MANAGER:
         manager_dept = await get_manager_department(current_user, db)
         if manager_dept:
             query = query.filter(Schedule.department_id == manager_dept)
+            scope_departments = [manager_dept]
         else:
             return []
     elif current_user.user_type in [UserType.ADMIN, UserType.SUB_ADMIN] and department_id:
         # Filter by department if provided for admins
         query = query.filter(Schedule.department_id == department_id)
+        scope_departments = [department_id]
 
     if start_date:
         query = query.filter(Schedule.date >= start_date)
     if end_date:
         query = query.filter(Schedule.date <= end_date)
 
-    result = await db.execute(query.order_by(Schedule.date, Schedule.status))
-    all_schedules = result.scalars().all()
-    
-    # For both employees and managers: filter out leave schedules if a shift schedule exists
-    # Group schedules by (employee_id, date)
-    schedules_by_emp_date = {}
-    for sched in all_schedules:
-        key = (sched.employee_id, sched.date)
-        if key not in schedules_by_emp_date:
-            schedules_by_emp_date[key] = []
-        schedules_by_emp_date[key].append(sched)
-    
-    # For each employee-date combo, keep only the 'scheduled' status if it exists
-    filtered_schedules = []
-    for emp_date_key, scheds in schedules_by_emp_date.items():
-        # Check if there's a 'scheduled' status schedule
-        scheduled_scheds = [s for s in scheds if s.status == 'scheduled']
-        if scheduled_scheds:
-            # Use scheduled status schedules
-            filtered_schedules.extend(scheduled_scheds)
-        else:
-            # Otherwise use whatever is there (leave, comp_off, etc.)
-            for sched in scheds:
-                # For employees viewing leave/comp-off: show empty times (-)
-                # For managers viewing leave/comp-off: show shift times if available
-                if current_user.user_type == UserType.EMPLOYEE and sched.status in ['leave', 'comp_off_taken', 'comp_off_earned']:
-                    # Clear the times for employees on leave
-                    sched.start_time = None
-                    sched.end_time = None
-                elif sched.status in ['leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_earned'] and \
-                   sched.start_time == "00:00" and sched.end_time == "23:59" and sched.shift_id:
-                    # For managers, if it's a leave/comp_off with full-day times, try to get actual shift times
-                    shift_result = await db.execute(
-                        select(Shift).filter(Shift.id == sched.shift_id)
-                    )
-                    shift = shift_result.scalars().first()
-                    if shift and shift.start_time and shift.end_time:
-                        sched.start_time = shift.start_time
-                        sched.end_time = shift.end_time
-                
-                filtered_schedules.append(sched)
-    
-    return filtered_schedules
+    # Conditional GET: answered from the version stamps before schedules are read
+    # (shift times are joined in, so role/shift changes count too)
+    schedule_stamp, schedules_modified = await read_version(
+        db, SCHEDULES_SCOPE, scope_departments, start_date, end_date
+    )
+    roles_stamp, roles_modified = await read_version(db, ROLES_SCOPE)
+    etag = make_etag(
+        "schedules", current_user.user_type.value, caller.employee.id if caller.employee else None,
+        scope_departments, start_date, end_date, schedule_stamp, roles_stamp
+    )
+    last_modified = max(filter(None, [schedules_modified, roles_modified]), default=None)
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    rows = query.subquery()
+
+    # For each employee-date combo, keep only the 'scheduled' rows if any exist,
+    # otherwise whatever is there (leave, comp_off, etc.)
+    keep = or_(rows.c.status == 'scheduled', rows.c.scheduled_in_day == 0)
+
+    # For managers viewing leave/comp-off with full-day times: show the shift times if available
+    use_shift_times = and_(
+        rows.c.status.in_(['leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_earned']),
+        rows.c.start_time == "00:00",
+        rows.c.end_time == "23:59",
+        rows.c.shift_id.isnot(None),
+        func.nullif(rows.c.shift_start_time, '').isnot(None),
+        func.nullif(rows.c.shift_end_time, '').isnot(None)
+    )
+    start_time = case((use_shift_times, rows.c.shift_start_time), else_=rows.c.start_time)
+    end_time = case((use_shift_times, rows.c.shift_end_time), else_=rows.c.end_time)
+    if current_user.user_type == UserType.EMPLOYEE:
+        # For employees viewing leave/comp-off: show empty times (-)
+        on_leave = rows.c.status.in_(['leave', 'comp_off_taken', 'comp_off_earned'])
+        start_time = case((on_leave, null()), else_=start_time)
+        end_time = case((on_leave, null()), else_=end_time)
+
+    result = await db.execute(
+        select(
+            rows.c.id, rows.c.department_id, rows.c.employee_id, rows.c.role_id, rows.c.shift_id,
+            rows.c.date, start_time.label("start_time"), end_time.label("end_time"),
+            rows.c.status, rows.c.notes
+        )
+        .filter(keep)
+        .order_by(rows.c.date, rows.c.employee_id, rows.c.status, rows.c.id)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+
+@app.get("/schedules/changes", response_model=ScheduleChangesResponse)
+async def get_schedule_changes(
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
+    start_date: date = None,
+    end_date: date = None,
+    department_ids: Optional[str] = None,  # Comma-separated, admins only
+    current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delta sync of schedules: rows inserted or updated since the cursor plus ids of deleted rows.
+    Without `since` returns the full scope; keep calling with the returned cursor while has_more.
+    """
+    filters = []
+    deletion_filters = []
+    if current_user.user_type == UserType.EMPLOYEE:
+        employee = caller.employee
+        if not employee:
+            raise HTTPException(status_code=404, detail="Employee profile not found")
+        filters.append(Schedule.employee_id == employee.id)
+        deletion_filters.append(ScheduleDeletion.employee_id == employee.id)
+    elif current_user.user_type == UserType.MANAGER:
+        manager_dept = await get_manager_department(current_user, db)
+        if not manager_dept:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        filters.append(Schedule.department_id == manager_dept)
+        deletion_filters.append(ScheduleDeletion.department_id == manager_dept)
+    elif department_ids:
+        try:
+            ids = [int(part) for part in department_ids.split(',') if part.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="department_ids must be comma-separated integers")
+        filters.append(Schedule.department_id.in_(ids))
+        deletion_filters.append(ScheduleDeletion.department_id.in_(ids))
+
+    if start_date:
+        filters.append(Schedule.date >= start_date)
+        deletion_filters.append(ScheduleDeletion.date >= start_date)
+    if end_date:
+        filters.append(Schedule.date <= end_date)
+        deletion_filters.append(ScheduleDeletion.date <= end_date)
+
+    return await read_schedule_changes(db, filters, deletion_filters, since, limit)
 
 
 @app.post("/schedules", response_model=ScheduleResponse)
@@ -7291,13 +7423,16 @@ async def create_schedule(
         shift_hours = 0
     
     # ===== CONSTRAINT VALIDATION =====
+    # One query loads the employee's week for both checks
+    validator = await ScheduleBatchValidator.load(db, [(schedule_data.employee_id, schedule_data.date)])
+
     # CONSTRAINT 1: Check 5 shifts per week limit
-    is_valid, error_msg = await validate_5_shifts_per_week(schedule_data.employee_id, schedule_data.date, db)
+    is_valid, error_msg = validator.check_weekly(schedule_data.employee_id, schedule_data.date)
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
     
     # CONSTRAINT 2: Check 5 consecutive shifts limit
-    is_valid, error_msg = await validate_consecutive_shifts_limit(schedule_data.employee_id, schedule_data.date, db)
+    is_valid, error_msg = validator.check_consecutive(schedule_data.employee_id, schedule_data.date)
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
     
@@ -7470,6 +7605,44 @@ async def create_schedule(
     return result.scalar_one()
 
 
+@app.post("/schedules/validate-batch")
+async def validate_schedules_batch(
+    request: ScheduleValidationBatchRequest,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Check the weekly shift requirement and consecutive-day limit for many
+    (employee_id, date) pairs before a drag-and-drop move or import.
+
+    All touched employee-weeks are loaded in one query. With accumulate=true
+    each valid item counts against the later items, as if they were created in order.
+    """
+    if not request.items:
+        return {"valid": True, "verdicts": []}
+
+    employee_ids = {item.employee_id for item in request.items}
+    if current_user.user_type == UserType.MANAGER:
+        manager_dept = await get_manager_department(current_user, db)
+        dept_result = await db.execute(
+            select(Employee.id).filter(Employee.id.in_(employee_ids), Employee.department_id == manager_dept)
+        )
+        if set(dept_result.scalars().all()) != employee_ids:
+            raise HTTPException(status_code=403, detail="Can only validate schedules for employees in your department")
+
+    verdicts = await validate_schedule_batch(
+        db,
+        [(item.employee_id, item.date) for item in request.items],
+        exclude_schedule_ids=request.exclude_schedule_ids,
+        accumulate=request.accumulate
+    )
+    return {
+        "valid": all(v["valid"] for v in verdicts),
+        "invalid_count": sum(1 for v in verdicts if not v["valid"]),
+        "verdicts": verdicts
+    }
+
+
 @app.put("/schedules/{schedule_id}", response_model=ScheduleResponse)
 async def update_schedule(
     schedule_id: int,
@@ -7492,13 +7665,15 @@ async def update_schedule(
     if schedule_data.date and schedule_data.date != schedule.date:
         new_date = schedule_data.date if isinstance(schedule_data.date, date) else datetime.strptime(schedule_data.date, '%Y-%m-%d').date()
         
+        validator = await ScheduleBatchValidator.load(db, [(schedule.employee_id, new_date)], [schedule_id])
+
         # CONSTRAINT 1: Check 5 shifts per week limit
-        is_valid, error_msg = await validate_5_shifts_per_week(schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id)
+        is_valid, error_msg = validator.check_weekly(schedule.employee_id, new_date)
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
         
         # CONSTRAINT 2: Check 5 consecutive shifts limit
-        is_valid, error_msg = await validate_consecutive_shifts_limit(schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id)
+        is_valid, error_msg = validator.check_consecutive(schedule.employee_id, new_date)
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
 
@@ -7511,36 +7686,532 @@ async def update_schedule(
     schedule.updated_at = datetime.utcnow()
     await db.commit()
 
-    # Re-fetch with eager loading
-    result = await db.execute(
-        select(Schedule)
-        .filter(Schedule.id == schedule_id)
-        .options(selectinload(Schedule.role))
-    )
-    return result.scalar_one()
+    # Re-fetch with eager loading
+    result = await db.execute(
+        select(Schedule)
+        .filter(Schedule.id == schedule_id)
+        .options(selectinload(Schedule.role))
+    )
+    return result.scalar_one()
+
+
+@app.delete("/schedules/{schedule_id}")
+async def delete_schedule(
+    schedule_id: int,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(select(Schedule).filter(Schedule.id == schedule_id))
+    schedule = result.scalars().first()
+
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+
+    if current_user.user_type == UserType.MANAGER:
+        manager_dept = await get_manager_department(current_user, db)
+        if not manager_dept or schedule.department_id != manager_dept:
+            raise HTTPException(status_code=403, detail="Can only delete schedules in your department")
+
+    await db.delete(schedule)
+    await db.commit()
+
+    return {"message": "Schedule deleted successfully"}
+
+
+async def _generate_department_schedules(
+    db: AsyncSession,
+    department_id: int,
+    start_date: date,
+    end_date: date,
+    regenerate: bool = False,
+    job: Optional[ScheduleJob] = None
+) -> dict:
+    """
+    Core of POST /schedules/generate for an already-authorized department.
+
+    Runs inline for the blocking endpoint or inside a background job. When a
+    job is given, feedback and progress are published on it and the run stops
+    at the next day boundary once cancellation is requested (the caller then
+    rolls the session back, so nothing is persisted).
+    """
+    feedback = job.feedback if job else []
+
+    # ===== NEW: Check if schedules already exist in this date range =====
+    existing_count_result = await db.execute(
+        select(func.count(Schedule.id))
+        .filter(
+            Schedule.department_id == department_id,
+            Schedule.date >= start_date,
+            Schedule.date <= end_date
+        )
+    )
+    existing_count = existing_count_result.scalar() or 0
+    
+    if existing_count and not regenerate:
+        # Return message asking if user wants to regenerate
+        return {
+            "success": False,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "requires_confirmation": True,
+            "existing_count": existing_count,
+            "feedback": [
+                f"⚠️  Found {existing_count} existing schedules for this date range.",
+                "Do you want to regenerate and replace them?"
+            ],
+            "schedules": []
+        }
+    
+    # If regenerate is True, delete existing schedules first (but PRESERVE leaves, comp-off, and schedules with check-ins)
+    if existing_count and regenerate:
+        print(f"[DEBUG] Regenerating - clearing work shifts among {existing_count} existing schedules (excluding ones with check-ins)", flush=True)
+        
+        # Only 'scheduled' rows are deleted (they are recreated below).
+        # Preserve: 'leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_earned', 'comp_off_taken'
+        # comp_off_taken is approved leave and should NOT be deleted!
+        # Rows with check-in records are historical data and are kept as well.
+        # The same predicate drives the nullify and delete statements, so the
+        # ids never round-trip through Python.
+        clear_target = and_(
+            Schedule.department_id == department_id,
+            Schedule.date >= start_date,
+            Schedule.date <= end_date,
+            Schedule.status == 'scheduled',
+            ~exists().where(CheckInOut.schedule_id == Schedule.id)
+        )
+        clear_ids = select(Schedule.id).where(clear_target)
+        
+        # Nullify in CompOffRequest table (preserve comp-off requests)
+        await db.execute(
+            update(CompOffRequest)
+            .where(CompOffRequest.schedule_id.in_(clear_ids))
+            .values(schedule_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Nullify in Attendance table (preserve attendance records but remove schedule reference)
+        await db.execute(
+            update(Attendance)
+            .where(Attendance.schedule_id.in_(clear_ids))
+            .values(schedule_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        
+        deleted = await db.execute(
+            delete(Schedule)
+            .where(clear_target)
+            .execution_options(synchronize_session=False)
+        )
+        print(f"[DEBUG] Deleted {deleted.rowcount} work shift schedules", flush=True)
+        # Flush rather than commit so the clear and the regenerated rows land
+        # in one transaction - a cancelled or failed run leaves nothing behind
+        await db.flush()
+        feedback.append("Cleared work shift schedules. Generating new schedule (preserving comp-off, regular leaves, and schedules with check-ins)...")
+
+    # Get all roles in this department
+    roles_result = await db.execute(
+        select(Role)
+        .filter(Role.department_id == department_id, Role.is_active == True)
+    )
+    roles = roles_result.scalars().all()
+    print(f"[DEBUG] Found {len(roles)} roles", flush=True)
+
+    if not roles:
+        return {
+            "success": True,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "feedback": ["❌ No active roles found in your department. Create roles first."],
+            "schedules": []
+        }
+
+    # Get all shifts for these roles
+    role_ids = [r.id for r in roles]
+    shifts_result = await db.execute(
+        select(Shift)
+        .filter(Shift.role_id.in_(role_ids), Shift.is_active == True)
+    )
+    shifts = shifts_result.scalars().all()
+    print(f"[DEBUG] Found {len(shifts)} shifts", flush=True)
+
+    # Log shift details and ensure all shifts have schedule_config
+    print(f"[DEBUG] Processing {len(shifts)} shifts for schedule_config validation", flush=True)
+    for shift in shifts:
+        # For backward compatibility:
+        # - If shift has NO schedule_config or empty, assume ALL days are enabled
+        # - If shift has schedule_config, use the configured days
+        if not shift.schedule_config or not isinstance(shift.schedule_config, dict) or len(shift.schedule_config) == 0:
+            print(f"[DEBUG] Shift {shift.id} ({shift.name}) has empty/invalid schedule_config, enabling all days for backward compatibility", flush=True)
+            # Old shift without schedule_config - enable all days for backward compatibility
+            shift.schedule_config = {
+                'Monday': {'enabled': True},
+                'Tuesday': {'enabled': True},
+                'Wednesday': {'enabled': True},
+                'Thursday': {'enabled': True},
+                'Friday': {'enabled': True},
+                'Saturday': {'enabled': True},
+                'Sunday': {'enabled': True}
+            }
+        else:
+            # Ensure all days have proper structure
+            if isinstance(shift.schedule_config, dict):
+                for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
+                    if day not in shift.schedule_config or not isinstance(shift.schedule_config[day], dict):
+                        # Missing day or malformed - fix it
+                        shift.schedule_config[day] = {'enabled': False}
+                    elif 'enabled' not in shift.schedule_config[day]:
+                        # Missing 'enabled' key - add it
+                        shift.schedule_config[day]['enabled'] = False
+        
+        enabled_days = [day for day, cfg in shift.schedule_config.items() if isinstance(cfg, dict) and cfg.get('enabled', False)]
+        print(f"[DEBUG] Final Shift: {shift.id} - {shift.name}, enabled_days={enabled_days}", flush=True)
+
+    if not shifts:
+        return {
+            "success": True,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "feedback": ["❌ No active shifts found in your roles. Create shifts first."],
+            "schedules": []
+        }
+
+    # Get all employees in the department
+    employees_result = await db.execute(
+        select(Employee)
+        .filter(Employee.department_id == department_id, Employee.is_active == True)
+    )
+    employees = employees_result.scalars().all()
+    print(f"[DEBUG] Found {len(employees)} employees", flush=True)
+
+    # Log employee details
+    for emp in employees:
+        print(f"[DEBUG] Employee: {emp.id} - {emp.first_name}, active={emp.is_active}, weekly_hours={emp.weekly_hours}, daily_max={emp.daily_max_hours}, shifts_per_week={emp.shifts_per_week}", flush=True)
+
+    if not employees:
+        return {
+            "success": True,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "feedback": ["❌ No active employees found in your department. Create employees first."],
+            "schedules": []
+        }
+
+    # Generate date range (one schedule per shift per day)
+    current_date = start_date
+    schedules_created = 0
+    overtime_warnings = []  # Track shifts requiring overtime approval
+
+    # Group shifts by role for fair distribution
+    shifts_by_role = defaultdict(list)
+    for shift in shifts:
+        shifts_by_role[shift.role_id].append(shift)
+
+    # Calculate which employees are eligible for each shift (based on role)
+    # Strategy: Assign employees to shifts day-by-day
+    # Each employee gets ONE shift per day maximum (no double shifts)
+    # If shifts are Mon-Friday, all eligible employees get all 5 days
+    eligible_for_shift = {}  # {shift_id: [emp1, emp2, emp3...]} - only eligible employees per shift
+
+    print(f"[DEBUG] Building eligibility matrix for {len(shifts)} shifts and {len(employees)} employees", flush=True)
+    for shift in shifts:
+        eligible_for_shift[shift.id] = []
+        
+        for emp in employees:
+            # Employee is eligible if:
+            # 1. They have no specific role assignment (flexible=True), OR
+            # 2. Their role matches the shift's role
+            is_eligible = (emp.role_id is None) or (emp.role_id == shift.role_id)
+            
+            if is_eligible:
+                eligible_for_shift[shift.id].append(emp)
+                print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is ELIGIBLE", flush=True)
+            else:
+                print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is NOT eligible (role mismatch: emp.role={emp.role_id} vs shift.role={shift.role_id})", flush=True)
+
+    # Preload schedules, leaves, comp-offs, unavailability and overtime
+    # approvals for the whole range so the per-candidate checks below
+    # run against in-memory indexes instead of the database
+    roles_by_id = {r.id: r for r in roles}
+    planning = await PlanningContext.load(
+        db,
+        department_id,
+        [emp.id for emp in employees],
+        start_date,
+        end_date,
+        role_breaks={r.id: (r.break_minutes or 0) for r in roles}
+    )
+    shift_hours = {
+        shift.id: (
+            datetime.strptime(shift.end_time, '%H:%M') - datetime.strptime(shift.start_time, '%H:%M')
+        ).total_seconds() / 3600
+        for shift in shifts
+    }
+
+    # New rows are collected here and bulk-inserted once generation finishes
+    schedule_buffer = ScheduleBuffer(department_id)
+
+    # Create schedules
+    total_days = (end_date - start_date).days + 1
+    current_date = start_date
+    while current_date <= end_date:
+        if job:
+            # Publish progress, honour cancellation and let pollers run between days
+            job.set_progress((current_date - start_date).days, total_days)
+            job.check_cancelled()
+            await asyncio.sleep(0)
+
+        day_name = current_date.strftime('%A')  # e.g., 'Monday', 'Sunday'
+        
+        # ===== SKIP PUBLIC HOLIDAYS - Don't assign shifts on holidays =====
+        if is_japanese_holiday(current_date):
+            holiday_name = get_japanese_holiday_name(current_date)
+            print(f"[DEBUG] Skipping {current_date} ({day_name}) - Public Holiday: {holiday_name}", flush=True)
+            current_date += timedelta(days=1)
+            continue
+
+        for shift in shifts:
+            # Check if shift operates on this day
+            role = roles_by_id.get(shift.role_id)
+            
+            # Determine if this shift should run on this day
+            should_skip = False
+            
+            if shift.schedule_config and isinstance(shift.schedule_config, dict):
+                # Shift has a schedule_config with day configuration
+                day_config = shift.schedule_config.get(day_name, {})
+                is_day_enabled = day_config.get('enabled', False) if isinstance(day_config, dict) else False
+                
+                if not is_day_enabled:
+                    should_skip = True
+                    print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - Day {day_name} is disabled, skipping", flush=True)
+                else:
+                    print(f"[DEBUG] ✓ Shift {shift.id} ({shift.name}) - Day {day_name} is ENABLED, processing", flush=True)
+            else:
+                # No schedule_config or invalid format - skip to prevent unintended assignments
+                should_skip = True
+                print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - No valid schedule_config, skipping {day_name}", flush=True)
+
+            if should_skip:
+                continue
+
+            # Assign employees to this shift on this day
+            # Only consider employees who are eligible for this shift
+            assigned_count = 0
+            
+            for emp in eligible_for_shift[shift.id]:
+                # Check leave - if employee is on approved leave, mark them as leave (not shift)
+                leave_request = planning.get_leave(emp.id, current_date)
+                
+                # Also check for approved comp-off requests
+                comp_off_request = planning.get_comp_off(emp.id, current_date)
+                
+                if leave_request or comp_off_request:
+                    # Employee is on approved leave or comp-off - create appropriate schedule entry
+                    if not planning.has_schedule_on(emp.id, current_date):
+                        # Determine status based on type
+                        if comp_off_request:
+                            # This is a comp-off earned day (employee worked, earned comp-off)
+                            # Get the correct shift time for this employee
+                            leave_status = 'comp_off_earned'
+                            
+                            # Try to get shift times from same week first
+                            start_time, end_time = planning.first_week_shift_times(emp.id, current_date)
+                            
+                            if not (start_time and end_time):
+                                # Fallback to same day of week from previous weeks,
+                                # first within the loaded window (includes rows buffered this run)
+                                start_time, end_time = planning.latest_weekday_shift_times(emp.id, current_date)
+
+                            if not (start_time and end_time):
+                                # Older history is unbounded, so this rare path still queries
+                                day_name = current_date.strftime('%A')
+                                same_day = await db.execute(
+                                    select(Schedule)
+                                    .filter(
+                                        Schedule.employee_id == emp.id,
+                                        func.to_char(Schedule.date, 'Day').ilike(f'%{day_name}%'),
+                                        Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
+                                    )
+                                    .order_by(Schedule.date.desc())
+                                    .limit(1)
+                                )
+                                same_day_sched = same_day.scalars().first()
+                                
+                                if same_day_sched and same_day_sched.start_time and same_day_sched.end_time:
+                                    start_time = same_day_sched.start_time
+                                    end_time = same_day_sched.end_time
+                                else:
+                                    # Default fallback
+                                    start_time = "00:00"
+                                    end_time = "23:59"
+                            
+                            leave_notes = f"Comp-Off Earned: {comp_off_request.reason or 'Worked on non-shift day'}"
+                        elif leave_request.leave_type == 'comp_off':
+                            # This is using comp-off (taking the earned comp-off) - no shift times, full day off
+                            leave_status = 'comp_off_taken'
+                            start_time = None  # No shift time for comp-off usage
+                            end_time = None
+                            leave_notes = f"Comp-Off Taken: {leave_request.reason or 'Using earned comp-off'}"
+                        elif leave_request.duration_type == 'half_day_morning':
+                            leave_status = 'leave_half_morning'
+                            # Use shift's start time to 12:00 for morning leave
+                            start_time = shift.start_time
+                            end_time = "12:00"
+                            leave_notes = f"Half Day Leave (Morning) - {leave_request.leave_type}"
+                        elif leave_request.duration_type == 'half_day_afternoon':
+                            leave_status = 'leave_half_afternoon'
+                            # Use 12:00 to shift's end time for afternoon leave
+                            start_time = "12:00"
+                            end_time = shift.end_time
+                            leave_notes = f"Half Day Leave (Afternoon) - {leave_request.leave_type}"
+                        else:
+                            # Full day leave - use the actual shift times
+                            leave_status = 'leave'
+                            start_time = shift.start_time
+                            end_time = shift.end_time
+                            leave_notes = f"Full Day Leave - {leave_request.leave_type}"
+
+                        leave_type_desc = 'comp-off' if comp_off_request else leave_request.leave_type
+                        print(f"[DEBUG] ✓ {emp.first_name} is on approved {leave_type_desc} on {current_date}, creating {leave_status} schedule", flush=True)
+                        schedule_buffer.append(
+                            emp.id, shift.role_id, shift.id, current_date,
+                            start_time, end_time, status=leave_status, notes=leave_notes
+                        )
+                        planning.add_assignment(emp.id, shift.role_id, current_date, leave_status, start_time, end_time)
+                        schedules_created += 1
+                    else:
+                        print(f"[DEBUG] ✗ {emp.first_name} already has a schedule entry on {current_date}, skipping leave creation", flush=True)
+                    continue  # Don't assign shift for leave/comp-off day
+                
+                # CRITICAL: Check if employee already has a shift on this day (NO DOUBLE SHIFTS)
+                if planning.has_schedule_on(emp.id, current_date):
+                    print(f"[DEBUG] ✗ {emp.first_name} already has a shift on {current_date}, skipping (NO DOUBLE SHIFTS)", flush=True)
+                    continue  # Skip if employee already has a shift today
+                
+                print(f"[DEBUG] Checking {emp.first_name} ({emp.id}) for shift {shift.id} ({shift.name}) on {current_date}", flush=True)
+                
+                # Check 5 consecutive shifts limit INCLUDING the new one
+                # NOTE: Leave days are not counted as "shifts" for the consecutive limit
+                max_consecutive = planning.consecutive_run_with(emp.id, current_date)
+                if max_consecutive > 5:
+                    print(f"[DEBUG] ✗ {emp.first_name} would have {max_consecutive} consecutive shifts, skipping (MAX 5 consecutive)", flush=True)
+                    continue  # Skip if would exceed 5 consecutive shifts
+
+                # Existing worked hours for the week and the day, minus break time
+                # NOTE: Leave days don't add to hour count, but they fulfill part of weekly requirement
+                existing_hours, existing_hours_today = planning.worked_hours(emp.id, current_date)
+
+                # Calculate shift hours (total time) and work hours (minus breaks)
+                total_shift_hours = shift_hours[shift.id]
+
+                # Subtract break time from role
+                break_hours = (role.break_minutes or 0) / 60
+                work_hours = total_shift_hours - break_hours
+
+                # Check both weekly and daily limits using work hours (excluding breaks)
+                daily_max = emp.daily_max_hours or 8
+                print(f"[DEBUG] {emp.first_name}: weekly {existing_hours:.1f}+{work_hours:.1f}<={emp.weekly_hours}, daily {existing_hours_today:.1f}+{work_hours:.1f}<={daily_max}", flush=True)
+
+                # ===== Check for overtime (> 9 hours total in a day) =====
+                daily_total_with_shift = existing_hours_today + total_shift_hours
+                has_overtime = daily_total_with_shift > 9
+                
+                if has_overtime:
+                    overtime_warnings.append({
+                        'employee_id': emp.id,
+                        'employee_name': f"{emp.first_name} {emp.last_name}",
+                        'date': current_date.isoformat(),
+                        'shift_hours': total_shift_hours,
+                        'existing_daily_hours': existing_hours_today,
+                        'total_daily_hours': daily_total_with_shift,
+                        'total_weekly_hours': existing_hours + work_hours,
+                        'approved_overtime_hours': planning.approved_overtime_hours(emp.id, current_date),
+                        'message': f"Total {daily_total_with_shift:.1f}h on {current_date} (includes {total_shift_hours}h shift)"
+                    })
+                    print(f"[DEBUG] ⚠️  OVERTIME: {emp.first_name} would work {daily_total_with_shift:.1f} hours on {current_date}", flush=True)
+
+                if (existing_hours + work_hours <= emp.weekly_hours and
+                    existing_hours_today + work_hours <= daily_max):
+                    
+                    # ===== NEW: Check 5-shifts-per-week limit with holiday awareness =====
+                    is_valid_shifts, shifts_error = planning.check_weekly_shift_limit(emp.id, current_date)
+                    if not is_valid_shifts:
+                        print(f"[DEBUG] ✗ {emp.first_name} failed 5-shifts validation on {current_date}: {shifts_error}", flush=True)
+                        continue  # Skip this employee for this shift due to weekly shift limit
+                    
+                    print(f"[DEBUG] ✓ Creating schedule for {emp.first_name} on {current_date}", flush=True)
+                    # Create schedule
+                    schedule_buffer.append(
+                        emp.id, shift.role_id, shift.id, current_date, shift.start_time, shift.end_time
+                    )
+                    planning.add_assignment(emp.id, shift.role_id, current_date, "scheduled", shift.start_time, shift.end_time)
+                    schedules_created += 1
+                    assigned_count += 1
+                    
+                    if assigned_count >= shift.max_emp:
+                        break  # Max employees for this shift on this day
+                else:
+                    print(f"[DEBUG] ✗ {emp.first_name} failed hours check on {current_date}", flush=True)
+
+            # Ensure minimum employees are assigned
+            if assigned_count < shift.min_emp:
+                feedback.append(f"Warning: {shift.name} on {current_date} has {assigned_count} employees (min: {shift.min_emp})")
 
+        current_date += timedelta(days=1)
 
-@app.delete("/schedules/{schedule_id}")
-async def delete_schedule(
-    schedule_id: int,
-    current_user: User = Depends(require_manager),
-    db: AsyncSession = Depends(get_db)
-):
-    result = await db.execute(select(Schedule).filter(Schedule.id == schedule_id))
-    schedule = result.scalars().first()
+    if job:
+        job.check_cancelled()
+    await schedule_buffer.flush(db)
+    await db.commit()
 
-    if not schedule:
-        raise HTTPException(status_code=404, detail="Schedule not found")
+    summary_line = f"Successfully generated {schedules_created} schedules"
+    if job:
+        # Pollers read job.feedback by offset, so lines are only ever appended
+        feedback.append(summary_line)
+    else:
+        feedback.insert(0, summary_line)
+    
+    # Add overtime warnings to feedback
+    if overtime_warnings:
+        feedback.append(f"⚠️  {len(overtime_warnings)} overtime alert(s) - shifts exceed 9 hours on that day")
 
-    if current_user.user_type == UserType.MANAGER:
-        manager_dept = await get_manager_department(current_user, db)
-        if not manager_dept or schedule.department_id != manager_dept:
-            raise HTTPException(status_code=403, detail="Can only delete schedules in your department")
+    return {
+        "success": True,
+        "schedules_created": schedules_created,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "feedback": feedback,
+        "overtime_warnings": overtime_warnings,
+        "schedules": []
+    }
 
-    await db.delete(schedule)
-    await db.commit()
 
-    return {"message": "Schedule deleted successfully"}
+async def _run_generation_job(
+    job: ScheduleJob,
+    department_id: int,
+    start_date: date,
+    end_date: date,
+    regenerate: bool
+):
+    """Background task body for a schedule-generation job (uses its own session)"""
+    job.mark_running()
+    async with async_session_maker() as db:
+        try:
+            result = await _generate_department_schedules(
+                db, department_id, start_date, end_date, regenerate, job=job
+            )
+            job.mark_completed(result)
+        except ScheduleJobCancelled:
+            await db.rollback()
+            job.mark_cancelled()
+        except Exception as e:
+            await db.rollback()
+            print(f"Error in schedule generation job {job.id}: {str(e)}", flush=True)
+            job.mark_failed(e.detail if isinstance(e, HTTPException) else str(e))
 
 
 @app.post("/schedules/generate")
@@ -7549,12 +8220,16 @@ async def generate_schedules(
     end_date: date,
     regenerate: bool = False,
     department_id: int = None,
+    as_job: bool = False,
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Generate fair schedules with equal shift distribution.
 
+    With as_job=true the request returns a job id immediately and generation
+    runs in the background; poll GET /schedules/jobs/{job_id} for progress.
+
     Algorithm:
     1. Get all roles and shifts for the department in the date range
     2. Get all employees in the department
@@ -7585,595 +8260,119 @@ async def generate_schedules(
 
         print(f"[DEBUG] Department ID: {department_id}", flush=True)
 
-        # ===== NEW: Check if schedules already exist in this date range =====
-        existing_schedules_result = await db.execute(
-            select(Schedule)
-            .filter(
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date
-            )
-        )
-        existing_schedules = existing_schedules_result.scalars().all()
-        
-        if existing_schedules and not regenerate:
-            # Return message asking if user wants to regenerate
-            return {
-                "success": False,
-                "schedules_created": 0,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "requires_confirmation": True,
-                "existing_count": len(existing_schedules),
-                "feedback": [
-                    f"⚠️  Found {len(existing_schedules)} existing schedules for this date range.",
-                    "Do you want to regenerate and replace them?"
-                ],
-                "schedules": []
-            }
-        
-        # ===== PRESERVE SCHEDULES WITH CHECK-INS DURING REGENERATION =====
-        # Get schedule IDs that have check-in records - these should NOT be deleted
-        schedules_with_checkins = set()
-        if existing_schedules and regenerate:
-            checkin_sched_result = await db.execute(
-                select(CheckInOut.schedule_id)
-                .where(CheckInOut.schedule_id != None)
-                .distinct()
-            )
-            schedules_with_checkins = set(checkin_sched_result.scalars().all())
-            
-            if schedules_with_checkins:
-                print(f"[DEBUG] Found {len(schedules_with_checkins)} schedules with check-in records - will skip deletion", flush=True)
-        
-        # If regenerate is True, delete existing schedules first (but PRESERVE leaves, comp-off, and schedules with check-ins)
-        if existing_schedules and regenerate:
-            print(f"[DEBUG] Regenerating - deleting {len(existing_schedules)} existing schedules (excluding ones with check-ins)", flush=True)
-            
-            # Get ONLY 'scheduled' schedules to delete (will recreate them)
-            # BUT: Exclude any that have check-in records
-            # Preserve: 'leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_earned', 'comp_off_taken'
-            # comp_off_taken is approved leave and should NOT be deleted!
-            # Build filter conditions dynamically
-            filter_conditions = [
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date,
-                Schedule.status == 'scheduled'  # Only delete work shifts, NOT approved leaves or comp-off usage
-            ]
-            # Exclude schedules with check-ins if any exist
-            if schedules_with_checkins:
-                filter_conditions.append(~Schedule.id.in_(list(schedules_with_checkins)))
-            
-            schedules_to_delete_result = await db.execute(
-                select(Schedule.id).filter(*filter_conditions)
-            )
-            schedules_to_delete_ids = schedules_to_delete_result.scalars().all()
-            
-            if schedules_to_delete_ids:
-                print(f"[DEBUG] Deleting {len(schedules_to_delete_ids)} work shift schedules (excluding {len(schedules_with_checkins)} with check-ins)", flush=True)
-                
-                # IMPORTANT: Do NOT touch check-in records - they are historical data
-                # Just delete the schedules that don't have check-ins
-                
-                # Nullify in CompOffRequest table (preserve comp-off requests)
-                await db.execute(
-                    update(CompOffRequest)
-                    .where(CompOffRequest.schedule_id.in_(schedules_to_delete_ids))
-                    .values(schedule_id=None)
-                )
-                
-                # Nullify in Attendance table (preserve attendance records but remove schedule reference)
-                await db.execute(
-                    update(Attendance)
-                    .where(Attendance.schedule_id.in_(schedules_to_delete_ids))
-                    .values(schedule_id=None)
+        if as_job:
+            # Job mode: return a job id right away and generate in the background
+            running = schedule_jobs.active_for_department(department_id)
+            if running:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Schedule generation already running for this department (job {running.id})"
                 )
-            
-            # Now delete ONLY the work shift schedules that don't have check-ins
-            # (do NOT delete comp-off taken or approved leaves or schedules with check-ins)
-            delete_filter_conditions = [
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date,
-                Schedule.status == 'scheduled'  # Only delete work shifts, NOT comp-off taken or leaves
-            ]
-            # Exclude schedules with check-ins if any exist
-            if schedules_with_checkins:
-                delete_filter_conditions.append(~Schedule.id.in_(list(schedules_with_checkins)))
-            
-            await db.execute(
-                delete(Schedule).filter(*delete_filter_conditions)
-            )
-            await db.commit()
-            feedback = [f"Cleared work shift schedules. Generating new schedule (preserving comp-off, regular leaves, and schedules with check-ins)..."]
-        else:
-            feedback = []
-
-        # Get all roles in this department
-        roles_result = await db.execute(
-            select(Role)
-            .filter(Role.department_id == department_id, Role.is_active == True)
-        )
-        roles = roles_result.scalars().all()
-        print(f"[DEBUG] Found {len(roles)} roles", flush=True)
-
-        if not roles:
-            return {
-                "success": True,
-                "schedules_created": 0,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "feedback": ["❌ No active roles found in your department. Create roles first."],
-                "schedules": []
-            }
-
-        # Get all shifts for these roles
-        role_ids = [r.id for r in roles]
-        shifts_result = await db.execute(
-            select(Shift)
-            .filter(Shift.role_id.in_(role_ids), Shift.is_active == True)
-        )
-        shifts = shifts_result.scalars().all()
-        print(f"[DEBUG] Found {len(shifts)} shifts", flush=True)
-
-        # Log shift details and ensure all shifts have schedule_config
-        print(f"[DEBUG] Processing {len(shifts)} shifts for schedule_config validation", flush=True)
-        for shift in shifts:
-            # For backward compatibility:
-            # - If shift has NO schedule_config or empty, assume ALL days are enabled
-            # - If shift has schedule_config, use the configured days
-            if not shift.schedule_config or not isinstance(shift.schedule_config, dict) or len(shift.schedule_config) == 0:
-                print(f"[DEBUG] Shift {shift.id} ({shift.name}) has empty/invalid schedule_config, enabling all days for backward compatibility", flush=True)
-                # Old shift without schedule_config - enable all days for backward compatibility
-                shift.schedule_config = {
-                    'Monday': {'enabled': True},
-                    'Tuesday': {'enabled': True},
-                    'Wednesday': {'enabled': True},
-                    'Thursday': {'enabled': True},
-                    'Friday': {'enabled': True},
-                    'Saturday': {'enabled': True},
-                    'Sunday': {'enabled': True}
+            job = schedule_jobs.create(
+                department_id=department_id,
+                user_id=current_user.id,
+                params={
+                    "start_date": start_date.isoformat(),
+                    "end_date": end_date.isoformat(),
+                    "regenerate": regenerate
                 }
-            else:
-                # Ensure all days have proper structure
-                if isinstance(shift.schedule_config, dict):
-                    for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
-                        if day not in shift.schedule_config or not isinstance(shift.schedule_config[day], dict):
-                            # Missing day or malformed - fix it
-                            shift.schedule_config[day] = {'enabled': False}
-                        elif 'enabled' not in shift.schedule_config[day]:
-                            # Missing 'enabled' key - add it
-                            shift.schedule_config[day]['enabled'] = False
-            
-            enabled_days = [day for day, cfg in shift.schedule_config.items() if isinstance(cfg, dict) and cfg.get('enabled', False)]
-            print(f"[DEBUG] Final Shift: {shift.id} - {shift.name}, enabled_days={enabled_days}", flush=True)
-
-        if not shifts:
-            return {
-                "success": True,
-                "schedules_created": 0,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "feedback": ["❌ No active shifts found in your roles. Create shifts first."],
-                "schedules": []
-            }
-
-        # Get all employees in the department
-        employees_result = await db.execute(
-            select(Employee)
-            .filter(Employee.department_id == department_id, Employee.is_active == True)
-        )
-        employees = employees_result.scalars().all()
-        print(f"[DEBUG] Found {len(employees)} employees", flush=True)
-
-        # Log employee details
-        for emp in employees:
-            print(f"[DEBUG] Employee: {emp.id} - {emp.first_name}, active={emp.is_active}, weekly_hours={emp.weekly_hours}, daily_max={emp.daily_max_hours}, shifts_per_week={emp.shifts_per_week}", flush=True)
-
-        if not employees:
+            )
+            job.task = asyncio.create_task(_run_generation_job(job, department_id, start_date, end_date, regenerate))
             return {
                 "success": True,
-                "schedules_created": 0,
+                "job_id": job.id,
+                "status": job.status,
                 "start_date": start_date.isoformat(),
                 "end_date": end_date.isoformat(),
-                "feedback": ["❌ No active employees found in your department. Create employees first."],
-                "schedules": []
+                "poll_url": f"/schedules/jobs/{job.id}"
             }
 
-        # Generate date range (one schedule per shift per day)
-        current_date = start_date
-        schedules_created = 0
-        feedback = []
-        overtime_warnings = []  # Track shifts requiring overtime approval
+        return await _generate_department_schedules(db, department_id, start_date, end_date, regenerate)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in schedule generation: {str(e)}", flush=True)
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Schedule generation error: {str(e)}")
 
-        # Group shifts by role for fair distribution
-        shifts_by_role = defaultdict(list)
-        for shift in shifts:
-            shifts_by_role[shift.role_id].append(shift)
 
-        # Calculate which employees are eligible for each shift (based on role)
-        # Strategy: Assign employees to shifts day-by-day
-        # Each employee gets ONE shift per day maximum (no double shifts)
-        # If shifts are Mon-Friday, all eligible employees get all 5 days
-        eligible_for_shift = {}  # {shift_id: [emp1, emp2, emp3...]} - only eligible employees per shift
+async def _get_accessible_job(job_id: str, current_user: User, db: AsyncSession) -> ScheduleJob:
+    """Fetch a generation job the current user is allowed to see"""
+    job = schedule_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user.user_type not in [UserType.ADMIN, UserType.SUB_ADMIN]:
+        manager_dept = await get_manager_department(current_user, db)
+        if manager_dept != job.department_id:
+            raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-        print(f"[DEBUG] Building eligibility matrix for {len(shifts)} shifts and {len(employees)} employees", flush=True)
-        for shift in shifts:
-            eligible_for_shift[shift.id] = []
-            
-            for emp in employees:
-                # Employee is eligible if:
-                # 1. They have no specific role assignment (flexible=True), OR
-                # 2. Their role matches the shift's role
-                is_eligible = (emp.role_id is None) or (emp.role_id == shift.role_id)
-                
-                if is_eligible:
-                    eligible_for_shift[shift.id].append(emp)
-                    print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is ELIGIBLE", flush=True)
-                else:
-                    print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is NOT eligible (role mismatch: emp.role={emp.role_id} vs shift.role={shift.role_id})", flush=True)
 
-        # Create schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_name = current_date.strftime('%A')  # e.g., 'Monday', 'Sunday'
-            
-            # ===== SKIP PUBLIC HOLIDAYS - Don't assign shifts on holidays =====
-            if is_japanese_holiday(current_date):
-                holiday_name = get_japanese_holiday_name(current_date)
-                print(f"[DEBUG] Skipping {current_date} ({day_name}) - Public Holiday: {holiday_name}", flush=True)
-                current_date += timedelta(days=1)
-                continue
+@app.get("/schedules/jobs/{job_id}")
+async def get_schedule_job(
+    job_id: str,
+    feedback_offset: int = 0,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Poll a schedule-generation job.
 
-            for shift in shifts:
-                # Check if shift operates on this day
-                role = next((r for r in roles if r.id == shift.role_id), None)
-                
-                # Determine if this shift should run on this day
-                should_skip = False
-                
-                if shift.schedule_config and isinstance(shift.schedule_config, dict):
-                    # Shift has a schedule_config with day configuration
-                    day_config = shift.schedule_config.get(day_name, {})
-                    is_day_enabled = day_config.get('enabled', False) if isinstance(day_config, dict) else False
-                    
-                    if not is_day_enabled:
-                        should_skip = True
-                        print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - Day {day_name} is disabled, skipping", flush=True)
-                    else:
-                        print(f"[DEBUG] ✓ Shift {shift.id} ({shift.name}) - Day {day_name} is ENABLED, processing", flush=True)
-                else:
-                    # No schedule_config or invalid format - skip to prevent unintended assignments
-                    should_skip = True
-                    print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - No valid schedule_config, skipping {day_name}", flush=True)
+    Returns status, percentage progress, feedback messages (from
+    feedback_offset onwards, so pollers can fetch only new lines) and the
+    final summary once the job has completed.
+    """
+    job = await _get_accessible_job(job_id, current_user, db)
+    return job.to_dict(feedback_offset=max(0, feedback_offset))
 
-                if should_skip:
-                    continue
 
-                # Assign employees to this shift on this day
-                # Only consider employees who are eligible for this shift
-                assigned_count = 0
-                
-                for emp in eligible_for_shift[shift.id]:
-                    # Check leave - if employee is on approved leave, mark them as leave (not shift)
-                    leave_result = await db.execute(
-                        select(LeaveRequest)
-                        .filter(
-                            LeaveRequest.employee_id == emp.id,
-                            LeaveRequest.start_date <= current_date,
-                            LeaveRequest.end_date >= current_date,
-                            LeaveRequest.status == LeaveStatus.APPROVED
-                        )
-                    )
-                    leave_request = leave_result.scalars().first()
-                    
-                    # Also check for approved comp-off requests
-                    comp_off_result = await db.execute(
-                        select(CompOffRequest)
-                        .filter(
-                            CompOffRequest.employee_id == emp.id,
-                            CompOffRequest.comp_off_date == current_date,
-                            CompOffRequest.status == LeaveStatus.APPROVED
-                        )
-                    )
-                    comp_off_request = comp_off_result.scalars().first()
-                    
-                    if leave_request or comp_off_request:
-                        # Employee is on approved leave or comp-off - create appropriate schedule entry
-                        existing_today = await db.execute(
-                            select(Schedule)
-                            .filter(
-                                Schedule.employee_id == emp.id,
-                                Schedule.date == current_date
-                            )
-                        )
-                        if not existing_today.scalars().first():
-                            # Determine status based on type
-                            if comp_off_request:
-                                # This is a comp-off earned day (employee worked, earned comp-off)
-                                # Get the correct shift time for this employee
-                                leave_status = 'comp_off_earned'
-                                
-                                # Try to get shift times from same week first
-                                week_start = current_date - timedelta(days=current_date.weekday())
-                                week_end = week_start + timedelta(days=6)
-                                
-                                week_shift = await db.execute(
-                                    select(Schedule)
-                                    .filter(
-                                        Schedule.employee_id == emp.id,
-                                        Schedule.date >= week_start,
-                                        Schedule.date <= week_end,
-                                        Schedule.date != current_date,
-                                        Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
-                                    )
-                                    .order_by(Schedule.date)
-                                    .limit(1)
-                                )
-                                week_sched = week_shift.scalars().first()
-                                
-                                if week_sched and week_sched.start_time and week_sched.end_time:
-                                    start_time = week_sched.start_time
-                                    end_time = week_sched.end_time
-                                else:
-                                    # Fallback to same day of week from previous weeks
-                                    day_name = current_date.strftime('%A')
-                                    same_day = await db.execute(
-                                        select(Schedule)
-                                        .filter(
-                                            Schedule.employee_id == emp.id,
-                                            func.to_char(Schedule.date, 'Day').ilike(f'%{day_name}%'),
-                                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
-                                        )
-                                        .order_by(Schedule.date.desc())
-                                        .limit(1)
-                                    )
-                                    same_day_sched = same_day.scalars().first()
-                                    
-                                    if same_day_sched and same_day_sched.start_time and same_day_sched.end_time:
-                                        start_time = same_day_sched.start_time
-                                        end_time = same_day_sched.end_time
-                                    else:
-                                        # Default fallback
-                                        start_time = "00:00"
-                                        end_time = "23:59"
-                                
-                                leave_notes = f"Comp-Off Earned: {comp_off_request.reason or 'Worked on non-shift day'}"
-                            elif leave_request.leave_type == 'comp_off':
-                                # This is using comp-off (taking the earned comp-off) - no shift times, full day off
-                                leave_status = 'comp_off_taken'
-                                start_time = None  # No shift time for comp-off usage
-                                end_time = None
-                                leave_notes = f"Comp-Off Taken: {leave_request.reason or 'Using earned comp-off'}"
-                            elif leave_request.duration_type == 'half_day_morning':
-                                leave_status = 'leave_half_morning'
-                                # Use shift's start time to 12:00 for morning leave
-                                start_time = shift.start_time
-                                end_time = "12:00"
-                                leave_notes = f"Half Day Leave (Morning) - {leave_request.leave_type}"
-                            elif leave_request.duration_type == 'half_day_afternoon':
-                                leave_status = 'leave_half_afternoon'
-                                # Use 12:00 to shift's end time for afternoon leave
-                                start_time = "12:00"
-                                end_time = shift.end_time
-                                leave_notes = f"Half Day Leave (Afternoon) - {leave_request.leave_type}"
-                            else:
-                                # Full day leave - use the actual shift times
-                                leave_status = 'leave'
-                                start_time = shift.start_time
-                                end_time = shift.end_time
-                                leave_notes = f"Full Day Leave - {leave_request.leave_type}"
-
-                            leave_type_desc = 'comp-off' if comp_off_request else leave_request.leave_type
-                            print(f"[DEBUG] ✓ {emp.first_name} is on approved {leave_type_desc} on {current_date}, creating {leave_status} schedule", flush=True)
-                            leave_schedule = Schedule(
-                                department_id=department_id,
-                                employee_id=emp.id,
-                                role_id=shift.role_id,
-                                shift_id=shift.id,
-                                date=current_date,
-                                start_time=start_time,
-                                end_time=end_time,
-                                status=leave_status,
-                                notes=leave_notes
-                            )
-                            db.add(leave_schedule)
-                            schedules_created += 1
-                        else:
-                            print(f"[DEBUG] ✗ {emp.first_name} already has a schedule entry on {current_date}, skipping leave creation", flush=True)
-                        continue  # Don't assign shift for leave/comp-off day
-                    
-                    # CRITICAL: Check if employee already has a shift on this day (NO DOUBLE SHIFTS)
-                    existing_today = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date == current_date
-                        )
-                    )
-                    if existing_today.scalars().first():
-                        print(f"[DEBUG] ✗ {emp.first_name} already has a shift on {current_date}, skipping (NO DOUBLE SHIFTS)", flush=True)
-                        continue  # Skip if employee already has a shift today
-                    
-                    print(f"[DEBUG] Checking {emp.first_name} ({emp.id}) for shift {shift.id} ({shift.name}) on {current_date}", flush=True)
-                    
-                    # Check 5 consecutive shifts limit
-                    week_start = current_date - timedelta(days=current_date.weekday())
-                    week_end = week_start + timedelta(days=6)
-                    
-                    consecutive_check = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])  # Exclude 'leave', 'comp_off_taken' status
-                        )
-                        .order_by(Schedule.date)
-                    )
-                    week_schedules = consecutive_check.scalars().all()
-                    
-                    # Check consecutive shifts INCLUDING the new one
-                    # NOTE: Leave days are not counted as "shifts" for the consecutive limit
-                    week_dates = [s.date for s in week_schedules]
-                    if current_date not in week_dates:
-                        week_dates.append(current_date)
-                    
-                    week_dates.sort()
-                    max_consecutive = 1
-                    current_consecutive = 1
-                    
-                    for i in range(1, len(week_dates)):
-                        if (week_dates[i] - week_dates[i-1]).days == 1:
-                            current_consecutive += 1
-                            max_consecutive = max(max_consecutive, current_consecutive)
-                        else:
-                            current_consecutive = 1
-                    
-                    if max_consecutive > 5:
-                        print(f"[DEBUG] ✗ {emp.first_name} would have {max_consecutive} consecutive shifts, skipping (MAX 5 consecutive)", flush=True)
-                        continue  # Skip if would exceed 5 consecutive shifts
-
-                    # Fetch existing schedules for the week (with eager loading of role)
-                    # IMPORTANT: Only count actual work shifts, not leave days, for hour calculations
-                    existing_schedules_result = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])  # Exclude 'leave', 'comp_off_taken' status
-                        )
-                        .options(selectinload(Schedule.role))
-                    )
-                    existing_schedules = existing_schedules_result.scalars().all()
-
-                    # Also count leave days for scheduling fairness, but not for hours calculation
-                    leave_schedules_result = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_taken'])
-                        )
-                    )
-                    leave_schedules = leave_schedules_result.scalars().all()
-                    leave_days_count = len(leave_schedules)
-
-                    # Calculate existing hours in Python, subtracting break time
-                    # NOTE: Leave days don't add to hour count, but they fulfill part of weekly requirement
-                    existing_hours = 0
-                    existing_hours_today = 0
-                    for sched in existing_schedules:
-                        if sched.start_time and sched.end_time:
-                            try:
-                                start = datetime.strptime(sched.start_time, '%H:%M')
-                                end = datetime.strptime(sched.end_time, '%H:%M')
-                                total_hours = (end - start).total_seconds() / 3600
-
-                                # Subtract break time from role
-                                break_hours = (sched.role.break_minutes or 0) / 60 if sched.role else 0
-                                work_hours = total_hours - break_hours
-
-                                existing_hours += work_hours
-                                # Check hours for current day
-                                if sched.date == current_date:
-                                    existing_hours_today += work_hours
-                            except (ValueError, TypeError):
-                                pass
-
-                    # Calculate shift hours (total time) and work hours (minus breaks)
-                    shift_start = datetime.strptime(shift.start_time, '%H:%M')
-                    shift_end = datetime.strptime(shift.end_time, '%H:%M')
-                    total_shift_hours = (shift_end - shift_start).total_seconds() / 3600
-
-                    # Subtract break time from role
-                    break_hours = (role.break_minutes or 0) / 60
-                    work_hours = total_shift_hours - break_hours
-
-                    # Check both weekly and daily limits using work hours (excluding breaks)
-                    daily_max = emp.daily_max_hours or 8
-                    print(f"[DEBUG] {emp.first_name}: weekly {existing_hours:.1f}+{work_hours:.1f}<={emp.weekly_hours}, daily {existing_hours_today:.1f}+{work_hours:.1f}<={daily_max}", flush=True)
-
-                    # ===== Check for overtime (> 9 hours total in a day) =====
-                    daily_total_with_shift = existing_hours_today + total_shift_hours
-                    has_overtime = daily_total_with_shift > 9
-                    
-                    if has_overtime:
-                        overtime_warnings.append({
-                            'employee_id': emp.id,
-                            'employee_name': f"{emp.first_name} {emp.last_name}",
-                            'date': current_date.isoformat(),
-                            'shift_hours': total_shift_hours,
-                            'existing_daily_hours': existing_hours_today,
-                            'total_daily_hours': daily_total_with_shift,
-                            'total_weekly_hours': existing_hours + work_hours,
-                            'message': f"Total {daily_total_with_shift:.1f}h on {current_date} (includes {total_shift_hours}h shift)"
-                        })
-                        print(f"[DEBUG] ⚠️  OVERTIME: {emp.first_name} would work {daily_total_with_shift:.1f} hours on {current_date}", flush=True)
-
-                    if (existing_hours + work_hours <= emp.weekly_hours and
-                        existing_hours_today + work_hours <= daily_max):
-                        
-                        # ===== NEW: Check 5-shifts-per-week limit with holiday awareness =====
-                        is_valid_shifts, shifts_error = await validate_5_shifts_per_week(emp.id, current_date, db)
-                        if not is_valid_shifts:
-                            print(f"[DEBUG] ✗ {emp.first_name} failed 5-shifts validation on {current_date}: {shifts_error}", flush=True)
-                            continue  # Skip this employee for this shift due to weekly shift limit
-                        
-                        print(f"[DEBUG] ✓ Creating schedule for {emp.first_name} on {current_date}", flush=True)
-                        # Create schedule
-                        schedule = Schedule(
-                            department_id=department_id,
-                            employee_id=emp.id,
-                            role_id=shift.role_id,
-                            shift_id=shift.id,
-                            date=current_date,
-                            start_time=shift.start_time,
-                            end_time=shift.end_time,
-                            status="scheduled"
-                        )
-                        db.add(schedule)
-                        schedules_created += 1
-                        assigned_count += 1
-                        
-                        if assigned_count >= shift.max_emp:
-                            break  # Max employees for this shift on this day
-                    else:
-                        print(f"[DEBUG] ✗ {emp.first_name} failed hours check on {current_date}", flush=True)
+@app.post("/schedules/jobs/{job_id}/cancel")
+async def cancel_schedule_job(
+    job_id: str,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """Cancel a running generation job; partial inserts are rolled back"""
+    job = await _get_accessible_job(job_id, current_user, db)
+    if job.is_finished:
+        raise HTTPException(status_code=400, detail=f"Job already {job.status}")
+    job.request_cancel()
+    return {"job_id": job.id, "status": job.status, "cancel_requested": True}
 
-                # Ensure minimum employees are assigned
-                if assigned_count < shift.min_emp:
-                    feedback.append(f"Warning: {shift.name} on {current_date} has {assigned_count} employees (min: {shift.min_emp})")
 
-            current_date += timedelta(days=1)
+@app.post("/schedules/repair")
+async def repair_schedules(
+    repair_request: ScheduleRepairRequest,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Rebalance only the shifts on the given (employee, date) cells.
 
-        await db.commit()
+    Each affected role and week is re-solved with every other assignment
+    pinned; freed shifts are moved to colleagues in place (same row ids).
+    """
+    if not repair_request.cells:
+        return {"reassigned": [], "uncovered": [], "skipped": [], "feedback": []}
 
-        feedback.insert(0, f"Successfully generated {schedules_created} schedules")
-        
-        # Add overtime warnings to feedback
-        if overtime_warnings:
-            feedback.append(f"⚠️  {len(overtime_warnings)} overtime alert(s) - shifts exceed 9 hours on that day")
+    emp_ids = {cell.employee_id for cell in repair_request.cells}
+    if current_user.user_type not in [UserType.ADMIN, UserType.SUB_ADMIN]:
+        manager_dept = await get_manager_department(current_user, db)
+        emp_result = await db.execute(
+            select(Employee.id).filter(Employee.id.in_(emp_ids), Employee.department_id == manager_dept)
+        )
+        if set(emp_result.scalars().all()) != emp_ids:
+            raise HTTPException(status_code=403, detail="Can only repair schedules for your department")
 
-        return {
-            "success": True,
-            "schedules_created": schedules_created,
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat(),
-            "feedback": feedback,
-            "overtime_warnings": overtime_warnings,
-            "schedules": []
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error in schedule generation: {str(e)}", flush=True)
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Schedule generation error: {str(e)}")
+    summary = await repair_schedule(
+        db,
+        [(cell.employee_id, cell.date) for cell in repair_request.cells],
+        reason=repair_request.reason or "manual repair",
+        release_uncovered=repair_request.release_uncovered
+    )
+    await db.commit()
+    return summary
 
 
 @app.get("/schedules/conflicts")
@@ -8493,74 +8692,105 @@ async def get_weekly_attendance(
     }
 
 
+def _attendance_summary_entry(row) -> dict:
+    return {
+        "employee_id": row.employee_id,
+        "employee_name": f"{row.first_name} {row.last_name}",
+        "department_id": row.department_id,
+        "employment_type": row.employment_type,
+        "total_worked_hours": float(row.total_worked_hours),
+        "total_overtime": float(row.total_overtime),
+        "on_time_percentage": float(row.on_time_percentage),
+        "late_count": row.late_count,
+        "days_worked": row.record_count
+    }
+
+
+async def _stream_attendance_summary(query, period: dict):
+    """Chunked JSON body with the same shape as the non-streaming response"""
+    yield '{"period": ' + json.dumps(period) + ', "summary": ['
+    # Own session: the request's session is closed before the body is sent
+    async with async_session_maker() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        first = True
+        async for rows in result.partitions(EXPORT_FETCH_SIZE):
+            chunk = ",".join(json.dumps(_attendance_summary_entry(row)) for row in rows)
+            yield chunk if first else "," + chunk
+            first = False
+    yield "]}"
+
+
 @app.get("/attendance/summary")
 async def get_attendance_summary(
     start_date: date,
     end_date: date,
+    department_id: Optional[int] = None,
+    employment_type: Optional[str] = None,
+    stream: bool = False,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get attendance summary for department or individual"""
-    query = select(Attendance).filter(
-        Attendance.date >= start_date,
-        Attendance.date <= end_date
-    )
+    """
+    Get attendance summary for department or individual (read from the attendance rollups)
+    department_id / employment_type: Optional filters ('full_time' or 'part_time')
+    stream: Send the summary as chunked JSON (for admin-wide ranges)
+    """
+    if employment_type and employment_type not in ['full_time', 'part_time']:
+        raise HTTPException(status_code=400, detail="employment_type must be 'full_time' or 'part_time'")
     
+    employee_filters = []
     if current_user.user_type == UserType.EMPLOYEE:
-        query = query.filter(Attendance.employee_id == current_user.employee_id)
+        employee_filters.append(Employee.id == current_user.employee_id)
     elif current_user.user_type == UserType.MANAGER:
         manager_dept = await get_manager_department(current_user, db)
         if not manager_dept:
             return []
-        # Get employees in manager's department
-        subquery = select(Employee.id).filter(
-            Employee.department_id == manager_dept
+        if department_id is not None and department_id != manager_dept:
+            raise HTTPException(status_code=403, detail="Not authorized to view this department")
+        # Employees in manager's department
+        employee_filters.append(Employee.department_id == manager_dept)
+    if department_id is not None:
+        employee_filters.append(Employee.department_id == department_id)
+    if employment_type:
+        employee_filters.append(Employee.employment_type == employment_type)
+    
+    # Rollups are only read for the selected employees
+    employee_ids = select(Employee.id).filter(*employee_filters) if employee_filters else None
+    totals = employee_rollup_totals(start_date, end_date, employee_ids)
+    
+    # One GROUP BY over the rollups joined to employees; percentages computed in SQL
+    query = (
+        select(
+            Employee.id.label("employee_id"), Employee.first_name, Employee.last_name,
+            Employee.department_id, Employee.employment_type,
+            func.round(cast(totals.c.worked_hours, Numeric), 2).label("total_worked_hours"),
+            func.round(cast(totals.c.overtime_hours, Numeric), 2).label("total_overtime"),
+            func.round(
+                cast(totals.c.on_time_count, Numeric) * 100 / func.nullif(totals.c.record_count, 0), 2
+            ).label("on_time_percentage"),
+            totals.c.late_count,
+            totals.c.record_count
+        )
+        .join(totals, totals.c.employee_id == Employee.id)
+        .filter(totals.c.record_count > 0, *employee_filters)
+        .order_by(totals.c.worked_hours.desc(), Employee.id)
+    )
+    
+    period = {
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat()
+    }
+    
+    if stream:
+        return StreamingResponse(
+            _stream_attendance_summary(query, period),
+            media_type="application/json"
         )
-        query = query.filter(Attendance.employee_id.in_(subquery))
     
     result = await db.execute(query)
-    records = result.scalars().all()
-    
-    # Group by employee
-    emp_stats = defaultdict(lambda: {
-        "total_worked_hours": 0,
-        "total_overtime": 0,
-        "on_time": 0,
-        "late": 0,
-        "total_days": 0
-    })
-    
-    for record in records:
-        stats = emp_stats[record.employee_id]
-        stats["total_worked_hours"] += record.worked_hours
-        stats["total_overtime"] += record.overtime_hours
-        if record.status == "onTime":
-            stats["on_time"] += 1
-        elif record.status in ["slightlyLate", "late", "veryLate"]:
-            stats["late"] += 1
-        stats["total_days"] += 1
-    
-    # Convert to list with employee details
-    summary_list = []
-    for emp_id, stats in emp_stats.items():
-        emp = await db.get(Employee, emp_id)
-        if emp:
-            summary_list.append({
-                "employee_id": emp_id,
-                "employee_name": f"{emp.first_name} {emp.last_name}",
-                "total_worked_hours": round(stats["total_worked_hours"], 2),
-                "total_overtime": round(stats["total_overtime"], 2),
-                "on_time_percentage": round((stats["on_time"] / stats["total_days"] * 100) if stats["total_days"] > 0 else 0, 2),
-                "late_count": stats["late"],
-                "days_worked": stats["total_days"]
-            })
-    
     return {
-        "period": {
-            "start": start_date.isoformat(),
-            "end": end_date.isoformat()
-        },
-        "summary": sorted(summary_list, key=lambda x: x["total_worked_hours"], reverse=True)
+        "period": period,
+        "summary": [_attendance_summary_entry(row) for row in result.all()]
     }
 
 
@@ -8594,6 +8824,16 @@ async def create_unavailability(
         reason=unavail.reason
     )
     db.add(unavailability)
+    await db.flush()
+    
+    # Move the employee's work shift on that date to a colleague if one is free
+    repair_summary = await repair_schedule(
+        db, [(unavail.employee_id, unavail.date)],
+        reason=f"unavailable: {unavail.reason}" if unavail.reason else "unavailable"
+    )
+    for line in repair_summary["feedback"]:
+        print(f"[DEBUG] Unavailability repair: {line}", flush=True)
+    
     await db.commit()
     await db.refresh(unavailability)
     return unavailability
@@ -8605,6 +8845,7 @@ async def list_unavailability(
     start_date: date = None,
     end_date: date = None,
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """List unavailability records for department (manager) or specific employee (employee)"""
@@ -8625,8 +8866,7 @@ async def list_unavailability(
             query = query.filter(Unavailability.employee_id == employee_id)
     elif current_user.user_type == UserType.EMPLOYEE:
         # Employee sees only their own unavailability
-        result = await db.execute(select(Employee).filter(Employee.user_id == current_user.id))
-        employee = result.scalars().first()
+        employee = caller.employee
         if not employee:
             raise HTTPException(status_code=404, detail="Employee record not found")
         query = query.filter(Unavailability.employee_id == employee.id)
@@ -8715,13 +8955,16 @@ async def create_shift(
 
 @app.get("/shifts", response_model=List[ShiftResponse])
 async def list_shifts(
+    request: Request,
+    response: Response,
     role_id: int = None,
     include_inactive: bool = False,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """List shifts for a role or department (manager)"""
+    """List shifts for a role or department (manager); supports If-None-Match"""
     query = select(Shift)
+    manager_dept = None
 
     if role_id:
         query = query.filter(Shift.role_id == role_id)
@@ -8737,6 +8980,12 @@ async def list_shifts(
     elif current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    stamp, last_modified = await read_version(db, ROLES_SCOPE)
+    etag = make_etag("shifts", current_user.user_type.value, manager_dept, role_id, include_inactive, stamp)
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+
     result = await db.execute(query.order_by(Shift.created_at.desc()))
     shifts = result.scalars().all()
     return shifts
@@ -8825,14 +9074,12 @@ async def delete_shift(
 async def create_overtime_request(
     request_data: OvertimeRequestCreate,
     current_user: User = Depends(require_employee),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Employee submits an overtime request"""
     # Get employee record
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalars().first()
+    employee = caller.employee
     
     if not employee:
         raise HTTPException(status_code=400, detail="Employee record not found")
@@ -8881,6 +9128,7 @@ async def list_overtime_requests(
     status: str = None,
     department_id: int = None,  # Optional department filter for admins
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """List overtime requests. Managers see pending requests, employees see their own"""
@@ -8888,10 +9136,7 @@ async def list_overtime_requests(
     
     if current_user.user_type == UserType.EMPLOYEE:
         # Employees see their own requests
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalars().first()
+        employee = caller.employee
         if not employee:
             raise HTTPException(status_code=400, detail="Employee record not found")
         query = query.filter(OvertimeRequest.employee_id == employee.id)
@@ -9037,6 +9282,7 @@ async def reject_overtime_request(
 async def cancel_overtime_request(
     request_id: int,
     current_user: User = Depends(require_employee),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Employee cancels a pending overtime request"""
@@ -9048,10 +9294,7 @@ async def cancel_overtime_request(
     if not ot_request:
         raise HTTPException(status_code=404, detail="Overtime request not found")
 
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
-    )
-    employee = emp_result.scalar_one_or_none()
+    employee = caller.employee
 
     if not employee or ot_request.employee_id != employee.id:
         raise HTTPException(status_code=403, detail="Cannot cancel another employee's overtime request")
@@ -9214,6 +9457,7 @@ async def get_overtime_tracking(
     year: int = None,
     month: int = None,
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """Get overtime tracking for employee(s). Returns monthly allocation and usage."""
@@ -9229,10 +9473,7 @@ async def get_overtime_tracking(
     
     if current_user.user_type == UserType.EMPLOYEE:
         # Employees see their own tracking
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalars().first()
+        employee = caller.employee
         if not employee:
             raise HTTPException(status_code=400, detail="Employee record not found")
         query = query.filter(OvertimeTracking.employee_id == employee.id)
@@ -9257,10 +9498,7 @@ async def get_overtime_tracking(
     # If no records exist, create them for the month
     if not tracking_records:
         if current_user.user_type == UserType.EMPLOYEE:
-            emp_result = await db.execute(
-                select(Employee).filter(Employee.user_id == current_user.id)
-            )
-            employee = emp_result.scalars().first()
+            employee = caller.employee
             if employee:
                 tracking = OvertimeTracking(
                     employee_id=employee.id,
@@ -9419,6 +9657,7 @@ async def list_overtime_worked(
     start_date: date = None,
     end_date: date = None,
     current_user: User = Depends(get_current_active_user),
+    caller: CallerContext = Depends(get_caller),
     db: AsyncSession = Depends(get_db)
 ):
     """List overtime worked records"""
@@ -9426,10 +9665,7 @@ async def list_overtime_worked(
     
     if current_user.user_type == UserType.EMPLOYEE:
         # Employees see their own overtime
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalars().first()
+        employee = caller.employee
         if not employee:
             raise HTTPException(status_code=400, detail="Employee record not found")
         query = query.filter(OvertimeWorked.employee_id == employee.id)
@@ -3,7 +3,7 @@ Database Models for Shift Scheduler - Normalized Schema V6
 Optimized with clean foreign key relationships
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, JSON, Date, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Float, DateTime, ForeignKey, JSON, Date, Text, Index, UniqueConstraint, text, Enum as SQLEnum
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import enum
@@ -165,6 +165,7 @@ class Schedule(Base):
     is_overtime = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_txid = Column(BigInteger, nullable=True)  # Writing transaction, set by trigger (see app.schedule_changes)
 
     # Relationships
     department = relationship("Department", back_populates="schedules")
@@ -174,6 +175,28 @@ class Schedule(Base):
     check_in = relationship("CheckInOut", back_populates="schedule", uselist=False, cascade="all, delete-orphan")
     attendance = relationship("Attendance", back_populates="schedule", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_schedules_employee_date', 'employee_id', 'date'),
+    )
+
+
+class ScheduleDeletion(Base):
+    """Tombstones of deleted or moved schedules for delta sync, written by trigger (see app.schedule_changes)"""
+    __tablename__ = "schedule_deletions"
+
+    id = Column(BigInteger, primary_key=True)
+    schedule_id = Column(Integer, nullable=False)
+    department_id = Column(Integer, nullable=False)
+    employee_id = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    deleted_txid = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        Index('ix_schedule_deletions_department_txid', 'department_id', 'deleted_txid'),
+        Index('ix_schedule_deletions_employee_txid', 'employee_id', 'deleted_txid'),
+    )
+
 
 class LeaveRequest(Base):
     """Leave requests with approval workflow"""
@@ -218,6 +241,10 @@ class CheckInOut(Base):
     employee = relationship("Employee", back_populates="check_ins")
     schedule = relationship("Schedule", back_populates="check_in")
 
+    __table_args__ = (
+        Index('ix_check_ins_employee_date', 'employee_id', 'date', 'check_in_time'),
+    )
+
 
 class Attendance(Base):
     """Attendance records with worked hours tracking"""
@@ -244,6 +271,70 @@ class Attendance(Base):
     schedule = relationship("Schedule", back_populates="attendance")
 
 
+class AttendanceDailyRollup(Base):
+    """Per employee per day attendance aggregates, maintained by triggers on attendance (see app.attendance_rollup)"""
+    __tablename__ = "attendance_daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    department_id = Column(Integer, ForeignKey('departments.id', name='fk_att_daily_department'), nullable=True, index=True)
+    employee_id = Column(Integer, ForeignKey('employees.id', name='fk_att_daily_employee', ondelete='CASCADE'), nullable=False)
+    date = Column(Date, nullable=False, index=True)
+    record_count = Column(Integer, default=0)  # Attendance rows for the day
+    worked_days = Column(Integer, default=0)  # Rows with worked_hours > 0
+    worked_hours = Column(Float, default=0)
+    overtime_hours = Column(Float, default=0)
+    night_hours = Column(Float, default=0)
+    break_minutes = Column(Integer, default=0)
+    on_time_count = Column(Integer, default=0)
+    late_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'date', name='uq_att_daily_employee_date'),
+        Index('ix_att_daily_department_date', 'department_id', 'date'),
+    )
+
+
+class AttendanceMonthlyRollup(Base):
+    """Per employee per month totals of AttendanceDailyRollup"""
+    __tablename__ = "attendance_monthly_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    department_id = Column(Integer, ForeignKey('departments.id', name='fk_att_monthly_department'), nullable=True, index=True)
+    employee_id = Column(Integer, ForeignKey('employees.id', name='fk_att_monthly_employee', ondelete='CASCADE'), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    days = Column(Integer, default=0)  # Days with at least one attendance row
+    record_count = Column(Integer, default=0)
+    worked_days = Column(Integer, default=0)
+    worked_hours = Column(Float, default=0)
+    overtime_hours = Column(Float, default=0)
+    night_hours = Column(Float, default=0)
+    break_minutes = Column(Integer, default=0)
+    on_time_count = Column(Integer, default=0)
+    late_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'year', 'month', name='uq_att_monthly_employee_month'),
+        Index('ix_att_monthly_department_month', 'department_id', 'year', 'month'),
+    )
+
+
+class ResourceVersion(Base):
+    """
+    Change counters behind the ETags of cacheable reads (see app.resource_versions).
+    Bumped by database triggers on the tracked tables, never by application code.
+    """
+    __tablename__ = "resource_versions"
+
+    scope = Column(String(30), primary_key=True)  # 'schedules', 'roles'
+    department_id = Column(Integer, primary_key=True, default=0)  # 0 = not department specific
+    period = Column(Date, primary_key=True)  # First day of the month (1970-01-01 = not dated)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Message(Base):
     """Messaging system"""
     __tablename__ = "messages"
@@ -265,6 +356,14 @@ class Message(Base):
     recipient = relationship("User", foreign_keys=[recipient_id], back_populates="received_messages")
     department = relationship("Department", back_populates="messages")
 
+    __table_args__ = (
+        Index('ix_messages_recipient_created', 'recipient_id', 'created_at', 'id'),
+        Index('ix_messages_sender_created', 'sender_id', 'created_at', 'id'),
+        Index('ix_messages_department_created', 'department_id', 'created_at', 'id'),
+        Index('ix_messages_recipient_unread', 'recipient_id', postgresql_where=text('is_read = false')),
+        Index('ix_messages_department_unread', 'department_id', postgresql_where=text('is_read = false')),
+    )
+
 
 class Notification(Base):
     """System notifications"""
@@ -282,6 +381,11 @@ class Notification(Base):
     # Relationships
     user = relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        Index('ix_notifications_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_notifications_user_unread', 'user_id', postgresql_where=text('is_read = false')),
+    )
+
 
 class Unavailability(Base):
     """Employee unavailability/constraints"""
@@ -482,3 +586,7 @@ class AuditLog(Base):
 
     # Relationships
     user = relationship("User", foreign_keys=[user_id])
+
+    __table_args__ = (
+        Index('ix_audit_logs_created_id', 'created_at', 'id'),
+    )
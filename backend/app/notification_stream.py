@@ -0,0 +1,377 @@
+"""
+Notification push channel
+
+`create_notification` queues each new row on its session; once the session
+commits, the row is published to a broker that fans it out to the
+Server-Sent Events streams of the recipient. Two brokers are available:
+
+- memory:   in-process pub/sub (single uvicorn worker)
+- postgres: LISTEN/NOTIFY on a dedicated asyncpg connection, so every
+            worker sees rows committed by any other worker. A watchdog
+            reconnects when the connection drops and resyncs open streams
+            from the database, since NOTIFYs sent meanwhile are lost.
+
+Clients resume with the SSE `Last-Event-ID` (the notification id); the
+broker also remembers the last id delivered to each user so a reconnect
+without one still only gets the items it missed.
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import Notification
+
+
+# Events buffered per subscriber before it is marked as lagging and resynced from the database
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Keep-alive comment interval for idle streams (seconds)
+STREAM_HEARTBEAT_SECONDS = 25.0
+
+# Missed notifications replayed on (re)connect
+BACKLOG_LIMIT = 100
+
+# Postgres channel and payload limit (NOTIFY payloads must stay under 8000 bytes)
+PG_CHANNEL = "notifications"
+PG_PAYLOAD_LIMIT = 7500
+
+# Postgres broker health check interval and reconnect backoff ceiling (seconds)
+PG_HEALTH_CHECK_SECONDS = 15.0
+PG_RECONNECT_MAX_SECONDS = 30.0
+
+_PENDING_KEY = "pending_notifications"
+
+
+def serialize_notification(notification) -> Dict[str, Any]:
+    """JSON-ready dict matching NotificationResponse"""
+    return {
+        "id": notification.id,
+        "user_id": notification.user_id,
+        "title": notification.title,
+        "message": notification.message,
+        "notification_type": notification.notification_type,
+        "related_id": notification.related_id,
+        "is_read": bool(notification.is_read),
+        "created_at": notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+class Subscription:
+    """One open stream: a bounded queue of events for a single user"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when events were dropped; the stream then re-reads from the database
+        self.lagging = False
+
+    def offer(self, item: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.lagging = True
+
+
+class NotificationBroker:
+    """In-process pub/sub of notification events keyed by user id"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._last_delivered: Dict[int, int] = {}
+
+    async def start(self):
+        """Called on application startup"""
+
+    async def stop(self):
+        """Called on application shutdown"""
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def last_delivered(self, user_id: int) -> Optional[int]:
+        """Last notification id streamed to the user by this process"""
+        return self._last_delivered.get(user_id)
+
+    def mark_delivered(self, user_id: int, notification_id: int):
+        if notification_id > self._last_delivered.get(user_id, 0):
+            self._last_delivered[user_id] = notification_id
+
+    def resync_all(self):
+        """Mark every open stream as lagging so it catches up from the database"""
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.lagging = True
+
+    def deliver(self, item: Dict[str, Any]):
+        """Hand an event to every local subscriber of its user"""
+        for subscription in list(self._subscribers.get(item["user_id"], ())):
+            subscription.offer(item)
+
+    async def publish(self, items: List[Dict[str, Any]]):
+        """Publish committed notifications"""
+        for item in items:
+            self.deliver(item)
+
+
+class PostgresNotificationBroker(NotificationBroker):
+    """Fans events out across workers with PostgreSQL LISTEN/NOTIFY"""
+
+    name = "postgres"
+
+    def __init__(self, dsn: str):
+        super().__init__()
+        self.dsn = dsn
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        self._connection_lost = asyncio.Event()
+        self._watchdog: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self._connect()
+        self._watchdog = asyncio.get_running_loop().create_task(self._watch())
+        print(f"✓ Notification broker listening on '{PG_CHANNEL}'")
+
+    async def stop(self):
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            try:
+                await self._watchdog
+            except asyncio.CancelledError:
+                pass
+            self._watchdog = None
+        await self._close()
+
+    async def _connect(self):
+        import asyncpg
+
+        self._connection_lost.clear()
+        self._listen_conn = await asyncpg.connect(self.dsn)
+        self._listen_conn.add_termination_listener(self._on_terminate)
+        await self._listen_conn.add_listener(PG_CHANNEL, self._on_notify)
+        self._publish_conn = await asyncpg.connect(self.dsn)
+
+    async def _close(self):
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is not None and not conn.is_closed():
+                try:
+                    await conn.close(timeout=5)
+                except Exception:
+                    conn.terminate()
+        self._listen_conn = None
+        self._publish_conn = None
+
+    def _on_terminate(self, connection):
+        self._connection_lost.set()
+
+    async def _healthy(self) -> bool:
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is None or conn.is_closed():
+                return False
+        try:
+            await asyncio.wait_for(self._listen_conn.fetchval("SELECT 1"), PG_HEALTH_CHECK_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    async def _watch(self):
+        """Reconnect and re-LISTEN when the connection drops or stops answering"""
+        while True:
+            try:
+                await asyncio.wait_for(self._connection_lost.wait(), PG_HEALTH_CHECK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            if not self._connection_lost.is_set() and await self._healthy():
+                continue
+
+            print("Notification broker: connection lost, reconnecting")
+            delay = 1.0
+            while True:
+                await self._close()
+                try:
+                    await self._connect()
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Notification broker: reconnect failed ({e}), retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, PG_RECONNECT_MAX_SECONDS)
+            # NOTIFYs sent while disconnected are gone; streams re-read what they missed
+            self.resync_all()
+            print(f"✓ Notification broker reconnected to '{PG_CHANNEL}'")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self.deliver(json.loads(payload))
+        except (ValueError, KeyError) as e:
+            print(f"Ignoring malformed notification payload: {e}")
+
+    async def publish(self, items: List[Dict[str, Any]]):
+        if self._publish_conn is None:
+            # Not started (e.g. scripts) - local delivery only
+            await super().publish(items)
+            return
+        async with self._publish_lock:
+            for index, item in enumerate(items):
+                payload = json.dumps(item)
+                if len(payload.encode('utf-8')) > PG_PAYLOAD_LIMIT:
+                    # Too large for NOTIFY: send the id only, streams fetch the row
+                    payload = json.dumps({"user_id": item["user_id"], "id": item["id"]})
+                try:
+                    await self._publish_conn.execute("SELECT pg_notify($1, $2)", PG_CHANNEL, payload)
+                except Exception:
+                    # Local streams still get the rest; the watchdog reconnects
+                    self._connection_lost.set()
+                    await super().publish(items[index:])
+                    raise
+
+
+def _create_broker() -> NotificationBroker:
+    if settings.NOTIFICATION_BROKER == "postgres":
+        from app.database import DATABASE_URL
+
+        return PostgresNotificationBroker(DATABASE_URL.replace("+asyncpg", ""))
+    return NotificationBroker()
+
+
+# Global instance
+notification_broker = _create_broker()
+
+
+# Strong references to in-flight publish tasks
+_publish_tasks: Set[asyncio.Task] = set()
+
+
+def _publish_done(task: asyncio.Task):
+    _publish_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Notification publish failed: {task.exception()!r}")
+
+
+def _publish_pending(session):
+    items = session.info.pop(_PENDING_KEY, None)
+    if items:
+        task = asyncio.get_running_loop().create_task(notification_broker.publish(items))
+        _publish_tasks.add(task)
+        task.add_done_callback(_publish_done)
+
+
+def _drop_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def queue_notification_push(db: AsyncSession, notification):
+    """
+    Publish a flushed notification once its transaction commits.
+    Nothing is pushed if the session rolls back.
+    """
+    sync_session = db.sync_session
+    pending = sync_session.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = sync_session.info[_PENDING_KEY] = []
+        event.listen(sync_session, "after_commit", _publish_pending, once=True)
+        event.listen(sync_session, "after_soft_rollback", lambda session, previous: _drop_pending(session), once=True)
+    pending.append(serialize_notification(notification))
+
+
+async def _fetch_after(user_id: int, last_id: int, limit: int = BACKLOG_LIMIT) -> List[Dict[str, Any]]:
+    """Committed notifications newer than last_id, oldest first (short-lived session)"""
+    async with async_session_maker() as db:
+        result = await db.execute(
+            select(Notification)
+            .filter(Notification.user_id == user_id, Notification.id > last_id)
+            .order_by(Notification.id)
+            .limit(limit)
+        )
+        return [serialize_notification(n) for n in result.scalars().all()]
+
+
+async def _latest_id(user_id: int) -> int:
+    """Newest notification id of the user (0 when there is none)"""
+    async with async_session_maker() as db:
+        result = await db.execute(
+            select(func.max(Notification.id)).filter(Notification.user_id == user_id)
+        )
+        return result.scalar() or 0
+
+
+def _sse_event(item: Dict[str, Any]) -> str:
+    return f"id: {item['id']}\nevent: notification\ndata: {json.dumps(item)}\n\n"
+
+
+async def notification_event_stream(request, user_id: int, last_id: Optional[int] = None):
+    """
+    Server-Sent Events generator for one user's notifications.
+
+    Replays rows after last_id (or after the last id this process delivered
+    to the user), then streams new rows as they are committed. A fresh
+    stream starts at the user's newest row, so a resync after lagging
+    resumes from there rather than replaying old history. No database
+    session is held while the stream is idle.
+    """
+    if last_id is None:
+        last_id = notification_broker.last_delivered(user_id)
+    if last_id is None:
+        last_id = await _latest_id(user_id)
+    subscription = notification_broker.subscribe(user_id)
+    try:
+        yield "retry: 5000\n\n"
+
+        # Rows committed before the subscription existed
+        for item in await _fetch_after(user_id, last_id):
+            yield _sse_event(item)
+            last_id = item["id"]
+            notification_broker.mark_delivered(user_id, last_id)
+
+        while True:
+            if await request.is_disconnected():
+                break
+
+            if subscription.lagging:
+                # Events were dropped - discard the queue and catch up from the database
+                subscription.lagging = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                items = await _fetch_after(user_id, last_id)
+            else:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if "title" in item:
+                    items = [item]
+                else:
+                    # Id-only event (payload was too large for NOTIFY)
+                    items = await _fetch_after(user_id, last_id)
+
+            for item in items:
+                if item["id"] <= last_id:
+                    continue
+                yield _sse_event(item)
+                last_id = item["id"]
+                notification_broker.mark_delivered(user_id, last_id)
+    finally:
+        notification_broker.unsubscribe(subscription)
@@ -0,0 +1,165 @@
+"""
+Keyset (cursor) pagination helpers
+
+Feeds are ordered by (created_at, id). A cursor is the opaque, URL-safe
+encoding of one row's (created_at, id); the next page is the rows strictly
+before it and a delta sync is the rows strictly after it. Both are index
+range scans, so the cost of a page does not depend on how deep it is.
+
+Directory listings (employees, managers) are ordered by primary key alone
+and page with an `after` cursor holding the last id seen.
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+
+# Default and maximum rows per page
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Response headers carrying the cursors of a page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+SYNC_CURSOR_HEADER = "X-Sync-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor; malformed cursors are a 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _before(created_col, id_col, cursor: Tuple[datetime, int]):
+    created_at, row_id = cursor
+    return or_(created_col < created_at, and_(created_col == created_at, id_col < row_id))
+
+
+def _after(created_col, id_col, cursor: Tuple[datetime, int]):
+    created_at, row_id = cursor
+    return or_(created_col > created_at, and_(created_col == created_at, id_col > row_id))
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(
+    query,
+    created_col,
+    id_col,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    since: Optional[str] = None
+):
+    """
+    Apply keyset pagination to a select.
+
+    - default / `before`: newest first, rows older than the cursor
+    - `since`: oldest first, rows newer than the cursor (delta sync)
+
+    One extra row is fetched so `page_cursors` can tell whether more remain.
+    """
+    if before and since:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'since', not both")
+
+    page_size = clamp_page_size(limit)
+    if since:
+        query = query.filter(_after(created_col, id_col, decode_cursor(since)))
+        query = query.order_by(created_col.asc(), id_col.asc())
+    else:
+        if before:
+            query = query.filter(_before(created_col, id_col, decode_cursor(before)))
+        query = query.order_by(created_col.desc(), id_col.desc())
+    return query.limit(page_size + 1)
+
+
+def page_cursors(
+    rows: List[Any],
+    response: Response,
+    limit: Optional[int] = None,
+    since: Optional[str] = None
+) -> List[Any]:
+    """
+    Trim the look-ahead row and set the cursor headers:
+
+    - X-Next-Cursor: pass as `before` (or `since` for a delta) to continue;
+      absent when there are no more rows
+    - X-Sync-Cursor: newest row seen; pass as `since` to fetch only new rows
+    """
+    page_size = clamp_page_size(limit)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if rows:
+        last = rows[-1]
+        if has_more:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+        newest = last if since else rows[0]
+        response.headers[SYNC_CURSOR_HEADER] = encode_cursor(newest.created_at, newest.id)
+    elif since:
+        # Nothing new: the client keeps its cursor
+        response.headers[SYNC_CURSOR_HEADER] = since
+    return rows
+
+
+# =============== ID KEYSET ===============
+
+def encode_id_cursor(row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_id_cursor(cursor: str) -> int:
+    """Parse an `after` cursor; malformed cursors are a 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        kind, row_id = raw.split("|", 1)
+        if kind != "id":
+            raise ValueError(kind)
+        return int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def id_keyset_page(query, id_col, limit: Optional[int] = None, after: Optional[str] = None):
+    """
+    Order a select by primary key and, when `limit` or `after` is given,
+    return one page of it (plus a look-ahead row for `id_page_cursor`).
+    Without either the whole listing is returned, as before.
+    """
+    query = query.order_by(id_col.asc())
+    if limit is None and after is None:
+        return query
+    if after:
+        query = query.filter(id_col > decode_id_cursor(after))
+    return query.limit(clamp_page_size(limit) + 1)
+
+
+def id_page_cursor(
+    rows: List[Any],
+    response: Response,
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+) -> List[Any]:
+    """Trim the look-ahead row; X-Next-Cursor (pass as `after`) is set when more rows remain"""
+    if limit is None and after is None:
+        return rows
+    page_size = clamp_page_size(limit)
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        response.headers[NEXT_CURSOR_HEADER] = encode_id_cursor(rows[-1].id)
+    return rows
@@ -0,0 +1,335 @@
+"""
+In-memory planning context for schedule generation
+
+Loads every schedule, leave, comp-off, unavailability and overtime approval
+for a department's employees over the generation range (plus a week of
+padding on each side) in a handful of bulk queries. The per-candidate checks
+made by the generator are then answered from dictionaries keyed by
+(employee_id, date) and (employee_id, ISO week) instead of hitting the
+database once per day x shift x employee.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import (
+    Schedule, LeaveRequest, LeaveStatus, CompOffRequest, Unavailability,
+    OvertimeRequest, OvertimeStatus
+)
+from app.holidays_jp import jp_calendar
+
+
+# Statuses that count as worked shifts for hours and consecutive-day checks
+WORK_STATUSES = ('scheduled', 'completed', 'comp_off_earned')
+
+# Statuses that fulfil the Mon-Fri weekly shift requirement
+WEEKDAY_COVERAGE_STATUSES = (
+    'scheduled', 'leave', 'comp_off_taken', 'comp_off_earned',
+    'leave_half_morning', 'leave_half_afternoon'
+)
+
+# Statuses that count toward the weekly total when they fall on Sat-Sun
+WEEKEND_REGULAR_STATUSES = ('scheduled', 'leave', 'leave_half_morning', 'leave_half_afternoon')
+
+PADDING_DAYS = 7
+
+
+class PlannedEntry(NamedTuple):
+    """Lightweight view of a schedule row held in the planning indexes"""
+    schedule_id: Optional[int]
+    date: date
+    status: str
+    start_time: Optional[str]
+    end_time: Optional[str]
+    break_minutes: int
+
+
+def week_key(target_date: date) -> Tuple[int, int]:
+    """ISO (year, week) for a date - weeks run Monday to Sunday"""
+    iso = target_date.isocalendar()
+    return iso[0], iso[1]
+
+
+def entry_work_hours(entry: PlannedEntry) -> float:
+    """Worked hours for an entry (shift length minus role break)"""
+    if not entry.start_time or not entry.end_time:
+        return 0.0
+    try:
+        start = datetime.strptime(entry.start_time, '%H:%M')
+        end = datetime.strptime(entry.end_time, '%H:%M')
+    except (ValueError, TypeError):
+        return 0.0
+    total_hours = (end - start).total_seconds() / 3600
+    return total_hours - (entry.break_minutes or 0) / 60
+
+
+def longest_consecutive_run(dates: Iterable[date]) -> int:
+    """Length of the longest run of consecutive days in a collection of dates"""
+    ordered = sorted(set(dates))
+    if not ordered:
+        return 0
+    longest = 1
+    current = 1
+    for i in range(1, len(ordered)):
+        if (ordered[i] - ordered[i - 1]).days == 1:
+            current += 1
+            longest = max(longest, current)
+        else:
+            current = 1
+    return longest
+
+
+def weekly_shift_limit_verdict(
+    target_date: date,
+    weekday_coverage: int,
+    weekend_regular_shifts: int
+) -> Tuple[bool, str]:
+    """
+    Decide whether one more shift on target_date fits the weekly requirement.
+
+    Shared by the database-backed validator and the in-memory planning context
+    so both produce identical verdicts and messages.
+    Returns: (is_valid, error_message)
+    """
+    week_start = target_date - timedelta(days=target_date.weekday())
+    week_end = week_start + timedelta(days=6)
+
+    required_shifts = jp_calendar.get_shifts_required_for_week(week_start)
+
+    week_info = jp_calendar.get_week_info(week_start)
+    holiday_str = ""
+    if week_info['weekday_holiday_count'] > 0:
+        holiday_names = [day['holiday_name'] for day in week_info['days'] if day['holiday_name']]
+        holiday_str = f" (Contains {week_info['weekday_holiday_count']} weekday holiday(s): {', '.join(holiday_names)})"
+
+    if target_date.weekday() >= 5:
+        # Weekend (Sat-Sun) shift
+        if weekday_coverage >= required_shifts:
+            return False, f"Cannot assign weekend shift on {target_date} - weekday requirement already met. Employee has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str}"
+        total_shifts = weekday_coverage + weekend_regular_shifts
+        if total_shifts >= required_shifts:
+            return False, f"Cannot assign more than {required_shifts} shifts per week. Employee has {weekday_coverage} weekday + {weekend_regular_shifts} weekend shifts (total: {total_shifts}){holiday_str}"
+    else:
+        # Weekday (Mon-Fri) shift
+        if weekday_coverage >= required_shifts:
+            return False, f"Cannot assign more than {required_shifts} weekday shifts per week. Employee already has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str} (Mon-Sun: {week_start} to {week_end})"
+
+    return True, ""
+
+
+class PlanningContext:
+    """
+    Preloaded, mutable view of a department's planning data.
+
+    Build it with `PlanningContext.load(...)`, query it during generation and
+    call `add_schedule(...)` for every row the generator creates so later
+    checks in the same run see it.
+    """
+
+    def __init__(self, department_id: int, start_date: date, end_date: date,
+                 employee_ids: Iterable[int], role_breaks: Optional[Dict[int, int]] = None):
+        self.department_id = department_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.window_start = start_date - timedelta(days=PADDING_DAYS)
+        self.window_end = end_date + timedelta(days=PADDING_DAYS)
+        self.employee_ids = list(employee_ids)
+        self.role_breaks = dict(role_breaks or {})
+
+        self.by_day: Dict[Tuple[int, date], List[PlannedEntry]] = defaultdict(list)
+        self.by_week: Dict[Tuple[int, Tuple[int, int]], List[PlannedEntry]] = defaultdict(list)
+        self.leaves: Dict[Tuple[int, date], LeaveRequest] = {}
+        self.comp_offs: Dict[Tuple[int, date], CompOffRequest] = {}
+        self.unavailable: set = set()
+        self.overtime_approved: Dict[Tuple[int, date], float] = defaultdict(float)
+
+    @classmethod
+    async def load(
+        cls,
+        db: AsyncSession,
+        department_id: int,
+        employee_ids: Iterable[int],
+        start_date: date,
+        end_date: date,
+        role_breaks: Optional[Dict[int, int]] = None
+    ) -> "PlanningContext":
+        """Bulk-load all planning data for the employees over the padded range"""
+        ctx = cls(department_id, start_date, end_date, employee_ids, role_breaks)
+        if not ctx.employee_ids:
+            return ctx
+
+        # Schedules are matched by employee (not department) so rows an
+        # employee holds elsewhere still block double-booking
+        schedules_result = await db.execute(
+            select(Schedule)
+            .filter(
+                Schedule.employee_id.in_(ctx.employee_ids),
+                Schedule.date >= ctx.window_start,
+                Schedule.date <= ctx.window_end
+            )
+            .options(selectinload(Schedule.role))
+        )
+        for sched in schedules_result.scalars().all():
+            break_minutes = (sched.role.break_minutes or 0) if sched.role else 0
+            ctx._index(sched.employee_id, PlannedEntry(
+                sched.id, sched.date, sched.status, sched.start_time, sched.end_time, break_minutes
+            ))
+
+        leaves_result = await db.execute(
+            select(LeaveRequest)
+            .filter(
+                LeaveRequest.employee_id.in_(ctx.employee_ids),
+                LeaveRequest.status == LeaveStatus.APPROVED,
+                LeaveRequest.start_date <= ctx.window_end,
+                LeaveRequest.end_date >= ctx.window_start
+            )
+        )
+        for leave in leaves_result.scalars().all():
+            day = max(leave.start_date, ctx.window_start)
+            last = min(leave.end_date, ctx.window_end)
+            while day <= last:
+                ctx.leaves.setdefault((leave.employee_id, day), leave)
+                day += timedelta(days=1)
+
+        comp_off_result = await db.execute(
+            select(CompOffRequest)
+            .filter(
+                CompOffRequest.employee_id.in_(ctx.employee_ids),
+                CompOffRequest.status == LeaveStatus.APPROVED,
+                CompOffRequest.comp_off_date >= ctx.window_start,
+                CompOffRequest.comp_off_date <= ctx.window_end
+            )
+        )
+        for comp_off in comp_off_result.scalars().all():
+            ctx.comp_offs.setdefault((comp_off.employee_id, comp_off.comp_off_date), comp_off)
+
+        unavail_result = await db.execute(
+            select(Unavailability.employee_id, Unavailability.date)
+            .filter(
+                Unavailability.employee_id.in_(ctx.employee_ids),
+                Unavailability.date >= ctx.window_start,
+                Unavailability.date <= ctx.window_end
+            )
+        )
+        ctx.unavailable = {(row[0], row[1]) for row in unavail_result.all()}
+
+        overtime_result = await db.execute(
+            select(OvertimeRequest.employee_id, OvertimeRequest.request_date, OvertimeRequest.request_hours)
+            .filter(
+                OvertimeRequest.employee_id.in_(ctx.employee_ids),
+                OvertimeRequest.status == OvertimeStatus.APPROVED,
+                OvertimeRequest.request_date >= ctx.window_start,
+                OvertimeRequest.request_date <= ctx.window_end
+            )
+        )
+        for emp_id, request_date, hours in overtime_result.all():
+            ctx.overtime_approved[(emp_id, request_date)] += hours or 0
+
+        return ctx
+
+    def _index(self, employee_id: int, entry: PlannedEntry):
+        self.by_day[(employee_id, entry.date)].append(entry)
+        self.by_week[(employee_id, week_key(entry.date))].append(entry)
+
+    def add_schedule(self, schedule: Schedule):
+        """Record a schedule created during this run in the indexes"""
+        self.add_assignment(
+            schedule.employee_id, schedule.role_id, schedule.date, schedule.status,
+            schedule.start_time, schedule.end_time, schedule_id=schedule.id
+        )
+
+    def add_assignment(self, employee_id: int, role_id: int, target_date: date, status: str,
+                       start_time: Optional[str], end_time: Optional[str],
+                       schedule_id: Optional[int] = None):
+        """Record a buffered (not yet inserted) assignment in the indexes"""
+        self._index(employee_id, PlannedEntry(
+            schedule_id, target_date, status, start_time, end_time, self.role_breaks.get(role_id, 0)
+        ))
+
+    # ----- Lookups -----
+
+    def has_schedule_on(self, employee_id: int, target_date: date) -> bool:
+        """True if the employee already has any schedule row on the date"""
+        return bool(self.by_day.get((employee_id, target_date)))
+
+    def get_leave(self, employee_id: int, target_date: date) -> Optional[LeaveRequest]:
+        """Approved leave request covering the date, if any"""
+        return self.leaves.get((employee_id, target_date))
+
+    def get_comp_off(self, employee_id: int, target_date: date) -> Optional[CompOffRequest]:
+        """Approved comp-off request for the date, if any"""
+        return self.comp_offs.get((employee_id, target_date))
+
+    def is_unavailable(self, employee_id: int, target_date: date) -> bool:
+        """True if the employee marked the date as unavailable"""
+        return (employee_id, target_date) in self.unavailable
+
+    def approved_overtime_hours(self, employee_id: int, target_date: date) -> float:
+        """Hours of approved overtime requested for the date"""
+        return self.overtime_approved.get((employee_id, target_date), 0.0)
+
+    def week_entries(self, employee_id: int, target_date: date,
+                     statuses: Optional[Iterable[str]] = None) -> List[PlannedEntry]:
+        """Entries in the Mon-Sun week containing target_date, optionally filtered by status"""
+        entries = self.by_week.get((employee_id, week_key(target_date)), [])
+        if statuses is None:
+            return list(entries)
+        allowed = set(statuses)
+        return [e for e in entries if e.status in allowed]
+
+    def consecutive_run_with(self, employee_id: int, target_date: date) -> int:
+        """Longest run of worked days in the week if a shift were added on target_date"""
+        dates = [e.date for e in self.week_entries(employee_id, target_date, WORK_STATUSES)]
+        dates.append(target_date)
+        return longest_consecutive_run(dates)
+
+    def worked_hours(self, employee_id: int, target_date: date) -> Tuple[float, float]:
+        """(week hours, hours on target_date) from worked shifts in the week"""
+        week_hours = 0.0
+        day_hours = 0.0
+        for entry in self.week_entries(employee_id, target_date, WORK_STATUSES):
+            hours = entry_work_hours(entry)
+            week_hours += hours
+            if entry.date == target_date:
+                day_hours += hours
+        return week_hours, day_hours
+
+    def first_week_shift_times(self, employee_id: int,
+                               target_date: date) -> Tuple[Optional[str], Optional[str]]:
+        """Times of the earliest other worked shift in the same week"""
+        candidates = [
+            e for e in self.week_entries(employee_id, target_date, WORK_STATUSES)
+            if e.date != target_date
+        ]
+        if not candidates:
+            return None, None
+        first = min(candidates, key=lambda e: e.date)
+        return first.start_time, first.end_time
+
+    def latest_weekday_shift_times(self, employee_id: int,
+                                   target_date: date) -> Tuple[Optional[str], Optional[str]]:
+        """Times of the most recent earlier worked shift on the same weekday within the window"""
+        day = target_date - timedelta(days=7)
+        while day >= self.window_start:
+            for entry in self.by_day.get((employee_id, day), []):
+                if entry.status in WORK_STATUSES and entry.start_time and entry.end_time:
+                    return entry.start_time, entry.end_time
+            day -= timedelta(days=7)
+        return None, None
+
+    def check_weekly_shift_limit(self, employee_id: int, target_date: date) -> Tuple[bool, str]:
+        """In-memory equivalent of validate_5_shifts_per_week"""
+        weekday_coverage = 0
+        weekend_regular = 0
+        for entry in self.week_entries(employee_id, target_date):
+            if entry.date.weekday() < 5:
+                if entry.status in WEEKDAY_COVERAGE_STATUSES:
+                    weekday_coverage += 1
+            elif entry.status in WEEKEND_REGULAR_STATUSES:
+                weekend_regular += 1
+        return weekly_shift_limit_verdict(target_date, weekday_coverage, weekend_regular)
@@ -0,0 +1,206 @@
+"""
+Principal cache for authenticated requests
+
+`get_current_user` used to select the User row on every request, and most
+handlers then selected the caller's Employee or Manager row as well. The
+principal - who the caller is and where they belong - is now resolved with
+one joined query and kept in a per-process TTL/LRU cache keyed by the token
+subject, so a warm request is authenticated and scoped without touching the
+database.
+
+Entries are dropped as soon as a session that changed a User, Manager,
+Employee or SubAdmin commits (ORM flushes and bulk UPDATE/DELETE statements
+are both observed). The TTL bounds staleness for changes made by other
+worker processes.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional, Set
+
+from sqlalchemy import and_, event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Employee, Manager, SubAdmin, User, UserType
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Immutable snapshot of the authenticated user.
+
+    Exposes the User columns handlers read from `current_user` (id,
+    username, email, full_name, user_type, is_active) plus the caller's
+    Employee / Manager primary keys and department.
+    """
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    user_type: UserType
+    is_active: bool
+    employee_id: Optional[int] = None
+    manager_id: Optional[int] = None
+    department_id: Optional[int] = None
+    is_sub_admin: bool = False
+
+
+async def load_principal(db: AsyncSession, username: str) -> Optional[Principal]:
+    """Resolve a username to its principal in a single joined query"""
+    result = await db.execute(
+        select(
+            User.id, User.username, User.email, User.full_name, User.user_type, User.is_active,
+            Employee.id, Employee.department_id,
+            Manager.id, Manager.department_id,
+            SubAdmin.id
+        )
+        .outerjoin(Employee, Employee.user_id == User.id)
+        .outerjoin(Manager, Manager.user_id == User.id)
+        .outerjoin(SubAdmin, and_(SubAdmin.user_id == User.id, SubAdmin.is_active == True))
+        .filter(User.username == username)
+        .order_by(Employee.id, Manager.id)
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    (user_id, username, email, full_name, user_type, is_active,
+     employee_pk, employee_dept, manager_pk, manager_dept, sub_admin_pk) = row
+
+    # Managers are scoped to the department they manage, everyone else to their own
+    department_id = manager_dept if user_type == UserType.MANAGER else employee_dept
+    if department_id is None:
+        department_id = manager_dept if manager_dept is not None else employee_dept
+
+    return Principal(
+        id=user_id,
+        username=username,
+        email=email,
+        full_name=full_name,
+        user_type=user_type,
+        is_active=bool(is_active),
+        employee_id=employee_pk,
+        manager_id=manager_pk,
+        department_id=department_id,
+        is_sub_admin=user_type == UserType.SUB_ADMIN or sub_admin_pk is not None,
+    )
+
+
+class PrincipalCache:
+    """Thread-safe TTL + LRU map of token subject -> Principal"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return principal
+
+    def put(self, principal: Principal):
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[principal.username] = (principal, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(principal.username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_users(self, user_ids: Set[int]):
+        """Drop every entry belonging to the given user ids"""
+        if not user_ids:
+            return
+        with self._lock:
+            stale = [key for key, (principal, _) in self._entries.items() if principal.id in user_ids]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "hits": self.hits, "misses": self.misses}
+
+
+# Global instance
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+# =============== INVALIDATION ===============
+
+_WATCHED = (User, Manager, Employee, SubAdmin)
+_STALE_USERS_KEY = "principal_stale_user_ids"
+_STALE_ALL_KEY = "principal_stale_all"
+
+
+def _affected_user_ids(obj) -> Set[int]:
+    """User ids whose principal depends on this row (old and new owner)"""
+    if isinstance(obj, User):
+        return {obj.id} if obj.id is not None else set()
+    ids = {obj.user_id} if obj.user_id is not None else set()
+    history = inspect(obj).attrs.user_id.history
+    ids.update(uid for uid in (history.deleted or ()) if uid is not None)
+    return ids
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_principals(session, flush_context):
+    stale = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, _WATCHED):
+            stale |= _affected_user_ids(obj)
+    if stale:
+        session.info.setdefault(_STALE_USERS_KEY, set()).update(stale)
+        # Drop now as well so concurrent requests do not keep serving the old row
+        principal_cache.invalidate_users(stale)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if any(mapper.class_ in _WATCHED for mapper in orm_execute_state.all_mappers):
+        # Bulk statements do not say which rows they touched
+        orm_execute_state.session.info[_STALE_ALL_KEY] = True
+        principal_cache.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    if session.info.pop(_STALE_ALL_KEY, False):
+        session.info.pop(_STALE_USERS_KEY, None)
+        principal_cache.clear()
+        return
+    principal_cache.invalidate_users(session.info.pop(_STALE_USERS_KEY, set()))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session, previous_transaction):
+    session.info.pop(_STALE_ALL_KEY, None)
+    session.info.pop(_STALE_USERS_KEY, None)
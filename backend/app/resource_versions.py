@@ -0,0 +1,200 @@
+"""
+Version stamps and conditional GETs for frequently polled reads
+
+Schedule views poll GET /schedules every 30 seconds although schedules
+rarely change between polls. Each read now carries an ETag (and
+Last-Modified) derived from small change counters in `resource_versions`,
+and a request whose If-None-Match still matches is answered with 304
+after a single lookup in that table - schedules are neither queried nor
+serialized.
+
+Counters are bumped by statement-level triggers installed with
+`install_version_triggers`, so every write path is covered: ORM flushes,
+bulk UPDATE/DELETE, COPY from the schedule generator, cascades and
+writes from other workers all bump in the writer's own transaction.
+
+- schedules: one row per (department_id, month) touched
+- roles:     one row for any role or shift change
+"""
+
+import calendar
+import hashlib
+from datetime import date, datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterable, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.models import ResourceVersion
+
+
+SCHEDULES_SCOPE = "schedules"
+ROLES_SCOPE = "roles"
+
+# `period` of counters that are not tied to a month
+UNDATED = date(1970, 1, 1)
+
+# Responses are stored by the browser but revalidated on every poll
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+_BUMP_SQL = """
+    INSERT INTO resource_versions (scope, department_id, period, version, updated_at)
+    SELECT '{scope}', department_id, period, 1, now() AT TIME ZONE 'utc'
+    FROM ({source}) touched
+    ON CONFLICT (scope, department_id, period)
+    DO UPDATE SET version = resource_versions.version + 1, updated_at = EXCLUDED.updated_at;
+"""
+
+_SCHEDULE_MONTHS = "SELECT DISTINCT department_id, date_trunc('month', date)::date AS period FROM {rows}"
+
+VERSION_TRIGGER_STATEMENTS = [
+    # Schedules: transition tables give the exact (department, month) keys touched
+    f"""
+    CREATE OR REPLACE FUNCTION bump_schedule_versions() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {_BUMP_SQL.format(scope=SCHEDULES_SCOPE, source=_SCHEDULE_MONTHS.format(rows='new_rows'))}
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {_BUMP_SQL.format(scope=SCHEDULES_SCOPE, source=_SCHEDULE_MONTHS.format(rows='old_rows'))}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedules_version_insert ON schedules",
+    """
+    CREATE TRIGGER trg_schedules_version_insert AFTER INSERT ON schedules
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_versions()
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedules_version_update ON schedules",
+    """
+    CREATE TRIGGER trg_schedules_version_update AFTER UPDATE ON schedules
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_versions()
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedules_version_delete ON schedules",
+    """
+    CREATE TRIGGER trg_schedules_version_delete AFTER DELETE ON schedules
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_versions()
+    """,
+    # Roles and shifts: one shared counter
+    f"""
+    CREATE OR REPLACE FUNCTION bump_role_versions() RETURNS trigger AS $$
+    BEGIN
+        {_BUMP_SQL.format(scope=ROLES_SCOPE, source=f"SELECT 0 AS department_id, DATE '{UNDATED.isoformat()}' AS period")}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_roles_version ON roles",
+    """
+    CREATE TRIGGER trg_roles_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON roles
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_role_versions()
+    """,
+    "DROP TRIGGER IF EXISTS trg_shifts_version ON shifts",
+    """
+    CREATE TRIGGER trg_shifts_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON shifts
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_role_versions()
+    """,
+]
+
+
+async def install_version_triggers(conn: AsyncConnection):
+    for statement in VERSION_TRIGGER_STATEMENTS:
+        await conn.execute(text(statement))
+
+
+async def read_version(
+    db: AsyncSession,
+    scope: str,
+    department_ids: Optional[Sequence[int]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[str, Optional[datetime]]:
+    """
+    Combined stamp of the matching counters and when the newest one moved.
+    Counters only ever grow, so (sum, count) changes whenever any of them does.
+    """
+    query = select(
+        func.coalesce(func.sum(ResourceVersion.version), 0),
+        func.count(),
+        func.max(ResourceVersion.updated_at)
+    ).filter(ResourceVersion.scope == scope)
+    if department_ids is not None:
+        query = query.filter(ResourceVersion.department_id.in_(list(department_ids)))
+    if start_date:
+        query = query.filter(ResourceVersion.period >= date(start_date.year, start_date.month, 1))
+    if end_date:
+        query = query.filter(ResourceVersion.period <= end_date)
+    total, rows, updated_at = (await db.execute(query)).one()
+    return f"{total}.{rows}", updated_at
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the request key and version stamps"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def _http_date(value: datetime) -> str:
+    return formatdate(calendar.timegm(value.timetuple()), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = REVALIDATE_CACHE_CONTROL,
+    vary: Iterable[str] = ("Authorization",)
+) -> Optional[Response]:
+    """
+    Set the validators on `response`; return a 304 to send instead when the
+    client's copy is current (If-None-Match wins over If-Modified-Since).
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    if vary:
+        headers["Vary"] = ", ".join(vary)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+    if fresh:
+        return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,269 @@
+"""
+Schedule delta sync
+
+GET /schedules/changes lets a client keep a local copy of the schedules it
+watches and refresh it with only what changed since its last sync:
+rows inserted or updated (upserts) plus the ids of deleted rows
+(tombstones).
+
+Timestamps make unreliable cursors here: schedule generation keeps its
+transaction open for the whole solve, so rows become visible long after
+their updated_at and a timestamp cursor would skip them. Changes are
+therefore keyed by PostgreSQL transaction ids instead:
+
+- a BEFORE INSERT OR UPDATE row trigger stamps `schedules.change_txid`
+  with the writing transaction's id (COPY included)
+- an AFTER DELETE statement trigger copies deleted rows into
+  `schedule_deletions` with the deleting transaction's id
+- an AFTER UPDATE statement trigger does the same for the old
+  (employee, department, date) of rows moved to another one, so a client
+  whose scope the row left receives a tombstone for it
+- a cursor holds the xmin of the reader's snapshot - every transaction
+  below it had finished when the page was read - and the next sync asks
+  for rows stamped at or above it, so late commits are picked up (a row
+  may occasionally arrive twice; upserts are idempotent)
+
+Tombstones are kept for SCHEDULE_TOMBSTONE_RETENTION_DAYS (0 keeps them
+forever); older cursors get 410 and the client starts over with a full sync.
+"""
+
+import asyncio
+import base64
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import settings
+from app.models import Schedule, ScheduleDeletion
+
+
+# Default and maximum upserts per page
+DEFAULT_CHANGES_PAGE_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 2000
+
+CHANGE_TRACKING_STATEMENTS = [
+    "ALTER TABLE schedules ADD COLUMN IF NOT EXISTS change_txid BIGINT",
+    "CREATE INDEX IF NOT EXISTS ix_schedules_change_txid ON schedules (change_txid, id)",
+    """
+    CREATE OR REPLACE FUNCTION stamp_schedule_change() RETURNS trigger AS $$
+    BEGIN
+        NEW.change_txid := txid_current();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedules_change_stamp ON schedules",
+    """
+    CREATE TRIGGER trg_schedules_change_stamp BEFORE INSERT OR UPDATE ON schedules
+    FOR EACH ROW EXECUTE FUNCTION stamp_schedule_change()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION log_schedule_deletions() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO schedule_deletions (schedule_id, department_id, employee_id, date, deleted_txid, deleted_at)
+        SELECT id, department_id, employee_id, date, txid_current(), now() AT TIME ZONE 'utc'
+        FROM old_rows;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedules_deletion_log ON schedules",
+    """
+    CREATE TRIGGER trg_schedules_deletion_log AFTER DELETE ON schedules
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_schedule_deletions()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION log_schedule_moves() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO schedule_deletions (schedule_id, department_id, employee_id, date, deleted_txid, deleted_at)
+        SELECT o.id, o.department_id, o.employee_id, o.date, txid_current(), now() AT TIME ZONE 'utc'
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE (o.employee_id, o.department_id, o.date) IS DISTINCT FROM (n.employee_id, n.department_id, n.date);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedules_move_log ON schedules",
+    """
+    CREATE TRIGGER trg_schedules_move_log AFTER UPDATE ON schedules
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_schedule_moves()
+    """,
+]
+
+
+async def install_change_tracking(conn: AsyncConnection):
+    for statement in CHANGE_TRACKING_STATEMENTS:
+        await conn.execute(text(statement))
+
+
+# =============== CURSORS ===============
+
+def _encode(*parts) -> str:
+    raw = "|".join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def encode_sync_cursor(horizon: int, issued_at: int) -> str:
+    """Cursor for the next delta: everything stamped at or above `horizon`"""
+    return _encode("s", issued_at, horizon)
+
+
+def encode_page_cursor(since: Optional[int], horizon: int, issued_at: int, last: Tuple[int, int]) -> str:
+    """Cursor for the next page of the same sync"""
+    return _encode("p", issued_at, "" if since is None else since, horizon, last[0], last[1])
+
+
+def decode_cursor(cursor: str) -> Dict[str, Optional[int]]:
+    """Parse a cursor; malformed cursors are a 400, expired ones a 410"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        kind, *fields = raw.split("|")
+        if kind == "s" and len(fields) == 2:
+            parsed = {"issued_at": int(fields[0]), "since": int(fields[1]), "horizon": None, "last": None}
+        elif kind == "p" and len(fields) == 5:
+            parsed = {
+                "issued_at": int(fields[0]),
+                "since": int(fields[1]) if fields[1] else None,
+                "horizon": int(fields[2]),
+                "last": (int(fields[3]), int(fields[4])),
+            }
+        else:
+            raise ValueError(kind)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    retention = settings.SCHEDULE_TOMBSTONE_RETENTION_DAYS
+    if retention > 0 and parsed["issued_at"] < time.time() - retention * 86400:
+        raise HTTPException(status_code=410, detail="Cursor expired; run a full sync without 'since'")
+    return parsed
+
+
+# =============== READS ===============
+
+async def read_schedule_changes(
+    db: AsyncSession,
+    filters: List,
+    deletion_filters: List,
+    since: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Dict:
+    """
+    One page of changes. `filters` restrict Schedule rows and
+    `deletion_filters` the matching ScheduleDeletion rows (caller scope and
+    date range). Without `since` the page is a full sync of the scope.
+    """
+    page_size = max(1, min(limit or DEFAULT_CHANGES_PAGE_SIZE, MAX_CHANGES_PAGE_SIZE))
+    cursor = decode_cursor(since) if since else None
+    since_txid = cursor["since"] if cursor else None
+
+    if cursor and cursor["horizon"] is not None:
+        horizon, issued_at = cursor["horizon"], cursor["issued_at"]
+    else:
+        # Taken before reading: anything that commits later is at or above it
+        horizon = (await db.execute(text("SELECT txid_snapshot_xmin(txid_current_snapshot())"))).scalar()
+        issued_at = int(time.time())
+
+    change_key = func.coalesce(Schedule.change_txid, 0)
+    query = select(
+        Schedule.id, Schedule.department_id, Schedule.employee_id, Schedule.role_id, Schedule.shift_id,
+        Schedule.date, Schedule.start_time, Schedule.end_time, Schedule.status, Schedule.notes,
+        Schedule.updated_at, change_key.label("change_txid")
+    ).filter(*filters)
+    if since_txid is not None:
+        query = query.filter(Schedule.change_txid >= since_txid)
+    if cursor and cursor["last"]:
+        query = query.filter(tuple_(change_key, Schedule.id) > cursor["last"])
+    rows = (await db.execute(query.order_by(change_key, Schedule.id).limit(page_size + 1))).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    upserts = [{key: value for key, value in row._mapping.items() if key != "change_txid"} for row in rows]
+
+    if has_more:
+        last = rows[-1]
+        return {
+            "cursor": encode_page_cursor(since_txid, horizon, issued_at, (last.change_txid, last.id)),
+            "has_more": True,
+            "upserts": upserts,
+            "deleted": [],
+        }
+
+    # Tombstones go out with the last page, after every upsert of the sync.
+    # A row that moved but is still in the caller's scope is not one.
+    deleted = []
+    if since_txid is not None:
+        still_visible = select(Schedule.id).filter(Schedule.id == ScheduleDeletion.schedule_id, *filters).exists()
+        deletion_result = await db.execute(
+            select(ScheduleDeletion.schedule_id).distinct().filter(
+                ScheduleDeletion.deleted_txid >= since_txid,
+                ~still_visible,
+                *deletion_filters
+            )
+        )
+        deleted = [schedule_id for (schedule_id,) in deletion_result.all()]
+
+    return {
+        "cursor": encode_sync_cursor(horizon, issued_at),
+        "has_more": False,
+        "upserts": upserts,
+        "deleted": deleted,
+    }
+
+
+# =============== RETENTION ===============
+
+async def purge_schedule_tombstones(conn: AsyncConnection, retention_days: float) -> int:
+    result = await conn.execute(
+        text("DELETE FROM schedule_deletions WHERE deleted_at < (now() AT TIME ZONE 'utc') - make_interval(secs => :seconds)"),
+        {"seconds": retention_days * 86400}
+    )
+    return result.rowcount
+
+
+class TombstonePurger:
+    """Drops expired tombstones once a day"""
+
+    def __init__(self, retention_days: float = 30.0, interval_hours: float = 24.0):
+        self.retention_days = retention_days
+        self.interval_hours = interval_hours
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.retention_days <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        from app.database import engine
+
+        while True:
+            try:
+                async with engine.begin() as conn:
+                    purged = await purge_schedule_tombstones(conn, self.retention_days)
+                if purged:
+                    print(f"Purged {purged} schedule tombstones")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Schedule tombstone purge error: {e}")
+            await asyncio.sleep(self.interval_hours * 3600)
+
+
+# Global instance
+tombstone_purger = TombstonePurger(retention_days=settings.SCHEDULE_TOMBSTONE_RETENTION_DAYS)
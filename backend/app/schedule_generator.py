@@ -15,12 +15,17 @@ from collections import defaultdict
 from typing import List, Dict, Tuple, Optional, Any
 from ortools.sat.python import cp_model
 
+from app.solver_config import configure_solver
+
 
 class ShiftScheduleGenerator:
     """Generate optimized schedules using priority-based distribution and OR-Tools"""
 
     def __init__(self, employees: List[Dict], roles: List[Dict], 
-                 leave_dates: Dict[int, set], unavailable_dates: Dict[int, set]):
+                 leave_dates: Dict[int, set], unavailable_dates: Dict[int, set],
+                 time_limit_seconds: float = 90.0, num_workers: Optional[int] = None,
+                 hints: Optional[Dict[Tuple[int, date], int]] = None,
+                 solution_callback: Optional[cp_model.CpSolverSolutionCallback] = None):
         """
         Initialize the generator with employees, roles, and blocked dates
         
@@ -29,11 +34,20 @@ class ShiftScheduleGenerator:
             roles: List of role dicts with id, name, priority_percentage, required_count, etc.
             leave_dates: Dict mapping employee_id -> set of leave dates (date objects)
             unavailable_dates: Dict mapping employee_id -> set of unavailable dates
+            time_limit_seconds: Wall-clock budget for the CP-SAT search
+            num_workers: CP-SAT search workers (None = resolve from settings / cores)
+            hints: Dict mapping (employee_id, date) -> role_id from a previous
+                solution, used to warm-start the search (exercised by benchmark_solver.py)
+            solution_callback: Optional callback invoked on each improving solution
         """
         self.employees = employees
         self.roles = roles
         self.leave_dates = leave_dates
         self.unavailable_dates = unavailable_dates
+        self.time_limit_seconds = time_limit_seconds
+        self.num_workers = num_workers
+        self.hints = hints
+        self.solution_callback = solution_callback
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
         self.feedback = []
@@ -245,6 +259,10 @@ class ShiftScheduleGenerator:
                             f'assign_e{emp_id}_d{date_obj}_r{role_id}'
                         )
                         assignments[emp_id][date_obj][role_id] = var
+                        if self.hints is not None:
+                            # Warm start from the current schedule (complete hint)
+                            hinted = self.hints.get((emp_id, date_obj)) == role_id
+                            self.model.AddHint(var, 1 if hinted else 0)
 
         # ===== CONSTRAINTS =====
         self.add_feedback("Step 4: Adding constraints...", 'info')
@@ -348,11 +366,11 @@ class ShiftScheduleGenerator:
         # ===== SOLVE =====
         self.add_feedback("Step 8: Solving with OR-Tools CP-SAT...", 'info')
 
-        self.solver.parameters.max_time_in_seconds = 90.0
-        self.solver.parameters.num_search_workers = 8
-        self.solver.parameters.log_search_progress = False
+        configure_solver(self.solver, self.time_limit_seconds, self.num_workers)
+        if self.hints:
+            self.add_feedback(f"  Warm-starting from {len(self.hints)} existing assignments", 'info')
 
-        status = self.solver.Solve(self.model)
+        status = self.solver.Solve(self.model, self.solution_callback)
 
         if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
             error_msg = "Could not generate feasible schedule. Try adjusting constraints."
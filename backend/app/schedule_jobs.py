@@ -0,0 +1,142 @@
+"""
+Background schedule-generation jobs
+
+Keeps an in-process registry of generation jobs so `/schedules/generate`
+can return a job id immediately while the work runs as an asyncio task.
+Clients poll the job for progress and feedback, and may cancel it; the
+generator checks the cancel flag between days.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+
+class ScheduleJobCancelled(Exception):
+    """Raised inside a generation run when its job has been cancelled"""
+
+
+class ScheduleJob:
+    """State of one background generation run"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+    def __init__(self, department_id: int, user_id: int, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.department_id = department_id
+        self.user_id = user_id
+        self.params = params
+        self.status = self.PENDING
+        self.progress = 0.0
+        self.feedback: List[str] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.cancel_requested = False
+        self.task = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.FINISHED_STATES
+
+    def mark_running(self):
+        self.status = self.RUNNING
+        self.started_at = datetime.utcnow()
+
+    def set_progress(self, done: int, total: int):
+        """Record progress as a percentage of work units completed"""
+        self.progress = round(100.0 * done / total, 1) if total else 100.0
+
+    def check_cancelled(self):
+        """Raise ScheduleJobCancelled if cancellation was requested"""
+        if self.cancel_requested:
+            raise ScheduleJobCancelled()
+
+    def request_cancel(self):
+        """Flag the job for cancellation; the run stops at its next day boundary"""
+        self.cancel_requested = True
+
+    def mark_completed(self, result: Dict[str, Any]):
+        self.status = self.COMPLETED
+        self.progress = 100.0
+        self.result = result
+        self.finished_at = datetime.utcnow()
+
+    def mark_failed(self, error: str):
+        self.status = self.FAILED
+        self.error = error
+        self.finished_at = datetime.utcnow()
+
+    def mark_cancelled(self):
+        self.status = self.CANCELLED
+        self.finished_at = datetime.utcnow()
+        self.feedback.append("Generation cancelled - no schedules were changed")
+
+    def to_dict(self, feedback_offset: int = 0) -> Dict[str, Any]:
+        """Serialize for the polling endpoint; feedback_offset skips messages already seen"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "department_id": self.department_id,
+            "params": self.params,
+            "feedback": self.feedback[feedback_offset:],
+            "feedback_count": len(self.feedback),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ScheduleJobRegistry:
+    """In-process store of generation jobs, pruned after a retention period"""
+
+    def __init__(self, retention: timedelta = timedelta(hours=1)):
+        self.retention = retention
+        self._jobs: Dict[str, ScheduleJob] = {}
+
+    def create(self, department_id: int, user_id: int, params: Dict[str, Any]) -> ScheduleJob:
+        self.prune()
+        job = ScheduleJob(department_id, user_id, params)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[ScheduleJob]:
+        return self._jobs.get(job_id)
+
+    def active_for_department(self, department_id: int) -> Optional[ScheduleJob]:
+        """Return an unfinished job for the department, if one exists"""
+        for job in self._jobs.values():
+            if job.department_id == department_id and not job.is_finished:
+                return job
+        return None
+
+    def prune(self):
+        """Drop finished jobs older than the retention period"""
+        cutoff = datetime.utcnow() - self.retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.is_finished and job.finished_at and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def cancel_all(self):
+        """Request cancellation of every unfinished job (used on shutdown)"""
+        for job in self._jobs.values():
+            if not job.is_finished:
+                job.request_cancel()
+
+
+# Global instance
+schedule_jobs = ScheduleJobRegistry()
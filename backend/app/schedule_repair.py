@@ -0,0 +1,298 @@
+"""
+Incremental schedule repair
+
+When a leave is approved or an employee is marked unavailable, only the
+work shifts sitting on the changed (employee, date) cells need to move.
+Instead of regenerating the whole range, this re-solves just the affected
+role and ISO week with a small CP-SAT model: every other assignment is
+pinned and the freed rows are handed to eligible colleagues by updating
+`Schedule.employee_id` in place, so row ids (and anything referencing them)
+stay stable.
+
+Each group's model is solved in the solver pool (`solver_service`), so an
+approval that touches several weeks waits on the pool instead of blocking
+the event loop.
+"""
+
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ortools.sat.python import cp_model
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Schedule, Employee, Role, CheckInOut, Attendance
+from app.planning_context import (
+    PlanningContext, PlannedEntry, WORK_STATUSES, WEEKDAY_COVERAGE_STATUSES,
+    WEEKEND_REGULAR_STATUSES, entry_work_hours, week_key
+)
+from app.holidays_jp import jp_calendar
+from app.solver_config import configure_solver
+from app.solver_service import solver_service, SolverBusyError, SolverTimeoutError
+
+
+REPAIR_TIME_LIMIT_SECONDS = 2.0
+MAX_CONSECUTIVE_SHIFTS = 5
+
+
+def _remaining_weekly_slots(ctx: PlanningContext, employee_id: int, week_start: date) -> int:
+    """Shifts the employee can still take in the week under the weekly requirement"""
+    used = 0
+    for entry in ctx.week_entries(employee_id, week_start):
+        if entry.date.weekday() < 5:
+            if entry.status in WEEKDAY_COVERAGE_STATUSES:
+                used += 1
+        elif entry.status in WEEKEND_REGULAR_STATUSES:
+            used += 1
+    return max(0, jp_calendar.get_shifts_required_for_week(week_start) - used)
+
+
+def _is_eligible(ctx: PlanningContext, emp: Employee, target_date: date, hours: float) -> bool:
+    """Single-shift feasibility for a candidate, using the preloaded indexes"""
+    if (ctx.get_leave(emp.id, target_date) or ctx.get_comp_off(emp.id, target_date)
+            or ctx.is_unavailable(emp.id, target_date) or ctx.has_schedule_on(emp.id, target_date)):
+        return False
+    if ctx.consecutive_run_with(emp.id, target_date) > MAX_CONSECUTIVE_SHIFTS:
+        return False
+    week_hours, day_hours = ctx.worked_hours(emp.id, target_date)
+    if week_hours + hours > (emp.weekly_hours or 40) or day_hours + hours > (emp.daily_max_hours or 8):
+        return False
+    is_valid, _ = ctx.check_weekly_shift_limit(emp.id, target_date)
+    return is_valid
+
+
+def _group_problem(
+    ctx: PlanningContext,
+    rows: List[Schedule],
+    candidates: List[Employee],
+    row_hours: Dict[int, float],
+    week_start: date
+) -> Optional[Dict]:
+    """
+    Reduce one (role, week) group to plain data for `solve_group`: the
+    eligible (row, employee) pairs plus each candidate's remaining capacity.
+    Eligibility is answered here from the planning context, so the worker
+    process needs no database or ORM state. None when nobody is eligible.
+    """
+    pairs = [
+        (row.id, emp.id)
+        for row in rows
+        for emp in candidates
+        if emp.id != row.employee_id and _is_eligible(ctx, emp, row.date, row_hours[row.id])
+    ]
+    if not pairs:
+        return None
+
+    emp_by_id = {emp.id: emp for emp in candidates}
+    employees = {}
+    for emp_id in {emp_id for _, emp_id in pairs}:
+        emp = emp_by_id[emp_id]
+        week_hours, _ = ctx.worked_hours(emp_id, week_start)
+        employees[emp_id] = {
+            "slots": _remaining_weekly_slots(ctx, emp_id, week_start),
+            "spare_minutes": int(round(((emp.weekly_hours or 40) - week_hours) * 60)),
+            "load_minutes": int(round(week_hours * 60)),
+            "worked_days": {e.date for e in ctx.week_entries(emp_id, week_start, WORK_STATUSES)},
+        }
+
+    return {
+        "week_start": week_start,
+        "pairs": pairs,
+        "row_dates": {row.id: row.date for row in rows},
+        "row_minutes": {row.id: int(round(row_hours[row.id] * 60)) for row in rows},
+        "employees": employees,
+    }
+
+
+def solve_group(problem: Dict, time_limit_seconds: float) -> Dict[int, int]:
+    """
+    Assign freed rows (one role, one week) to candidates. Runs in the solver
+    pool, so it only takes and returns picklable data.
+    Returns {schedule_id: new_employee_id} for the rows that could be covered.
+    """
+    model = cp_model.CpModel()
+    x = {(row_id, emp_id): model.NewBoolVar(f'r{row_id}_e{emp_id}') for row_id, emp_id in problem["pairs"]}
+    row_dates = problem["row_dates"]
+    row_minutes = problem["row_minutes"]
+    week_days = [problem["week_start"] + timedelta(days=i) for i in range(7)]
+
+    by_row = defaultdict(list)
+    by_emp = defaultdict(list)
+    for (row_id, emp_id), var in x.items():
+        by_row[row_id].append(var)
+        by_emp[emp_id].append((row_id, var))
+
+    # Each freed row goes to at most one employee
+    for row_vars in by_row.values():
+        if len(row_vars) > 1:
+            model.Add(sum(row_vars) <= 1)
+
+    for emp_id, pairs in by_emp.items():
+        emp = problem["employees"][emp_id]
+
+        # One shift per day
+        per_day = defaultdict(list)
+        for row_id, var in pairs:
+            per_day[row_dates[row_id]].append(var)
+        for day_vars in per_day.values():
+            if len(day_vars) > 1:
+                model.Add(sum(day_vars) <= 1)
+
+        # Weekly requirement and weekly hours (in minutes)
+        model.Add(sum(var for _, var in pairs) <= emp["slots"])
+        model.Add(sum(row_minutes[row_id] * var for row_id, var in pairs) <= emp["spare_minutes"])
+
+        # No more than 5 consecutive worked days within the week
+        for offset in range(2):
+            window = week_days[offset:offset + MAX_CONSECUTIVE_SHIFTS + 1]
+            new_in_window = [var for row_id, var in pairs if row_dates[row_id] in window]
+            if new_in_window:
+                existing = sum(1 for d in window if d in emp["worked_days"])
+                model.Add(existing + sum(new_in_window) <= MAX_CONSECUTIVE_SHIFTS)
+
+    # Cover as many rows as possible, preferring the least-loaded colleagues
+    load_minutes = {emp_id: problem["employees"][emp_id]["load_minutes"] for emp_id in by_emp}
+    big_m = max(load_minutes.values(), default=0) + 1
+    model.Maximize(sum(big_m * var - load_minutes[emp_id] * var for (_, emp_id), var in x.items()))
+
+    solver = cp_model.CpSolver()
+    configure_solver(solver, time_limit_seconds, num_workers=1)
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return {}
+
+    return {row_id: emp_id for (row_id, emp_id), var in x.items() if solver.Value(var) == 1}
+
+
+async def repair_schedule(
+    db: AsyncSession,
+    cells: Iterable[Tuple[int, date]],
+    reason: str = "",
+    release_uncovered: bool = False
+) -> Dict:
+    """
+    Re-solve the work shifts on the changed (employee_id, date) cells.
+
+    Rows are reassigned in place; rows nobody can cover are either marked
+    'cancelled' (release_uncovered=True, used for approved leave) or left with
+    the original employee and reported. Rows with check-ins or attendance are
+    historical and never touched. Changes are flushed, not committed.
+
+    Returns a summary with reassigned / uncovered / skipped rows and feedback.
+    """
+    started = time.perf_counter()
+    cells = set(cells)
+    summary = {"reassigned": [], "uncovered": [], "skipped": [], "feedback": []}
+    if not cells:
+        return summary
+
+    emp_ids = {emp_id for emp_id, _ in cells}
+    dates = {day for _, day in cells}
+    rows_result = await db.execute(
+        select(Schedule).filter(
+            Schedule.employee_id.in_(emp_ids),
+            Schedule.date.in_(dates),
+            Schedule.status == 'scheduled'
+        )
+    )
+    rows = [row for row in rows_result.scalars().all() if (row.employee_id, row.date) in cells]
+    if not rows:
+        return summary
+
+    # Rows that already carry check-ins or attendance are history - leave them alone
+    row_ids = [row.id for row in rows]
+    referenced_result = await db.execute(
+        select(CheckInOut.schedule_id).filter(CheckInOut.schedule_id.in_(row_ids))
+        .union(select(Attendance.schedule_id).filter(Attendance.schedule_id.in_(row_ids)))
+    )
+    referenced = set(referenced_result.scalars().all())
+    for row in rows:
+        if row.id in referenced:
+            summary["skipped"].append({"schedule_id": row.id, "employee_id": row.employee_id, "date": row.date.isoformat()})
+    rows = [row for row in rows if row.id not in referenced]
+
+    by_department = defaultdict(list)
+    for row in rows:
+        by_department[row.department_id].append(row)
+
+    for department_id, dept_rows in by_department.items():
+        role_ids = {row.role_id for row in dept_rows}
+        roles_result = await db.execute(select(Role).filter(Role.department_id == department_id))
+        role_breaks = {role.id: (role.break_minutes or 0) for role in roles_result.scalars().all()}
+
+        candidates_result = await db.execute(
+            select(Employee).filter(
+                Employee.department_id == department_id,
+                Employee.is_active == True,
+                or_(Employee.role_id.in_(role_ids), Employee.role_id == None)
+            )
+        )
+        candidates = candidates_result.scalars().all()
+
+        first_day = min(row.date for row in dept_rows)
+        last_day = max(row.date for row in dept_rows)
+        ctx = await PlanningContext.load(
+            db, department_id, [emp.id for emp in candidates],
+            first_day - timedelta(days=first_day.weekday()),
+            last_day + timedelta(days=6 - last_day.weekday()),
+            role_breaks=role_breaks
+        )
+        emp_names = {emp.id: f"{emp.first_name} {emp.last_name}" for emp in candidates}
+
+        row_hours = {
+            row.id: entry_work_hours(PlannedEntry(
+                row.id, row.date, row.status, row.start_time, row.end_time, role_breaks.get(row.role_id, 0)
+            ))
+            for row in dept_rows
+        }
+
+        groups = defaultdict(list)
+        for row in dept_rows:
+            groups[(row.role_id, week_key(row.date))].append(row)
+
+        for (role_id, _), group_rows in groups.items():
+            week_start = group_rows[0].date - timedelta(days=group_rows[0].date.weekday())
+            role_candidates = [emp for emp in candidates if emp.role_id in (role_id, None)]
+            problem = _group_problem(ctx, group_rows, role_candidates, row_hours, week_start)
+            assignment = {}
+            if problem is not None:
+                # The CP-SAT search runs in the solver pool, not on the event loop
+                try:
+                    assignment = await solver_service.run(
+                        solve_group, problem, REPAIR_TIME_LIMIT_SECONDS,
+                        time_limit_seconds=REPAIR_TIME_LIMIT_SECONDS
+                    )
+                except (SolverBusyError, SolverTimeoutError) as e:
+                    summary["feedback"].append(f"⚠️  Week of {week_start}: repair skipped - {e}")
+
+            for row in group_rows:
+                from_emp = row.employee_id
+                new_emp = assignment.get(row.id)
+                if new_emp:
+                    row.employee_id = new_emp
+                    note = f"Reassigned from {emp_names.get(from_emp, from_emp)}"
+                    row.notes = f"{note} ({reason})" if reason else note
+                    ctx.add_schedule(row)
+                    summary["reassigned"].append({
+                        "schedule_id": row.id, "date": row.date.isoformat(),
+                        "from_employee_id": from_emp, "to_employee_id": new_emp
+                    })
+                    summary["feedback"].append(
+                        f"{row.date}: shift moved from {emp_names.get(from_emp, from_emp)} to {emp_names.get(new_emp, new_emp)}"
+                    )
+                else:
+                    if release_uncovered:
+                        row.status = 'cancelled'
+                        row.notes = f"Uncovered ({reason})" if reason else "Uncovered"
+                    summary["uncovered"].append({
+                        "schedule_id": row.id, "date": row.date.isoformat(), "employee_id": from_emp
+                    })
+                    summary["feedback"].append(
+                        f"⚠️  {row.date}: no eligible colleague to cover {emp_names.get(from_emp, from_emp)}'s shift"
+                    )
+
+    await db.flush()
+    summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return summary
@@ -0,0 +1,162 @@
+"""
+Batch schedule constraint validation
+
+Checks the weekly shift requirement and the consecutive-day limit for many
+(employee_id, target_date) pairs at once. The schedules of every touched
+employee over every touched Mon-Sun week are read in a single query into an
+in-memory index, so validating a 500-row drag-and-drop or import costs the
+same number of queries as validating one row.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Schedule
+from app.planning_context import (
+    WEEKDAY_COVERAGE_STATUSES, WEEKEND_REGULAR_STATUSES, longest_consecutive_run,
+    week_key, weekly_shift_limit_verdict
+)
+
+
+# Statuses that count as days on duty for the consecutive-day limit
+CONSECUTIVE_STATUSES = ('scheduled', 'leave', 'comp_off_taken', 'leave_half_morning', 'leave_half_afternoon')
+
+MAX_CONSECUTIVE_SHIFTS = 5
+
+
+def consecutive_shifts_verdict(
+    existing_dates: Iterable[date],
+    target_date: date,
+    max_consecutive: int = MAX_CONSECUTIVE_SHIFTS
+) -> Tuple[bool, str]:
+    """
+    Decide whether a shift on target_date keeps the week within the consecutive limit.
+    Returns: (is_valid, error_message)
+    """
+    max_consecutive_found = longest_consecutive_run(set(existing_dates) | {target_date})
+    if max_consecutive_found > max_consecutive:
+        return False, f"Cannot create {max_consecutive_found} consecutive shifts. Maximum allowed is {max_consecutive} consecutive shifts."
+    return True, ""
+
+
+def _week_spans(dates: Iterable[date]) -> List[Tuple[date, date]]:
+    """Merge the Mon-Sun weeks containing the dates into contiguous (start, end) spans"""
+    week_starts = sorted({d - timedelta(days=d.weekday()) for d in dates})
+    spans: List[Tuple[date, date]] = []
+    for week_start in week_starts:
+        week_end = week_start + timedelta(days=6)
+        if spans and spans[-1][1] + timedelta(days=1) >= week_start:
+            spans[-1] = (spans[-1][0], week_end)
+        else:
+            spans.append((week_start, week_end))
+    return spans
+
+
+class ScheduleBatchValidator:
+    """
+    Week-scoped index of schedule statuses for a set of employees.
+
+    Build it with `ScheduleBatchValidator.load(...)`, then `check(...)` each
+    pair. With `validate(..., accumulate=True)` every accepted pair is added
+    to the index so later rows in the same batch see the earlier ones.
+    """
+
+    def __init__(self, max_consecutive: int = MAX_CONSECUTIVE_SHIFTS):
+        self.max_consecutive = max_consecutive
+        # (employee_id, iso week) -> [(date, status)]
+        self.by_week: Dict[Tuple[int, Tuple[int, int]], List[Tuple[date, str]]] = defaultdict(list)
+
+    @classmethod
+    async def load(
+        cls,
+        db: AsyncSession,
+        pairs: Iterable[Tuple[int, date]],
+        exclude_schedule_ids: Optional[Iterable[int]] = None,
+        max_consecutive: int = MAX_CONSECUTIVE_SHIFTS
+    ) -> "ScheduleBatchValidator":
+        """Load every touched employee-week in one query"""
+        validator = cls(max_consecutive)
+        pairs = list(pairs)
+        if not pairs:
+            return validator
+
+        employee_ids = {emp_id for emp_id, _ in pairs}
+        spans = _week_spans(day for _, day in pairs)
+        query = select(Schedule.employee_id, Schedule.date, Schedule.status).filter(
+            Schedule.employee_id.in_(employee_ids),
+            or_(*[and_(Schedule.date >= start, Schedule.date <= end) for start, end in spans])
+        )
+        exclude_ids = [sid for sid in (exclude_schedule_ids or []) if sid]
+        if exclude_ids:
+            query = query.filter(Schedule.id.notin_(exclude_ids))
+
+        result = await db.execute(query)
+        for emp_id, day, status in result.all():
+            validator.add(emp_id, day, status)
+        return validator
+
+    def add(self, employee_id: int, target_date: date, status: str = 'scheduled'):
+        """Record a row (existing or accepted in this batch) in the index"""
+        self.by_week[(employee_id, week_key(target_date))].append((target_date, status))
+
+    def check_weekly(self, employee_id: int, target_date: date) -> Tuple[bool, str]:
+        """Index-backed equivalent of validate_5_shifts_per_week"""
+        weekday_coverage = 0
+        weekend_regular = 0
+        for day, status in self.by_week.get((employee_id, week_key(target_date)), []):
+            if day.weekday() < 5:
+                if status in WEEKDAY_COVERAGE_STATUSES:
+                    weekday_coverage += 1
+            elif status in WEEKEND_REGULAR_STATUSES:
+                weekend_regular += 1
+        return weekly_shift_limit_verdict(target_date, weekday_coverage, weekend_regular)
+
+    def check_consecutive(self, employee_id: int, target_date: date) -> Tuple[bool, str]:
+        """Index-backed equivalent of validate_consecutive_shifts_limit"""
+        dates = [
+            day for day, status in self.by_week.get((employee_id, week_key(target_date)), [])
+            if status in CONSECUTIVE_STATUSES
+        ]
+        return consecutive_shifts_verdict(dates, target_date, self.max_consecutive)
+
+    def check(self, employee_id: int, target_date: date) -> Dict:
+        """Both verdicts for one pair"""
+        errors = []
+        is_valid, error_msg = self.check_weekly(employee_id, target_date)
+        if not is_valid:
+            errors.append(error_msg)
+        is_valid, error_msg = self.check_consecutive(employee_id, target_date)
+        if not is_valid:
+            errors.append(error_msg)
+        return {
+            "employee_id": employee_id,
+            "date": target_date.isoformat(),
+            "valid": not errors,
+            "errors": errors
+        }
+
+    def validate(self, pairs: Iterable[Tuple[int, date]], accumulate: bool = True) -> List[Dict]:
+        """Verdicts for each pair in order; accepted pairs count against later ones when accumulating"""
+        verdicts = []
+        for employee_id, target_date in pairs:
+            verdict = self.check(employee_id, target_date)
+            if accumulate and verdict["valid"]:
+                self.add(employee_id, target_date)
+            verdicts.append(verdict)
+        return verdicts
+
+
+async def validate_schedule_batch(
+    db: AsyncSession,
+    pairs: Iterable[Tuple[int, date]],
+    exclude_schedule_ids: Optional[Iterable[int]] = None,
+    accumulate: bool = True
+) -> List[Dict]:
+    """Validate many (employee_id, target_date) pairs with a single query"""
+    pairs = list(pairs)
+    validator = await ScheduleBatchValidator.load(db, pairs, exclude_schedule_ids)
+    return validator.validate(pairs, accumulate=accumulate)
@@ -0,0 +1,90 @@
+"""
+Bulk schedule writer
+
+Schedule generation can create thousands of rows in one run. Instead of an
+ORM object per row (each one tracked by the unit of work and the identity
+map), assignments are collected in a columnar buffer and written in one go:
+asyncpg's COPY (`copy_records_to_table`) on PostgreSQL, otherwise a single
+executemany `insert(Schedule)`. Both run on the session's connection, so the
+write is part of the caller's transaction.
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Schedule
+
+
+# Column order used for both the COPY records and the executemany rows.
+# created_at/updated_at are filled here because COPY bypasses Python-side defaults.
+SCHEDULE_COLUMNS = (
+    'department_id', 'employee_id', 'role_id', 'shift_id', 'date', 'start_time',
+    'end_time', 'status', 'notes', 'day_priority', 'is_overtime', 'created_at', 'updated_at'
+)
+
+
+class ScheduleBuffer:
+    """Columnar buffer of schedule rows waiting to be inserted"""
+
+    def __init__(self, department_id: int):
+        self.department_id = department_id
+        self.columns: Dict[str, List] = {name: [] for name in SCHEDULE_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns['employee_id'])
+
+    def append(
+        self,
+        employee_id: int,
+        role_id: int,
+        shift_id: Optional[int],
+        target_date: date,
+        start_time: Optional[str],
+        end_time: Optional[str],
+        status: str = 'scheduled',
+        notes: Optional[str] = None,
+        day_priority: int = 1,
+        is_overtime: bool = False
+    ):
+        now = datetime.utcnow()
+        row = (
+            self.department_id, employee_id, role_id, shift_id, target_date, start_time,
+            end_time, status, notes, day_priority, is_overtime, now, now
+        )
+        for name, value in zip(SCHEDULE_COLUMNS, row):
+            self.columns[name].append(value)
+
+    def records(self) -> List[tuple]:
+        """Rows as tuples in SCHEDULE_COLUMNS order"""
+        return list(zip(*(self.columns[name] for name in SCHEDULE_COLUMNS)))
+
+    def clear(self):
+        for values in self.columns.values():
+            values.clear()
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write all buffered rows and empty the buffer. Returns the row count."""
+        count = len(self)
+        if not count:
+            return 0
+
+        conn = await db.connection()
+        if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'asyncpg':
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                Schedule.__tablename__,
+                records=self.records(),
+                columns=list(SCHEDULE_COLUMNS)
+            )
+        else:
+            await db.execute(
+                insert(Schedule),
+                [dict(zip(SCHEDULE_COLUMNS, record)) for record in self.records()]
+            )
+
+        print(f"[DEBUG] Bulk inserted {count} schedules", flush=True)
+        self.clear()
+        return count
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import math
 
+from app.solver_config import configure_solver
+
 
 class ShiftSchedulerV5:
     """
@@ -22,13 +24,20 @@ class ShiftSchedulerV5:
     
     def __init__(self, employees: List[Dict], roles: List[Dict], 
                  role_shifts: Dict, leave_requests: Dict, 
-                 unavailability: Dict, week_dates: List[str]):
+                 unavailability: Dict, week_dates: List[str],
+                 time_limit_seconds: float = 90.0, num_workers: Optional[int] = None,
+                 hints: Optional[set] = None,
+                 solution_callback: Optional[cp_model.CpSolverSolutionCallback] = None):
         self.employees = employees
         self.roles = roles
         self.role_shifts = role_shifts  # role_id -> [shifts]
         self.leave_requests = leave_requests  # "emp_id-date" -> True
         self.unavailability = unavailability  # "emp_id-date" -> True
         self.week_dates = week_dates
+        self.time_limit_seconds = time_limit_seconds
+        self.num_workers = num_workers
+        self.hints = hints  # {(emp_id, date, shift_id)} from a previous solution (warm start)
+        self.solution_callback = solution_callback
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
         self.feedback = []
@@ -152,6 +161,8 @@ class ShiftSchedulerV5:
                     if shift_schedule.get('enabled', False):
                         var = self.model.NewBoolVar(f'e{emp_id}_d{date}_s{shift["id"]}')
                         assignments[emp_id][date][shift['id']] = var
+                        if self.hints is not None:
+                            self.model.AddHint(var, 1 if (emp_id, date, shift['id']) in self.hints else 0)
         
         # Constraint 1: Each employee works exact shifts (minus leaves)
         for emp in self.employees:
@@ -195,10 +206,9 @@ class ShiftSchedulerV5:
         
         # Solve
         self.add_feedback("Solving schedule with OR-Tools CP-SAT...", 'info')
-        self.solver.parameters.max_time_in_seconds = 90.0
-        self.solver.parameters.num_search_workers = 8
+        configure_solver(self.solver, self.time_limit_seconds, self.num_workers)
         
-        status = self.solver.Solve(self.model)
+        status = self.solver.Solve(self.model, self.solution_callback)
         
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
             self.add_feedback(
@@ -139,6 +139,9 @@ class DepartmentDetailResponse(BaseModel):
     description: Optional[str]
     manager: Optional[Dict] = None
     employees: List[EmployeeAttendanceResponse] = []
+    total_employees: int = 0
+    limit: Optional[int] = None
+    offset: int = 0
     
     class Config:
         from_attributes = True
@@ -417,6 +420,17 @@ class ScheduleResponse(BaseModel):
         from_attributes = True
 
 
+class ScheduleChangeRow(ScheduleResponse):
+    updated_at: Optional[datetime] = None
+
+
+class ScheduleChangesResponse(BaseModel):
+    cursor: str  # Pass back as `since`
+    has_more: bool  # More pages of this sync follow (call again right away)
+    upserts: List[ScheduleChangeRow] = []
+    deleted: List[int] = []  # Ids of schedules deleted since the cursor
+
+
 # Dashboard schemas
 class EmployeeDashboard(BaseModel):
     todays_schedule: Optional[ScheduleResponse]
@@ -512,6 +526,28 @@ class ScheduleGenerationResponse(BaseModel):
     error: Optional[str] = None
 
 
+class ScheduleRepairCell(BaseModel):
+    employee_id: int
+    date: date
+
+
+class ScheduleValidationItem(BaseModel):
+    employee_id: int
+    date: date
+
+
+class ScheduleValidationBatchRequest(BaseModel):
+    items: List[ScheduleValidationItem]
+    exclude_schedule_ids: List[int] = []  # Rows being moved, so they don't count against themselves
+    accumulate: bool = True  # Valid items count against later items in the batch
+
+
+class ScheduleRepairRequest(BaseModel):
+    cells: List[ScheduleRepairCell]
+    reason: Optional[str] = None
+    release_uncovered: bool = False  # Cancel shifts nobody can cover instead of leaving them in place
+
+
 # Shift Request (for employee shift swap requests)
 class ShiftRequestCreate(BaseModel):
     from_employee_id: int
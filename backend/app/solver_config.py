@@ -0,0 +1,33 @@
+"""
+CP-SAT solver configuration
+
+Single place that sets search parameters for both schedule solvers, so the
+worker count follows the host's cores (or SOLVER_NUM_WORKERS) instead of a
+hard-coded value.
+"""
+
+import os
+from typing import Optional
+
+from app.config import settings
+
+
+def resolve_num_workers(num_workers: Optional[int] = None) -> int:
+    """
+    Search workers to use: explicit value, then setting, then the host's
+    cores shared between the solves allowed to run concurrently.
+    """
+    if num_workers and num_workers > 0:
+        return num_workers
+    if settings.SOLVER_NUM_WORKERS > 0:
+        return settings.SOLVER_NUM_WORKERS
+    cores = os.cpu_count() or 1
+    return max(1, cores // max(1, settings.SOLVER_MAX_CONCURRENT))
+
+
+def configure_solver(solver, time_limit_seconds: float, num_workers: Optional[int] = None):
+    """Apply time budget and parallelism to a cp_model.CpSolver"""
+    solver.parameters.max_time_in_seconds = time_limit_seconds
+    solver.parameters.num_search_workers = resolve_num_workers(num_workers)
+    solver.parameters.log_search_progress = False
+    return solver
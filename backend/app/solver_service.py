@@ -0,0 +1,97 @@
+"""
+Solver execution service
+
+Runs CP-SAT solves in a bounded process pool so a long search never blocks
+the event loop. A semaphore caps how many solves run at once, so concurrent
+requests queue instead of starving other traffic.
+
+The solves awaited from request handlers are the incremental repair models
+(schedule_repair.solve_group). POST /schedules/generate assigns shifts with
+an in-process greedy pass and does not call CP-SAT.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.config import settings
+
+
+class SolverBusyError(Exception):
+    """Raised when no solver slot frees up within the queue timeout"""
+
+
+class SolverTimeoutError(Exception):
+    """Raised when a solve does not return within its time budget"""
+
+
+# Grace period on top of the CP-SAT time limit for model building and IPC
+SOLVE_GRACE_SECONDS = 15.0
+
+
+class SolverService:
+    """Dispatches solver runs to a process pool and awaits them without blocking"""
+
+    def __init__(
+        self,
+        pool_size: int = settings.SOLVER_POOL_SIZE,
+        max_concurrent: int = settings.SOLVER_MAX_CONCURRENT,
+        queue_timeout_seconds: float = settings.SOLVER_QUEUE_TIMEOUT_SECONDS
+    ):
+        self.pool_size = max(1, pool_size)
+        self.max_concurrent = max(1, min(max_concurrent, self.pool_size))
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn avoids forking a process that holds the event loop and DB connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.pool_size,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    async def run(self, fn: Callable, *args: Any, time_limit_seconds: float) -> Any:
+        """
+        Run a picklable worker function in the pool once a solver slot is free.
+
+        Raises SolverBusyError if no slot frees up within the queue timeout and
+        SolverTimeoutError if the worker overruns its budget plus grace period.
+        """
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            raise SolverBusyError(
+                f"All {self.max_concurrent} solver slots are busy. Please try again shortly."
+            )
+
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._get_executor(), fn, *args)
+            try:
+                return await asyncio.wait_for(future, timeout=time_limit_seconds + SOLVE_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                raise SolverTimeoutError(
+                    f"Solver did not finish within {time_limit_seconds:.0f}s"
+                )
+        finally:
+            semaphore.release()
+
+    def shutdown(self):
+        """Stop the worker processes (called on application shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global instance
+solver_service = SolverService()
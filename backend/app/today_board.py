@@ -0,0 +1,155 @@
+"""
+Live "today" attendance board
+
+Builds the per-department board behind GET /attendance/today from three
+column-only queries (active employees, today's schedules, today's
+check-ins) joined in Python through dicts keyed by employee id.
+
+Boards are cached per (department, day) for a few seconds. Concurrent
+requests for the same department wait on the one computation already in
+flight instead of starting their own, and check-in / check-out drop the
+department's entry so the next poll sees the change immediately.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import CheckInOut, Employee, Schedule
+
+
+def board_status(checkin) -> str:
+    """Board status for an employee's check-in row (None = not checked in)"""
+    if not checkin:
+        return "absent"
+    if checkin.check_out_time:
+        return "completed"
+    if checkin.check_in_status == "on-time":
+        return "present"
+    return checkin.check_in_status
+
+
+def _board_entry(employee_id: int, names: Dict[int, str], schedule, checkin) -> Dict[str, Any]:
+    return {
+        "employee_id": employee_id,
+        "employee_name": names.get(employee_id, "Unknown"),
+        "schedule_id": schedule.id if schedule else None,
+        "scheduled_time": f"{schedule.start_time} - {schedule.end_time}" if schedule else "No Schedule",
+        "check_in_time": checkin.check_in_time.isoformat() if checkin and checkin.check_in_time else None,
+        "check_out_time": checkin.check_out_time.isoformat() if checkin and checkin.check_out_time else None,
+        "status": board_status(checkin)
+    }
+
+
+async def build_today_board(db: AsyncSession, department_id: int, today: date) -> Dict[str, Any]:
+    """Scheduled employees first (with their check-in), then unscheduled check-ins"""
+    emp_result = await db.execute(
+        select(Employee.id, Employee.first_name, Employee.last_name).filter(
+            Employee.department_id == department_id,
+            Employee.is_active == True
+        )
+    )
+    names = {emp_id: f"{first} {last}" for emp_id, first, last in emp_result.all()}
+
+    sched_result = await db.execute(
+        select(Schedule.id, Schedule.employee_id, Schedule.start_time, Schedule.end_time).filter(
+            Schedule.department_id == department_id,
+            Schedule.date == today
+        )
+    )
+    schedules = sched_result.all()
+
+    checkins = {}
+    if names:
+        checkin_result = await db.execute(
+            select(
+                CheckInOut.employee_id, CheckInOut.check_in_time,
+                CheckInOut.check_out_time, CheckInOut.check_in_status
+            ).filter(
+                CheckInOut.date == today,
+                CheckInOut.employee_id.in_(list(names))
+            )
+        )
+        checkins = {row.employee_id: row for row in checkin_result.all()}
+
+    attendance = []
+    included = set()
+    for schedule in schedules:
+        attendance.append(_board_entry(schedule.employee_id, names, schedule, checkins.get(schedule.employee_id)))
+        included.add(schedule.employee_id)
+    for employee_id, checkin in checkins.items():
+        if employee_id not in included:
+            attendance.append(_board_entry(employee_id, names, None, checkin))
+
+    return {
+        "date": today.isoformat(),
+        "total_scheduled": len(schedules),
+        "total_checked_in": len(checkins),
+        "total_shown": len(attendance),
+        "attendance": attendance
+    }
+
+
+class TodayBoardCache:
+    """Short-lived per-department board cache with single-flight loading"""
+
+    def __init__(self, ttl_seconds: float = 5.0):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[int, date], Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[Tuple[int, date], asyncio.Future] = {}
+        # Bumped on invalidation so a build that started earlier is not stored
+        self._generation: Dict[int, int] = defaultdict(int)
+
+    async def get(
+        self,
+        department_id: int,
+        day: date,
+        loader: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        key = (department_id, day)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation[department_id]
+        try:
+            board = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; don't warn when there are none
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        if self.ttl_seconds > 0 and generation == self._generation[department_id]:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, board)
+        future.set_result(board)
+        return board
+
+    def invalidate(self, department_id: Optional[int]):
+        """Drop the department's boards (called on check-in / check-out)"""
+        if department_id is None:
+            return
+        self._generation[department_id] += 1
+        for key in [key for key in self._entries if key[0] == department_id]:
+            del self._entries[key]
+
+
+# Global instance
+today_board_cache = TodayBoardCache(ttl_seconds=settings.TODAY_BOARD_CACHE_SECONDS)
@@ -0,0 +1,158 @@
+"""
+Streaming XLSX export engine
+
+Attendance exports used to build a full openpyxl Workbook in memory with a
+style object per cell and then copy it into a BytesIO. This engine uses
+openpyxl's write_only mode instead: rows are serialised to temporary files
+as they are appended, every cell style is a NamedStyle registered once per
+workbook, and the finished file is sent to the client in fixed-size chunks
+from disk, so peak memory no longer grows with department size.
+"""
+
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Bytes per chunk sent to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Rows fetched per round trip when streaming from a server-side cursor
+EXPORT_FETCH_SIZE = 1000
+
+
+def _thin_border() -> Border:
+    return Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+
+def _style(name: str, font: Font = None, fill: PatternFill = None, border: Border = None,
+           alignment: Alignment = None) -> NamedStyle:
+    style = NamedStyle(name=name)
+    if font is not None:
+        style.font = font
+    if fill is not None:
+        style.fill = fill
+    if border is not None:
+        style.border = border
+    if alignment is not None:
+        style.alignment = alignment
+    return style
+
+
+def _report_styles() -> List[NamedStyle]:
+    """Styles shared by the attendance reports (same look as the in-memory exports)"""
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
+    alt_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
+    emp_header_fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
+    center = Alignment(horizontal='center', vertical='center')
+    left = Alignment(horizontal='left', vertical='center')
+
+    return [
+        _style('report_title', font=Font(bold=True, size=14)),
+        _style('report_title_small', font=Font(bold=True, size=13)),
+        _style('report_subtitle', font=Font(size=11)),
+        _style('report_subtitle_bold', font=Font(bold=True, size=12)),
+        _style('report_label_bold', font=Font(bold=True, size=11)),
+        _style('report_bold', font=Font(bold=True)),
+        _style('report_text', font=Font(size=10)),
+        _style('report_section', font=Font(bold=True, size=12), fill=summary_fill, border=_thin_border()),
+        _style('report_section_fill', fill=summary_fill, border=_thin_border()),
+        _style('report_header', font=Font(bold=True, color="FFFFFF", size=11), fill=header_fill,
+               border=_thin_border(), alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)),
+        _style('report_emp_header', font=Font(bold=True, color="FFFFFF", size=10), fill=emp_header_fill),
+        _style('report_summary_label', font=Font(bold=True, color="000000"), fill=summary_fill, border=_thin_border()),
+        _style('report_summary_value', border=_thin_border(), alignment=Alignment(horizontal='right')),
+        _style('report_bordered', border=_thin_border()),
+        _style('report_cell_center', border=_thin_border(), alignment=center),
+        _style('report_cell_left', border=_thin_border(), alignment=left),
+        _style('report_cell_center_alt', border=_thin_border(), alignment=center, fill=alt_fill),
+        _style('report_cell_left_alt', border=_thin_border(), alignment=left, fill=alt_fill),
+    ]
+
+
+CellStyle = Optional[Union[str, Sequence[Optional[str]]]]
+
+
+class StreamingSheet:
+    """Append-only worksheet that tracks its own row number"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.row = 0
+
+    def append(self, values: Iterable, style: CellStyle = None):
+        """
+        Append one row. `style` is a named style for every cell, or a
+        sequence with one style name (or None) per column.
+        """
+        values = list(values)
+        if style is None:
+            self.ws.append(values)
+        else:
+            styles = [style] * len(values) if isinstance(style, str) else list(style)
+            cells = []
+            for value, style_name in zip(values, styles):
+                cell = WriteOnlyCell(self.ws, value=value)
+                if style_name:
+                    cell.style = style_name
+                cells.append(cell)
+            self.ws.append(cells)
+        self.row += 1
+
+    def blank(self, count: int = 1):
+        for _ in range(count):
+            self.append([])
+
+    def merge_last(self, first_col: int, last_col: int):
+        """Merge columns first_col..last_col of the last appended row"""
+        self.ws.merged_cells.add(
+            f"{get_column_letter(first_col)}{self.row}:{get_column_letter(last_col)}{self.row}"
+        )
+
+
+class StreamingWorkbook:
+    """Write-only workbook with the shared report styles registered once"""
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        for style in _report_styles():
+            self.wb.add_named_style(style)
+
+    def create_sheet(self, title: str, widths: Optional[Dict[str, float]] = None) -> StreamingSheet:
+        """Create a sheet; column widths must be set before any row is written"""
+        ws = self.wb.create_sheet(title)
+        for column, width in (widths or {}).items():
+            ws.column_dimensions[column].width = width
+        return StreamingSheet(ws)
+
+    def iter_bytes(self, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Save to a temporary file and yield it in chunks (the file is removed afterwards)"""
+        with tempfile.TemporaryFile() as tmp:
+            self.wb.save(tmp)
+            tmp.seek(0)
+            while True:
+                chunk = tmp.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def response(self, filename: str) -> StreamingResponse:
+        """StreamingResponse that saves and sends the workbook chunk by chunk"""
+        return StreamingResponse(
+            self.iter_bytes(),
+            media_type=XLSX_MEDIA_TYPE,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
@@ -0,0 +1,57 @@
+"""
+Audit Log Maintenance
+Creates the upcoming monthly audit_logs partitions and archives rows older
+than AUDIT_RETENTION_MONTHS to AUDIT_ARCHIVE_DIR (the app also does this
+every AUDIT_MAINTENANCE_INTERVAL_HOURS).
+
+--partition converts an existing, unpartitioned audit_logs table to monthly
+partitions first. It rewrites the whole table in one transaction, so run it
+during a quiet period.
+Run: python audit_maintenance.py [--partition [--keep-legacy]]
+"""
+
+import argparse
+import asyncio
+
+from app.audit_partitions import convert_to_partitioned, is_partitioned, run_audit_maintenance
+from app.config import settings
+from app.database import engine
+
+
+async def maintain(partition: bool = False, keep_legacy: bool = False):
+    if partition:
+        async with engine.begin() as conn:
+            if await is_partitioned(conn):
+                print("✓ audit_logs is already partitioned")
+            else:
+                print("🔄 Converting audit_logs to monthly partitions...")
+                moved = await convert_to_partitioned(conn, settings.AUDIT_PARTITION_MONTHS_AHEAD, keep_legacy)
+                print(f"✅ Moved {moved} audit rows into partitions")
+                if keep_legacy:
+                    print("   Old rows kept in audit_logs_unpartitioned")
+
+    summary = await run_audit_maintenance()
+    if summary.get("skipped"):
+        print("⚠️ Another worker is running audit maintenance; nothing done")
+    elif summary["partitioned"]:
+        print(f"✅ Partitions created: {', '.join(summary['created']) or 'none needed'}")
+    if settings.AUDIT_RETENTION_MONTHS > 0:
+        for month, count in summary["archived"].items():
+            print(f"✅ Archived {count} rows from {month} to {settings.AUDIT_ARCHIVE_DIR}")
+        if not summary["archived"]:
+            print(f"✓ Nothing older than {settings.AUDIT_RETENTION_MONTHS} months")
+    else:
+        print("✓ Retention disabled (AUDIT_RETENTION_MONTHS=0)")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--partition', action='store_true', help='Convert audit_logs to monthly partitions first')
+    parser.add_argument('--keep-legacy', action='store_true', help='Keep the old table as audit_logs_unpartitioned')
+    args = parser.parse_args()
+    asyncio.run(maintain(args.partition, args.keep_legacy))
+
+
+if __name__ == "__main__":
+    main()
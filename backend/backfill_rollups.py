@@ -0,0 +1,47 @@
+"""
+Attendance Rollup Backfill
+Rebuilds attendance_daily_rollups and attendance_monthly_rollups from the
+attendance table. The server backfills empty rollups at startup and
+triggers keep them current; run this for a range to repair drift, e.g.
+after the triggers were disabled for a bulk load.
+Run: python backfill_rollups.py [--start 2025-01-01] [--end 2025-12-31]
+"""
+
+import argparse
+import asyncio
+from datetime import date
+
+from app.attendance_rollup import rebuild_attendance_rollups
+from app.database import async_session_maker, engine
+from app.models import Base, AttendanceDailyRollup, AttendanceMonthlyRollup
+
+
+async def backfill(start_date: date = None, end_date: date = None):
+    print("📋 Ensuring rollup tables exist...")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[AttendanceDailyRollup.__table__, AttendanceMonthlyRollup.__table__]
+        )
+
+    span = f"{start_date or 'beginning'} → {end_date or 'today'}"
+    print(f"🔄 Rebuilding attendance rollups ({span})...")
+    async with async_session_maker() as db:
+        counts = await rebuild_attendance_rollups(db, start_date, end_date)
+        await db.commit()
+
+    print(f"✅ Daily rollup rows: {counts['daily_rows']}")
+    print(f"✅ Monthly rollup rows: {counts['monthly_rows']}")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--start', type=date.fromisoformat, help='First attendance date to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last attendance date to rebuild (YYYY-MM-DD)')
+    args = parser.parse_args()
+    asyncio.run(backfill(args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Comprehensive Monthly Export Benchmark
+Compares building the comprehensive export rows with the old per-row scans
+(filter the month's attendance per employee, then `next(...)` per day)
+against the (employee_id, date) indexes in app.attendance_export.
+Both paths must produce identical rows; timings should grow quadratically
+for the scan and linearly for the indexes.
+Run: python benchmark_export.py [--sizes 50 100 250 500] [--repeat 3] [--json results.json]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from app.attendance_export import (
+    comprehensive_day_row, comprehensive_employee_rows, index_by_employee_date, leave_days_index
+)
+
+
+def build_month(size: int, year: int = 2025, month: int = 12, seed: int = 7):
+    """Synthetic department month: ~90% attendance, check-ins, schedules and some leave"""
+    rng = random.Random(seed)
+    start = date(year, month, 1)
+    days = [start + timedelta(days=i) for i in range(31)]
+    attendance, checkins, schedules, leaves = [], [], [], []
+    for emp_id in range(1, size + 1):
+        for day in days:
+            schedules.append(SimpleNamespace(
+                employee_id=emp_id, date=day, status='scheduled', start_time='09:00', end_time='18:00'
+            ))
+            if rng.random() < 0.9:
+                attendance.append(SimpleNamespace(
+                    employee_id=emp_id, date=day, in_time='09:00', out_time='18:00', worked_hours=8.0,
+                    break_minutes=60, overtime_hours=0.0, status='onTime', notes=None
+                ))
+                checkins.append(SimpleNamespace(
+                    employee_id=emp_id, date=day,
+                    check_in_time=datetime.combine(day, datetime.min.time()).replace(hour=9),
+                    check_out_time=None, check_in_status='onTime'
+                ))
+        if rng.random() < 0.2:
+            first = rng.choice(days)
+            leaves.append(SimpleNamespace(
+                employee_id=emp_id, start_date=first, end_date=first + timedelta(days=2),
+                leave_type='paid', duration_type='full_day'
+            ))
+    attendance.sort(key=lambda r: (r.employee_id, r.date))
+    return days, attendance, checkins, schedules, leaves
+
+
+def rows_with_scans(employee_ids, days, attendance, checkins, schedules, leaves):
+    """The previous export loop: per-employee list filter and per-day linear search"""
+    checkin_map = {(r.employee_id, r.date): r for r in checkins}
+    schedule_map = {(s.employee_id, s.date): s for s in schedules}
+    leave_map = leave_days_index(leaves, days[0], days[-1])
+    rows = []
+    for emp_id in employee_ids:
+        emp_attendance = [r for r in attendance if r.employee_id == emp_id]
+        for day in days:
+            att_rec = next((r for r in emp_attendance if r.date == day), None)
+            rows.append(comprehensive_day_row(
+                day, att_rec, schedule_map.get((emp_id, day)), leave_map.get((emp_id, day)),
+                checkin_map.get((emp_id, day))
+            ))
+    return rows
+
+
+def rows_with_indexes(employee_ids, days, attendance, checkins, schedules, leaves):
+    """The current export loop: indexes built once, one lookup per source per row"""
+    attendance_index = index_by_employee_date(attendance, keep_first=True)
+    checkin_index = index_by_employee_date(checkins)
+    schedule_index = index_by_employee_date(schedules)
+    leave_index = leave_days_index(leaves, days[0], days[-1])
+    rows = []
+    for emp_id in employee_ids:
+        rows.extend(comprehensive_employee_rows(
+            emp_id, days, attendance_index, schedule_index, leave_index, checkin_index
+        ))
+    return rows
+
+
+def best_of(fn, repeat, *args):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 250, 500])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🧪 COMPREHENSIVE MONTHLY EXPORT BENCHMARK")
+    print("=" * 70)
+
+    results = []
+    for size in args.sizes:
+        days, attendance, checkins, schedules, leaves = build_month(size)
+        employee_ids = list(range(1, size + 1))
+        data = (employee_ids, days, attendance, checkins, schedules, leaves)
+
+        scan_seconds, scan_rows = best_of(rows_with_scans, args.repeat, *data)
+        index_seconds, index_rows = best_of(rows_with_indexes, args.repeat, *data)
+        if scan_rows != index_rows:
+            raise SystemExit(f"❌ Row mismatch at {size} employees")
+
+        result = {
+            'employees': size,
+            'rows': len(index_rows),
+            'scan_ms': round(scan_seconds * 1000, 1),
+            'index_ms': round(index_seconds * 1000, 1),
+            'speedup': round(scan_seconds / index_seconds, 1) if index_seconds else None,
+        }
+        results.append(result)
+        print(
+            f"{size:>5} employees | {result['rows']:>6} rows | "
+            f"scan: {result['scan_ms']:>9.1f} ms | index: {result['index_ms']:>7.1f} ms | "
+            f"x{result['speedup']}"
+        )
+
+    if len(results) > 1:
+        first, last = results[0], results[-1]
+        growth = last['employees'] / first['employees']
+        print(
+            f"\nGrowth for {growth:.0f}x employees: scan x{last['scan_ms'] / first['scan_ms']:.1f}, "
+            f"index x{last['index_ms'] / first['index_ms']:.1f}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
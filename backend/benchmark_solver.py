@@ -0,0 +1,171 @@
+"""
+CP-SAT Schedule Solver Benchmark
+Measures time-to-first-feasible and time-to-optimal for synthetic departments,
+cold (no hints) and warm (hinted from the previous solution after one leave
+approval, as in a regeneration).
+Run: python benchmark_solver.py [--sizes 50 200 1000] [--time-limit 60] [--json results.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from ortools.sat.python import cp_model
+
+from app.schedule_generator import ShiftScheduleGenerator
+from app.solver_config import resolve_num_workers
+
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class FirstSolutionTimer(cp_model.CpSolverSolutionCallback):
+    """Records wall time of the first and last improving solutions"""
+
+    def __init__(self):
+        super().__init__()
+        self.first_solution_at = None
+        self.last_solution_at = None
+        self.solutions = 0
+
+    def on_solution_callback(self):
+        now = self.WallTime()
+        if self.first_solution_at is None:
+            self.first_solution_at = now
+        self.last_solution_at = now
+        self.solutions += 1
+
+
+def build_department(size: int, seed: int = 42):
+    """Synthetic department: ~25 employees per role, Mon-Fri coverage plus light weekends"""
+    rng = random.Random(seed)
+    role_count = max(1, size // 25)
+    roles = []
+    for r in range(role_count):
+        config = {}
+        for idx, day in enumerate(DAYS):
+            weekend = idx >= 5
+            config[day] = {
+                'enabled': (not weekend) or r % 3 == 0,
+                'required_count': 8 if weekend else 15,
+                'day_priority': 1,
+            }
+        roles.append({
+            'id': r + 1,
+            'name': f'Role {r + 1}',
+            'schedule_config': config,
+            'start_time': '09:00',
+            'end_time': '18:00',
+        })
+
+    employees = [
+        {
+            'id': e + 1,
+            'name': f'Employee {e + 1}',
+            'role_id': (e % role_count) + 1,
+            'shifts_per_week': 5,
+        }
+        for e in range(size)
+    ]
+    return roles, employees, rng
+
+
+def run_once(roles, employees, leave_dates, start, end, time_limit, hints=None):
+    timer = FirstSolutionTimer()
+    generator = ShiftScheduleGenerator(
+        employees, roles, leave_dates, {},
+        time_limit_seconds=time_limit, hints=hints, solution_callback=timer
+    )
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        schedule, error = generator.generate(start, end)
+    elapsed = time.perf_counter() - started
+
+    status = generator.solver.StatusName()
+    return {
+        'status': status,
+        'error': error,
+        'wall_seconds': round(elapsed, 3),
+        'solver_seconds': round(generator.solver.WallTime(), 3),
+        'time_to_first_feasible': round(timer.first_solution_at, 3) if timer.first_solution_at is not None else None,
+        'time_to_optimal': round(generator.solver.WallTime(), 3) if status == 'OPTIMAL' else None,
+        'solutions': timer.solutions,
+        'objective': generator.solver.ObjectiveValue() if schedule else None,
+    }, schedule
+
+
+def benchmark(size: int, time_limit: float, days: int):
+    roles, employees, rng = build_department(size)
+    start = date(2025, 12, 1)
+    end = start + timedelta(days=days - 1)
+    all_dates = [start + timedelta(days=i) for i in range(days)]
+
+    # ~3% of employee-days on leave
+    leave_dates = {}
+    for emp in employees:
+        picked = {d for d in all_dates if rng.random() < 0.03}
+        if picked:
+            leave_dates[emp['id']] = picked
+
+    cold, schedule = run_once(roles, employees, leave_dates, start, end, time_limit)
+
+    warm = None
+    if schedule:
+        hints = {
+            (emp_id, day): assignment['role_id']
+            for day, day_assignments in schedule.items()
+            for emp_id, assignment in day_assignments.items()
+        }
+        # Approve one more leave on an assigned day, then regenerate from the hint
+        emp_id, day = next(iter(hints))
+        leave_dates.setdefault(emp_id, set()).add(day)
+        warm, _ = run_once(roles, employees, leave_dates, start, end, time_limit, hints=hints)
+
+    return {
+        'employees': size,
+        'roles': len(roles),
+        'days': days,
+        'num_workers': resolve_num_workers(),
+        'cold': cold,
+        'warm': warm,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--time-limit', type=float, default=60.0)
+    parser.add_argument('--days', type=int, default=28)
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("🧪 CP-SAT SCHEDULE SOLVER BENCHMARK")
+    print("=" * 70)
+
+    results = []
+    for size in args.sizes:
+        result = benchmark(size, args.time_limit, args.days)
+        results.append(result)
+        for mode in ('cold', 'warm'):
+            run = result[mode]
+            if run is None:
+                continue
+            print(
+                f"{size:>5} employees | {mode:<4} | {run['status']:<10} | "
+                f"first feasible: {run['time_to_first_feasible']}s | "
+                f"optimal: {run['time_to_optimal']}s | wall: {run['wall_seconds']}s"
+            )
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"\n✅ Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Schedule Delta Sync Test
+Tests that a schedule reassigned to another employee reaches the previous
+owner's delta sync as a tombstone, while the department (which still sees
+the row) gets it as an upsert only. Runs in a transaction that is rolled back.
+Run: python test_schedule_changes.py
+"""
+
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import engine
+from app.models import Employee, Schedule, ScheduleDeletion
+from app.schedule_changes import read_schedule_changes
+
+
+def employee_scope(employee_id):
+    return [Schedule.employee_id == employee_id], [ScheduleDeletion.employee_id == employee_id]
+
+
+def department_scope(department_id):
+    return [Schedule.department_id == department_id], [ScheduleDeletion.department_id == department_id]
+
+
+async def test_reassigned_schedule_tombstone():
+    """Reassigning a schedule tombstones it for the old owner"""
+    print("\n" + "="*70)
+    print("🧪 TESTING SCHEDULE REASSIGNMENT TOMBSTONES")
+    print("="*70)
+
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        try:
+            schedule = (await session.execute(select(Schedule).limit(1))).scalar_one_or_none()
+            if not schedule:
+                print("❌ No schedule found")
+                return False
+
+            other = (await session.execute(
+                select(Employee).filter(
+                    Employee.department_id == schedule.department_id,
+                    Employee.id != schedule.employee_id
+                ).limit(1)
+            )).scalar_one_or_none()
+            if not other:
+                print("❌ No second employee in the schedule's department")
+                return False
+
+            old_owner = schedule.employee_id
+            print(f"\n📅 Schedule {schedule.id} on {schedule.date}: employee {old_owner} → {other.id}")
+
+            # Full syncs give each scope its starting cursor
+            owner_cursor = (await read_schedule_changes(session, *employee_scope(old_owner)))["cursor"]
+            department_cursor = (await read_schedule_changes(session, *department_scope(schedule.department_id)))["cursor"]
+
+            schedule.employee_id = other.id
+            await session.flush()
+
+            owner_delta = await read_schedule_changes(session, *employee_scope(old_owner), since=owner_cursor)
+            print(f"   Old owner: {len(owner_delta['upserts'])} upserts, deleted {owner_delta['deleted']}")
+            if schedule.id not in owner_delta["deleted"]:
+                print("❌ The previous owner did not receive a tombstone")
+                return False
+            if any(row["id"] == schedule.id for row in owner_delta["upserts"]):
+                print("❌ The previous owner still received the row as an upsert")
+                return False
+            print("✅ Previous owner receives the reassigned row as a tombstone")
+
+            new_delta = await read_schedule_changes(session, *employee_scope(other.id), since=owner_cursor)
+            if not any(row["id"] == schedule.id for row in new_delta["upserts"]) or schedule.id in new_delta["deleted"]:
+                print("❌ The new owner did not receive the row as an upsert")
+                return False
+            print("✅ New owner receives it as an upsert")
+
+            department_delta = await read_schedule_changes(
+                session, *department_scope(schedule.department_id), since=department_cursor
+            )
+            if schedule.id in department_delta["deleted"]:
+                print("❌ The department, which still sees the row, received a tombstone")
+                return False
+            print("✅ Department keeps the row (upsert, no tombstone)")
+            return True
+        finally:
+            await session.rollback()
+
+
+async def main():
+    try:
+        passed = await test_reassigned_schedule_tombstone()
+        print("\n" + ("✅ SCHEDULE DELTA SYNC TEST PASSED" if passed else "❌ SCHEDULE DELTA SYNC TEST FAILED"))
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
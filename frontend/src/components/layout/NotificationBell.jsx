@@ -3,13 +3,18 @@ import { Bell, X, Check, CheckCheck } from 'lucide-react';
 import { useLanguage } from '../../context/LanguageContext';
 import {
   getNotifications,
+  getUnreadNotificationCount,
   markNotificationRead,
   markAllNotificationsRead,
-  deleteNotification
+  deleteNotification,
+  getNotificationStreamUrl
 } from '../../services/api';
 import { formatDistanceToNow } from 'date-fns';
 import { ja } from 'date-fns/locale';
 
+// Fallback refresh when the push stream is unavailable
+const FALLBACK_POLL_INTERVAL = 60000;
+
 const NotificationBell = () => {
   const { t, language } = useLanguage();
   const [notifications, setNotifications] = useState([]);
@@ -17,11 +22,43 @@ const NotificationBell = () => {
   const [showDropdown, setShowDropdown] = useState(false);
   const [loading, setLoading] = useState(true);
   const dropdownRef = useRef(null);
+  const seenIds = useRef(new Set());
 
   useEffect(() => {
-    loadNotifications();
-    const interval = setInterval(loadNotifications, 5000); // Refresh every 5 seconds for faster updates
-    return () => clearInterval(interval);
+    let source = null;
+    let interval = null;
+
+    const startPolling = () => {
+      if (!interval) interval = setInterval(loadNotifications, FALLBACK_POLL_INTERVAL);
+    };
+
+    const handlePush = (event) => {
+      const notification = JSON.parse(event.data);
+      if (seenIds.current.has(notification.id)) return;
+      seenIds.current.add(notification.id);
+      setNotifications(prev => [notification, ...prev]);
+      if (!notification.is_read) setUnreadCount(count => count + 1);
+    };
+
+    loadNotifications().then((items) => {
+      if (typeof window === 'undefined' || !window.EventSource) {
+        startPolling();
+        return;
+      }
+      // New notifications are pushed; resume after the newest one already loaded
+      const lastId = items && items.length ? Math.max(...items.map(n => n.id)) : null;
+      source = new EventSource(getNotificationStreamUrl(lastId));
+      source.addEventListener('notification', handlePush);
+      source.onerror = () => {
+        // EventSource reconnects on its own; give up only if it was closed for good
+        if (source.readyState === EventSource.CLOSED) startPolling();
+      };
+    });
+
+    return () => {
+      if (source) source.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   useEffect(() => {
@@ -37,11 +74,18 @@ const NotificationBell = () => {
 
   const loadNotifications = async () => {
     try {
-      const response = await getNotifications();
+      // The list is one page; the badge comes from the count endpoint
+      const [response, countResponse] = await Promise.all([
+        getNotifications(),
+        getUnreadNotificationCount()
+      ]);
+      seenIds.current = new Set(response.data.map(n => n.id));
       setNotifications(response.data);
-      setUnreadCount(response.data.filter(n => !n.is_read).length);
+      setUnreadCount(countResponse.data.unread_count);
+      return response.data;
     } catch (error) {
       console.error('Failed to load notifications:', error);
+      return [];
     } finally {
       setLoading(false);
     }
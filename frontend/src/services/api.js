@@ -58,17 +58,24 @@ export const createUser = (userData) => api.post('/admin/users', userData);
 export const listUsers = () => api.get('/admin/users');
 export const deleteUser = (id) => api.delete(`/admin/users/${id}`);
 export const checkUsernameAvailable = (username) => 
-  listUsers().then(res => {
-    const exists = res.data.some(u => u.username.toLowerCase() === username.toLowerCase());
-    return !exists;
-  }).catch(() => true); // If check fails, allow it
+  api.get('/admin/users/exists', { params: { username } })
+    .then(res => !res.data.username_exists)
+    .catch(() => true); // If check fails, allow it
 
 // Managers
 export const createManager = (managerData, forceReassign = false) => 
   api.post('/managers', managerData, {
     params: { force_reassign: forceReassign }
   });
-export const listManagers = () => api.get('/managers');
+// Options: { limit, after, search, fields: ['id', 'full_name'] }; next page cursor in X-Next-Cursor
+export const listManagers = ({ limit, after, search, fields } = {}) => {
+  const params = {};
+  if (limit) params.limit = limit;
+  if (after) params.after = after;
+  if (search) params.search = search;
+  if (fields && fields.length) params.fields = fields.join(',');
+  return api.get('/managers', { params });
+};
 export const updateManager = (id, managerData) => api.put(`/managers/${id}`, managerData);
 export const reassignManager = (id, managerData) => api.put(`/managers/${id}/reassign`, managerData);
 export const deleteManager = (id) => api.delete(`/managers/${id}`);
@@ -92,7 +99,15 @@ export const deleteDepartment = (id) => api.delete(`/departments/${id}`);
 
 // Employees
 export const createEmployee = (empData) => api.post('/employees', empData);
-export const listEmployees = (showInactive = false) => api.get('/employees', { params: { show_inactive: showInactive } });
+// Options: { limit, after, search, fields: ['id', 'first_name'] }; next page cursor in X-Next-Cursor
+export const listEmployees = (showInactive = false, { limit, after, search, fields } = {}) => {
+  const params = { show_inactive: showInactive };
+  if (limit) params.limit = limit;
+  if (after) params.after = after;
+  if (search) params.search = search;
+  if (fields && fields.length) params.fields = fields.join(',');
+  return api.get('/employees', { params });
+};
 export const updateEmployee = (id, empData) => api.put(`/employees/${id}`, empData);
 export const deleteEmployee = (id, hardDelete = false) =>
   api.delete(`/employees/${id}`, {
@@ -202,7 +217,9 @@ export const deleteShift = (id, hardDelete = false) =>
 
 // Messages
 export const sendMessage = (messageData) => api.post('/messages', messageData);
-export const getMessages = () => api.get('/messages');
+// Paged feed: pass { before: X-Next-Cursor } for older pages or { since: X-Sync-Cursor } for new messages only
+export const getMessages = (params = {}) => api.get('/messages', { params });
+export const getUnreadMessageCount = () => api.get('/messages/unread-count');
 export const deleteMessage = (id) => api.delete(`/messages/${id}`);
 export const markMessageAsRead = (id) => api.put(`/messages/${id}/read`);
 
@@ -214,6 +231,16 @@ export const getSchedules = (startDate, endDate, departmentId = null) => {
   if (departmentId) params.append('department_id', departmentId);
   return api.get(`/schedules?${params.toString()}`);
 };
+// Delta sync: pass the previous response's cursor as `since`; repeat while has_more
+export const getScheduleChanges = ({ since, limit, startDate, endDate, departmentIds } = {}) => {
+  const params = new URLSearchParams();
+  if (since) params.append('since', since);
+  if (limit) params.append('limit', limit);
+  if (startDate) params.append('start_date', startDate);
+  if (endDate) params.append('end_date', endDate);
+  if (departmentIds && departmentIds.length) params.append('department_ids', departmentIds.join(','));
+  return api.get(`/schedules/changes?${params.toString()}`);
+};
 export const createSchedule = (scheduleData) => api.post('/schedules', scheduleData);
 export const updateSchedule = (id, scheduleData) => api.put(`/schedules/${id}`, scheduleData);
 export const deleteSchedule = (id) => api.delete(`/schedules/${id}`);
@@ -225,6 +252,18 @@ export const generateSchedule = (startDate, endDate, regenerate = false, departm
   if (departmentId) params.append('department_id', departmentId);
   return api.post(`/schedules/generate?${params.toString()}`);
 };
+export const startScheduleGenerationJob = (startDate, endDate, regenerate = false, departmentId = null) => {
+  const params = new URLSearchParams();
+  params.append('start_date', startDate);
+  params.append('end_date', endDate);
+  params.append('regenerate', regenerate);
+  params.append('as_job', true);
+  if (departmentId) params.append('department_id', departmentId);
+  return api.post(`/schedules/generate?${params.toString()}`);
+};
+export const getScheduleJob = (jobId, feedbackOffset = 0) =>
+  api.get(`/schedules/jobs/${jobId}?feedback_offset=${feedbackOffset}`);
+export const cancelScheduleJob = (jobId) => api.post(`/schedules/jobs/${jobId}/cancel`);
 
 // Attendance
 export const recordAttendance = (attendanceData) => 
@@ -238,10 +277,13 @@ export const getAttendance = (startDate, endDate, departmentId = null) => {
   if (departmentId) params.append('department_id', departmentId);
   return api.get(`/attendance?${params.toString()}`);
 };
-export const getAttendanceSummary = (startDate, endDate) => {
+export const getAttendanceSummary = (startDate, endDate, { departmentId, employmentType, stream } = {}) => {
   const params = new URLSearchParams();
   if (startDate) params.append('start_date', startDate);
   if (endDate) params.append('end_date', endDate);
+  if (departmentId) params.append('department_id', departmentId);
+  if (employmentType) params.append('employment_type', employmentType);
+  if (stream) params.append('stream', 'true');
   return api.get(`/attendance/summary?${params.toString()}`);
 };
 export const getWeeklyAttendance = (employeeId, startDate) => {
@@ -292,16 +334,28 @@ export const generateSchedules = (startDate, endDate, departmentId = null) => {
 };
 
 // Notifications
-export const getNotifications = (unreadOnly = false) => {
+export const getNotifications = (unreadOnly = false, { limit, before, since } = {}) => {
   const params = new URLSearchParams();
   if (unreadOnly) params.append('unread_only', 'true');
+  if (limit) params.append('limit', limit);
+  if (before) params.append('before', before);
+  if (since) params.append('since', since);
   return api.get(`/notifications?${params.toString()}`);
 };
+export const getUnreadNotificationCount = () => api.get('/notifications/unread-count');
 export const markNotificationRead = (notificationId) =>
   api.post(`/notifications/${notificationId}/mark-read`);
 export const markAllNotificationsRead = () => api.post('/notifications/mark-all-read');
 export const deleteNotification = (notificationId) =>
   api.delete(`/notifications/${notificationId}`);
+// EventSource cannot send headers, so the token travels as a query parameter
+export const getNotificationStreamUrl = (lastEventId = null) => {
+  const params = new URLSearchParams();
+  const token = localStorage.getItem('token');
+  if (token) params.append('token', token);
+  if (lastEventId) params.append('last_event_id', lastEventId);
+  return `${API_URL}/notifications/stream?${params.toString()}`;
+};
 
 // Sub-Admin Management
 export const createSubAdmin = (subAdminData) => api.post('/admin/sub-admins', subAdminData);